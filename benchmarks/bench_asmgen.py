@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Assembly generation: operand objects, memory and time
+
+Run from the repo root:
+    python -m benchmarks.bench_asmgen
+
+For each program size, counts the operand references in the generated
+FunctionASM and how many distinct operand objects back them, and reports
+the memory asmgen keeps alive, its best time and TACKY instructions
+translated per second.
+"""
+
+import gc
+import time
+import tracemalloc
+
+from pyCC.pyCmp import asmgen, lexer, parser, tackygen
+from pyCC.pyCmp.ASMNode import OperandASM
+
+
+def program(num_terms: int) -> str:
+    body = " + ".join(f"-{i % 100} * (~{i % 7} || {i % 3}) / {i % 5 + 1}" for i in range(num_terms))
+    return f"int main(void) {{ return {body}; }}"
+
+
+def operand_counts(function_asm):
+    ## (operand references, distinct operand objects)
+    references = 0
+    distinct = set()
+    for instruction in function_asm.instructions:
+        for name in type(instruction).__match_args__:
+            operand = getattr(instruction, name)
+            if isinstance(operand, OperandASM):
+                references += 1
+                distinct.add(id(operand))
+    return references, len(distinct)
+
+
+def bench(num_terms: int, repeat: int = 3):
+    tacky = tackygen.tackify(parser.parse(lexer.lex_stream(program(num_terms))))
+
+    gc.collect()
+    tracemalloc.start()
+    asm = asmgen.asmFromTacky(tacky)
+    kept = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    references, distinct = operand_counts(asm.function)
+    del asm
+
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        asmgen.asmFromTacky(tacky)
+        best = min(best, time.perf_counter() - start)
+    return len(tacky.func.instructions), references, distinct, kept, best
+
+
+def main():
+    print(
+        f"{'terms':>8} {'tacky':>8} {'operands':>9} {'objects':>9} "
+        f"{'MB kept':>8} {'seconds':>8} {'instr/s':>9}"
+    )
+    for num_terms in (1_000, 5_000, 10_000):
+        instructions, references, distinct, kept, seconds = bench(num_terms)
+        print(
+            f"{num_terms:>8} {instructions:>8} {references:>9} {distinct:>9} "
+            f"{kept / 1e6:>8.1f} {seconds:>8.3f} {instructions / seconds:>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
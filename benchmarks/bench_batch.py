@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Batch compilation: throughput against worker count
+
+Run from the repo root:
+    python -m benchmarks.bench_batch [num_files]
+
+Writes `num_files` small C files to a temporary directory and compiles all
+of them (gcc -E, compile, gcc) with compile_batch, for 1, 2, 4, ... workers
+up to the CPU count. Also times the same files as separate pyCC.py runs,
+which is what a build without batch mode does.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from pyCC.pyCmp.driver import compile_batch
+
+DRIVER = os.path.join(os.path.dirname(__file__), "..", "pyCC", "pyCC.py")
+
+
+def program(index: int) -> str:
+    body = " + ".join(f"({i % 9} * -{i % 4} || {i % 3})" for i in range(index % 20 + 1))
+    return f"int main(void) {{ return {body}; }}\n"
+
+
+def worker_counts():
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    if counts[-1] != os.cpu_count():
+        counts.append(os.cpu_count())
+    return counts
+
+
+def main():
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        file_names = []
+        for index in range(num_files):
+            file_name = os.path.join(tmp, f"prog{index}.c")
+            with open(file_name, "w") as f:
+                f.write(program(index))
+            file_names.append(file_name)
+
+        start = time.perf_counter()
+        for file_name in file_names:
+            subprocess.run([sys.executable, DRIVER, file_name], check=True)
+        single = num_files / (time.perf_counter() - start)
+        print(f"{num_files} files, {os.cpu_count()} CPUs")
+        print(f"{'workers':>8} {'files/s':>9} {'speedup':>8}")
+        print(f"{'pyCC.py':>8} {single:>9.1f} {1.0:>8.2f}")
+
+        for workers in worker_counts():
+            start = time.perf_counter()
+            results = compile_batch(file_names, workers=workers)
+            rate = num_files / (time.perf_counter() - start)
+            assert all(result.ok for result in results)
+            print(f"{workers:>8} {rate:>9.1f} {rate / single:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
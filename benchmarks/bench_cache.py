@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Compile cache: cold against warm builds
+
+Run from the repo root:
+    python -m benchmarks.bench_cache [num_files]
+
+Compiles the same generated files with compile_file three times: without
+a cache, into an empty cache, and again from the now warm cache. Prints
+files per second and the cache's statistics after each. A warm build
+skips gcc -E (preprocess hits) as well as the compile (hits).
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_batch import program
+from pyCC.pyCmp.cache import CompileCache
+from pyCC.pyCmp.driver import compile_file
+
+
+def main():
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        file_names = []
+        for index in range(num_files):
+            file_name = os.path.join(tmp, f"prog{index}.c")
+            with open(file_name, "w") as f:
+                f.write(program(index))
+            file_names.append(file_name)
+        cache = CompileCache(os.path.join(tmp, "cache"))
+
+        print(
+            f"{'build':>8} {'files/s':>9} {'pp hits':>8} {'hits':>6} {'misses':>7} "
+            f"{'entries':>8} {'KB':>6}"
+        )
+        for build, build_cache in (("none", None), ("cold", cache), ("warm", cache)):
+            start = time.perf_counter()
+            assert all(compile_file(name, cache=build_cache).ok for name in file_names)
+            rate = num_files / (time.perf_counter() - start)
+            stats = cache.stats()
+            print(
+                f"{build:>8} {rate:>9.1f} {stats['preprocess_hits']:>8} "
+                f"{stats['hits']:>6} {stats['misses']:>7} "
+                f"{stats['entries']:>8} {stats['bytes'] // 1024:>6}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Assembly emission: codegen() string vs streaming into a file
+
+Run from the repo root:
+    python -m benchmarks.bench_emit
+
+For each program size, the ASM is generated once and then written to a
+temporary file both ways. Reports the extra memory emission needs on top
+of the ASM (tracemalloc peak minus what was allocated before) and the
+best time of each.
+"""
+
+import os
+import tempfile
+import time
+import tracemalloc
+
+from pyCC.pyCmp import asmemit, asmgen, lexer, parser, tackygen
+
+
+def program(num_terms: int) -> str:
+    body = " + ".join(f"-{i % 100} * (~{i % 7} || {i % 3}) / {i % 5 + 1}" for i in range(num_terms))
+    return f"int main(void) {{ return {body}; }}"
+
+
+def write_codegen(asm, path):
+    with open(path, "w", encoding="utf-8") as file_out:
+        file_out.write(asm.codegen())
+
+
+def write_stream(asm, path):
+    with open(path, "w", encoding="utf-8") as file_out:
+        asmemit.emitProgram(asm, file_out)
+
+
+def extra_peak(write, asm, path):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    write(asm, path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak - before
+
+
+def best_time(write, asm, path, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        write(asm, path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'terms':>8} {'MB of .s':>9} {'codegen MB':>11} {'stream MB':>10} {'codegen s':>10} {'stream s':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "out.s")
+        for num_terms in (1_000, 5_000, 20_000):
+            asm = asmgen.asmFromTacky(
+                tackygen.tackify(parser.parse(lexer.lex_stream(program(num_terms))))
+            )
+            codegen_peak = extra_peak(write_codegen, asm, path)
+            stream_peak = extra_peak(write_stream, asm, path)
+            size = os.path.getsize(path)
+            print(
+                f"{num_terms:>8} {size / 1e6:>9.1f} {codegen_peak / 1e6:>11.2f} {stream_peak / 1e6:>10.2f} "
+                f"{best_time(write_codegen, asm, path):>10.3f} {best_time(write_stream, asm, path):>9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
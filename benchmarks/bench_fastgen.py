@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Single pass fast mode vs the full pipeline
+
+Run from the repo root:
+    python -m benchmarks.bench_fastgen
+
+Both start from the same source bytes and write the assembly to a
+temporary file: lex_stream -> parse -> tackify -> asmwrite for the full
+pipeline, lex_stream -> fastcompile for fast mode. Reports source tokens
+compiled per second, best of a few runs.
+"""
+
+import gc
+import os
+import tempfile
+import time
+
+from pyCC.pyCmp import asmgen, fastgen, lexer, parser, tackygen
+
+
+def program(num_terms: int) -> bytes:
+    body = " + ".join(f"-{i % 100} * (~{i % 7} || {i % 3}) / {i % 5 + 1}" for i in range(num_terms))
+    return f"int main(void) {{ return {body}; }}".encode()
+
+
+def full(source, path):
+    with open(path, "w", encoding="utf-8") as file_out:
+        asmgen.asmwrite(tackygen.tackify(parser.parse(lexer.lex_stream(source))), file_out)
+
+
+def fast(source, path):
+    with open(path, "w", encoding="utf-8") as file_out:
+        fastgen.fastcompile(lexer.lex_stream(source), file_out)
+
+
+def bench(compile_source, source, path, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        compile_source(source, path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'terms':>8} {'tokens':>8} {'full tok/s':>11} {'fast tok/s':>11} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "out.s")
+        for num_terms in (1_000, 10_000, 50_000):
+            source = program(num_terms)
+            num_tokens = len(lexer.lex_stream(source))
+            full_seconds = bench(full, source, path)
+            fast_seconds = bench(fast, source, path)
+            print(
+                f"{num_terms:>8} {num_tokens:>8} {num_tokens / full_seconds:>11.0f} "
+                f"{num_tokens / fast_seconds:>11.0f} {full_seconds / fast_seconds:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Memory per TACKY instruction, object form vs. FlatFuncTacky
+
+Run from the repo root:
+    python -m benchmarks.bench_flat_tacky
+"""
+
+import time
+import tracemalloc
+
+from pyCC.pyCmp import flatTacky, lexer, parser, tackygen
+
+
+def make_ast(num_terms: int):
+    body = " + ".join(f"-{i % 100} * (~{i % 7} || {i % 3})" for i in range(num_terms))
+    return parser.parse(lexer.lex_stream(f"int main(void) {{ return {body}; }}"))
+
+
+def traced(fn, *args):
+    tracemalloc.start()
+    res = fn(*args)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return res, size
+
+
+def main():
+    ast = make_ast(20_000)
+    program, object_bytes = traced(tackygen.tackify, ast)
+    func = program.func
+    flat, flat_bytes = traced(flatTacky.flatten, func)
+    num_instructions = len(func.instructions)
+
+    print(f"instructions: {num_instructions}")
+    print(f"objects: {object_bytes / num_instructions:8.1f} bytes/instruction")
+    print(f"flat:    {flat_bytes / num_instructions:8.1f} bytes/instruction")
+
+    start = time.perf_counter()
+    flatTacky.flatten(func)
+    middle = time.perf_counter()
+    flat.to_func()
+    end = time.perf_counter()
+    print(f"flatten {middle - start:.3f} s, to_func {end - middle:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Stage handoff: pipes against temporary files
+
+Run from the repo root:
+    python -m benchmarks.bench_handoff [num_files]
+
+Compiles the same generated files with compile_file, first handing the
+preprocessed source and the assembly on in memory and through gcc's
+stdin, then with keep_temps, which writes the .i and .s and assembles
+from the .s. The two alternate file by file, so load on the machine hits
+both alike. Prints the median and mean per file for both, in the link
+mode and FAST_MODE.
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+
+from benchmarks.bench_batch import program
+from pyCC.pyCmp.driver import LINK_MODE, compile_file
+from pyCC.pyCmp.pyCmp import FAST_MODE
+
+
+def main():
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        file_names = []
+        for index in range(num_files):
+            file_name = os.path.join(tmp, f"prog{index}.c")
+            with open(file_name, "w") as f:
+                f.write(program(index))
+            file_names.append(file_name)
+
+        print(f"{'mode':>6} {'handoff':>8} {'p50 ms':>8} {'mean ms':>8}")
+        for mode_name, mode in (("link", LINK_MODE), ("fast", FAST_MODE)):
+            times = {"files": [], "pipes": []}
+            for index, file_name in enumerate(file_names):
+                handoffs = [("files", True), ("pipes", False)]
+                for handoff, keep_temps in handoffs[:: 1 if index % 2 else -1]:
+                    result = compile_file(file_name, mode, keep_temps=keep_temps)
+                    assert result.ok, result.error
+                    times[handoff].append(result.seconds * 1000)
+            for handoff, seconds in times.items():
+                print(
+                    f"{mode_name:>6} {handoff:>8} {statistics.median(seconds):>8.2f} "
+                    f"{statistics.mean(seconds):>8.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
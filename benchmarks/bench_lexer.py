@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Lexer throughput at growing input sizes
+
+Run from the repo root:
+    python -m benchmarks.bench_lexer
+
+Time per token should stay flat as the input grows (linear scaling).
+Also compares the memory held by lex's tuple list against a TokenStream,
+and a one-character relex against lexing the whole input again.
+"""
+
+import time
+import tracemalloc
+
+from pyCC.pyCmp import lexer
+
+
+def make_source(num_terms: int) -> str:
+    body = " + ".join(f"(x{i} * {i})" for i in range(num_terms))
+    return f"int main(void) {{\n    return {body};\n}}\n"
+
+
+def bench(num_terms: int, repeat: int = 3):
+    source = make_source(num_terms)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tokens = lexer.lex(source)
+        best = min(best, time.perf_counter() - start)
+    return len(source), len(tokens), best
+
+
+def bytes_per_token(lex_fn, source):
+    tracemalloc.start()
+    tokens = lex_fn(source)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(tokens)
+
+
+def main():
+    print(f"{'bytes':>12} {'tokens':>10} {'seconds':>10} {'ns/token':>10}")
+    for num_terms in (1_000, 10_000, 100_000, 300_000):
+        size, num_tokens, seconds = bench(num_terms)
+        print(
+            f"{size:>12} {num_tokens:>10} {seconds:>10.4f} "
+            f"{seconds / num_tokens * 1e9:>10.1f}"
+        )
+
+    source = make_source(100_000)
+    encoded = source.encode("utf-8")
+    print()
+    print(f"lex (tuple list): {bytes_per_token(lexer.lex, source):>6.1f} bytes/token")
+    print(f"lex_stream:       {bytes_per_token(lexer.lex_stream, encoded):>6.1f} bytes/token")
+
+    tokens = lexer.lex_stream(encoded)
+    ## Rewrite a constant in the middle of the input
+    offset = encoded.index(b"* 50000)") + 2
+    print()
+    for label, inserted in (("same length", b"7"), ("shifting", b"77")):
+        start = time.perf_counter()
+        lexer.relex(tokens, offset, 1, inserted)
+        print(f"relex ({label}): {time.perf_counter() - start:8.4f} s")
+    start = time.perf_counter()
+    lexer.lex_stream(encoded)
+    print(f"full lex_stream:      {time.perf_counter() - start:8.4f} s")
+
+
+if __name__ == "__main__":
+    main()
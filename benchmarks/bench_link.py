@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Assembling and linking: through gcc against as and ld directly
+
+Run from the repo root:
+    python -m benchmarks.bench_link [num_files]
+
+Compiles generated files to assembly in memory, then assembles and links
+each one both ways, alternating file by file so load on the machine hits
+both alike. Checks the two binaries are the same bytes, and prints the
+median and mean per file of each. Also times finding the as and ld
+commands, asking gcc (cold) and from the file it's kept in (warm).
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from benchmarks.bench_batch import program
+from pyCC.pyCmp import toolchain
+from pyCC.pyCmp.driver import assemble
+from pyCC.pyCmp.pyCmp import compile_source
+
+
+def main():
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as tmp, mock.patch.dict(
+        os.environ, XDG_CACHE_HOME=os.path.join(tmp, "cache")
+    ):
+        for state in ("cold", "warm"):
+            toolchain._commands = None
+            start = time.perf_counter()
+            toolchain.link_commands("x.o", "x")
+            print(f"find commands ({state}): {(time.perf_counter() - start) * 1000:.2f} ms")
+
+        times = {"gcc": [], "as + ld": []}
+        for index in range(num_files):
+            assembly = compile_source(program(index)).assembly
+            ways = [("gcc", False), ("as + ld", True)]
+            binaries = []
+            for way, direct_link in ways[:: 1 if index % 2 else -1]:
+                output = os.path.join(tmp, f"prog{index}-{direct_link}")
+                start = time.perf_counter()
+                assemble(lambda stdin: stdin.write(assembly), output, direct_link)
+                times[way].append((time.perf_counter() - start) * 1000)
+                with open(output, "rb") as f:
+                    binaries.append(f.read())
+            assert binaries[0] == binaries[1], f"binaries differ for file {index}"
+
+        print(f"{'linker':>8} {'p50 ms':>8} {'mean ms':>8}")
+        for way, milliseconds in times.items():
+            print(
+                f"{way:>8} {statistics.median(milliseconds):>8.2f} "
+                f"{statistics.mean(milliseconds):>8.2f}"
+            )
+        speedup = statistics.median(times["gcc"]) / statistics.median(times["as + ld"])
+        print(f"speedup: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Native objects: the encoder and ELF writer against assembly text and as
+
+Run from the repo root:
+    python -m benchmarks.bench_native [num_files]
+
+For generated programs, times making the .o from the ASM both ways,
+emitting the text and running as on it, or encoding it in process. Then
+times compile_file end to end: linking through gcc, with as and ld
+directly, and natively. Every way alternates file by file, so load on
+the machine hits them alike. Prints the median and mean per file.
+"""
+
+import io
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_batch import program
+from pyCC.pyCmp import elf, encoder
+from pyCC.pyCmp.asmemit import emitProgram
+from pyCC.pyCmp.driver import compile_file
+from pyCC.pyCmp.pyCmp import Stage, compile_source
+
+
+def text_object(asm, object_file: str):
+    sink = io.StringIO()
+    emitProgram(asm, sink)
+    subprocess.run(["as", "-o", object_file], input=sink.getvalue().encode(), check=True)
+
+
+def native_object(asm, object_file: str):
+    with open(object_file, "wb") as f:
+        f.write(elf.objectBytes(*encoder.encodeProgram(asm)))
+
+
+def report(title: str, times: dict[str, list[float]]):
+    print(f"{title:>12} {'p50 ms':>8} {'mean ms':>8}")
+    for way, milliseconds in times.items():
+        print(
+            f"{way:>12} {statistics.median(milliseconds):>8.3f} "
+            f"{statistics.mean(milliseconds):>8.3f}"
+        )
+
+
+def main():
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        objects = {"text + as": [], "native": []}
+        builds = {"gcc": [], "as + ld": [], "native": []}
+        for index in range(num_files):
+            asm = compile_source(program(index), Stage.ASM).asm
+            ways = [("text + as", text_object), ("native", native_object)]
+            for way, make in ways[:: 1 if index % 2 else -1]:
+                start = time.perf_counter()
+                make(asm, os.path.join(tmp, "prog.o"))
+                objects[way].append((time.perf_counter() - start) * 1000)
+
+            file_name = os.path.join(tmp, f"prog{index}.c")
+            with open(file_name, "w") as f:
+                f.write(program(index))
+            ways = [("gcc", {}), ("as + ld", {"direct_link": True}), ("native", {"native": True})]
+            for way, options in ways[index % 3 :] + ways[: index % 3]:
+                result = compile_file(file_name, **options)
+                assert result.ok, result.error
+                builds[way].append(result.seconds * 1000)
+
+        report("object", objects)
+        report("compile", builds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Parser throughput (tokens/second) on flat and nested expressions
+
+Run from the repo root:
+    python -m benchmarks.bench_parser
+
+Tokens are lexed up front, only parser.parse is timed.
+"""
+
+import time
+
+from pyCC.pyCmp import lexer, parser
+
+
+def flat_source(num_terms: int) -> str:
+    ops = ["+", "*", "-", "<<", "&", "==", "||", "/", "^", ">="]
+    body = " 1 ".join(ops[i % len(ops)] for i in range(num_terms))
+    return f"int main(void) {{ return 1 {body} 1; }}"
+
+
+def nested_source(depth: int, repeat: int) -> str:
+    ## -(~(!(1 + ... ))) nests unary ops and parentheses
+    nested = "-(~(!(1 + " * depth + "1" + ")))" * depth
+    body = " + ".join([nested] * repeat)
+    return f"int main(void) {{ return {body}; }}"
+
+
+def bench(source: str, repeat: int = 5):
+    tokens = lexer.lex_stream(source)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser.parse(tokens)
+        best = min(best, time.perf_counter() - start)
+    return len(tokens), best
+
+
+def main():
+    cases = (
+        ("flat", flat_source(200_000)),
+        ("nested", nested_source(60, 500)),
+    )
+    print(f"{'case':>8} {'tokens':>10} {'seconds':>10} {'tokens/s':>12}")
+    for label, source in cases:
+        num_tokens, seconds = bench(source)
+        print(f"{label:>8} {num_tokens:>10} {seconds:>10.4f} {num_tokens / seconds:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
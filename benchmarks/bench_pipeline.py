@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Pipelined driver against compiling files one after another
+
+Run from the repo root:
+    python -m benchmarks.bench_pipeline [num_files]
+
+Compiles the same generated files (gcc -E, compile, gcc) with compile_file
+in a loop, which is what the driver does per file, and with
+compile_pipelined, then prints the pipeline's per stage queue depths and
+utilization.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_batch import program
+from pyCC.pyCmp.driver import compile_file
+from pyCC.pyCmp.pipeline import compile_pipelined
+
+
+def main():
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        file_names = []
+        for index in range(num_files):
+            file_name = os.path.join(tmp, f"prog{index}.c")
+            with open(file_name, "w") as f:
+                f.write(program(index))
+            file_names.append(file_name)
+
+        start = time.perf_counter()
+        assert all(compile_file(file_name).ok for file_name in file_names)
+        sequential = num_files / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        results, stats = compile_pipelined(file_names)
+        pipelined = num_files / (time.perf_counter() - start)
+        assert all(result.ok for result in results)
+
+    print(f"{num_files} files, {os.cpu_count()} CPUs")
+    print(f"sequential: {sequential:.1f} files/s")
+    print(f"pipelined:  {pipelined:.1f} files/s ({pipelined / sequential:.2f}x)")
+    print(stats)
+
+
+if __name__ == "__main__":
+    main()
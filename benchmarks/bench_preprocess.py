@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""In process preprocessor against gcc -E
+
+Run from the repo root:
+    python -m benchmarks.bench_preprocess [num_files]
+
+Preprocesses generated files that include a guarded header and use
+macros and conditionals, once with gcc -E -P and once in process, and
+prints the median and mean latency per file of each. Then compiles
+every file with compile_file, where gcc -E was the only other process
+before the link.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_batch import program
+from pyCC.pyCmp.driver import compile_file
+from pyCC.pyCmp.preprocessor import preprocess
+
+HEADER = """\
+#ifndef CONFIG_H
+#define CONFIG_H
+/* Shared settings */
+#define SCALE 3
+#define OFFSET (SCALE * 2)
+#if SCALE > 2 && defined(OFFSET)
+#define EXTRA 1
+#else
+#define EXTRA 0
+#endif
+#endif
+"""
+
+
+def source(index: int) -> str:
+    body = program(index).replace("return ", "return OFFSET + EXTRA + ")
+    return f'#include "config.h"\n#include "config.h"\n// file {index}\n{body}'
+
+
+def latencies(work, file_names) -> list[float]:
+    times = []
+    for file_name in file_names:
+        start = time.perf_counter()
+        work(file_name)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def gcc_preprocess(file_name: str):
+    subprocess.run(["gcc", "-E", "-P", file_name, "-o", "-"], capture_output=True, check=True)
+
+
+def main():
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "config.h"), "w") as f:
+            f.write(HEADER)
+        file_names = []
+        for index in range(num_files):
+            file_name = os.path.join(tmp, f"prog{index}.c")
+            with open(file_name, "w") as f:
+                f.write(source(index))
+            file_names.append(file_name)
+
+        print(f"{'preprocessor':>14} {'p50 ms':>8} {'mean ms':>8}")
+        results = {}
+        for name, work in (("gcc -E", gcc_preprocess), ("in process", preprocess)):
+            times = latencies(work, file_names)
+            results[name] = statistics.median(times)
+            print(
+                f"{name:>14} {statistics.median(times) * 1000:>8.3f} "
+                f"{statistics.mean(times) * 1000:>8.3f}"
+            )
+        print(f"speedup: {results['gcc -E'] / results['in process']:.0f}x")
+
+        start = time.perf_counter()
+        assert all(compile_file(name).ok for name in file_names)
+        print(f"compile_file: {num_files / (time.perf_counter() - start):.1f} files/s")
+
+
+if __name__ == "__main__":
+    main()
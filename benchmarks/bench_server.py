@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Compile server latency against running pyCC.py per file
+
+Run from the repo root:
+    python -m benchmarks.bench_server [requests]
+
+Starts a compile server on a temporary socket and times, per file:
+  - pyCC.py --codegen (interpreter start up, imports, gcc -E, compile)
+  - client.py --codegen (thin client start up, gcc -E and compile in the
+    server)
+  - a SOURCE request on an open connection, i.e. the compile itself
+and prints the percentiles of each, plus the server's own latency summary.
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from pyCC.pyCmp import protocol
+from pyCC.pyCmp.server import CompileServer, LatencyStats
+
+ROOT = os.path.join(os.path.dirname(__file__), "..", "pyCC")
+SOURCE = "int main(void) { return (1 + 2) * 3 - -4 / 2 || 7 && !0; }\n"
+
+
+def timed(fn, runs: int) -> LatencyStats:
+    stats = LatencyStats()
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        stats.record(time.perf_counter() - start, True)
+    return stats
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, "pycc.sock")
+        file_name = os.path.join(tmp, "prog.c")
+        with open(file_name, "w") as f:
+            f.write(SOURCE)
+        env = dict(os.environ, PYCC_SOCKET=socket_path)
+
+        with CompileServer(socket_path) as server:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+
+            def driver():
+                subprocess.run(
+                    [sys.executable, os.path.join(ROOT, "pyCC.py"), file_name, "--codegen"],
+                    check=True,
+                )
+
+            def client():
+                subprocess.run(
+                    [sys.executable, os.path.join(ROOT, "client.py"), file_name, "--codegen"],
+                    check=True,
+                    env=env,
+                )
+
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(socket_path)
+
+            def request():
+                protocol.send_request(sock, protocol.SOURCE, 3, SOURCE.encode())
+                assert protocol.read_response(sock)[0] == protocol.OK
+
+            for name, fn in (("pyCC.py", driver), ("client.py", client), ("request", request)):
+                print(f"{name:>10}: {timed(fn, runs).summary()}")
+            sock.close()
+            print(f"{'server':>10}: {server.stats.summary()}")
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Startup cost of the compiler driver on a trivial file
+
+Run from the repo root:
+    python -m benchmarks.bench_startup
+
+For every driver mode, runs `pyCC.py` on a one-line C file and reports:
+  - import ms: time spent on every import after the interpreter's own
+    start up (site), from `python -X importtime`: the compiler's modules,
+    the driver script's, and whatever they import in turn. Counting only
+    the pyCmp.* ones would credit the standard library modules they share
+    (re, enum, ...) to whichever side happens to import them first
+  - wall ms: median wall clock of the whole run (interpreter, gcc -E,
+    compiling, and gcc for the modes that assemble), with the bare
+    interpreter's `python -c pass` for reference
+
+Exits with status 1 if a mode imports more than its target. Bytecode is
+cached under a temporary PYTHONPYCACHEPREFIX (one warm-up run per mode), so
+the numbers are those of an installed compiler, not of compiling the
+sources on every run.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+DRIVER = os.path.join(os.path.dirname(__file__), "..", "pyCC", "pyCC.py")
+
+TRIVIAL_PROGRAM = "int main(void) { return 2; }\n"
+
+## Milliseconds of imports allowed per mode: measured medians with about a
+## third on top (--lex 17.9, --parse 20.6, --tacky 20.4, --codegen 26.3,
+## full 34.1, --fast 38.1). Every mode preprocesses in process, about 2 ms
+## of imports that save a gcc -E run (about 7 ms,
+## benchmarks/bench_preprocess.py). Full and --fast also load subprocess and
+## threading to run the assembler.
+TARGET_IMPORT_MS = {
+    "--lex": 25.0,
+    "--parse": 28.0,
+    "--tacky": 28.0,
+    "--codegen": 36.0,
+    "": 46.0,
+    "--fast": 50.0,
+}
+
+RUNS = 9
+
+
+def run(args, env):
+    start = time.perf_counter()
+    subprocess.run(args, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env)
+    return time.perf_counter() - start
+
+
+def import_ms(args, env):
+    ## Cumulative times of the top level imports after site, i.e. all the
+    ## run imports beyond what `python -c pass` does
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args[1:]],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        env=env,
+    )
+    total_us = 0
+    after_site = False
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative_us, name = line[len("import time:") :].split("|")
+        ## Nested imports are indented past the single leading space
+        if name.startswith("  ") or not cumulative_us.strip().isdigit():
+            continue
+        if after_site:
+            total_us += int(cumulative_us)
+        after_site = after_site or name.strip() == "site"
+    return total_us / 1000
+
+
+def main() -> int:
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, PYTHONPYCACHEPREFIX=os.path.join(tmp, "pycache"))
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        baseline = statistics.median(run([sys.executable, "-c", "pass"], env) for _ in range(RUNS))
+        print(f"python -c pass: {baseline * 1000:.1f} ms")
+        print(f"{'mode':>10} {'import ms':>10} {'target':>7} {'wall ms':>8}")
+
+        source = os.path.join(tmp, "trivial.c")
+        with open(source, "w") as f:
+            f.write(TRIVIAL_PROGRAM)
+        for mode, target in TARGET_IMPORT_MS.items():
+            args = [sys.executable, DRIVER, source] + ([mode] if mode else [])
+            run(args, env)
+            imported = statistics.median(import_ms(args, env) for _ in range(RUNS))
+            wall = statistics.median(run(args, env) for _ in range(RUNS))
+            over = imported > target
+            failed = failed or over
+            print(
+                f"{mode or '(full)':>10} {imported:>10.1f} {target:>7.1f} {wall * 1000:>8.1f}"
+                + ("  OVER TARGET" if over else "")
+            )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Peak memory of parsing a file from a full token list vs. streamed tokens
+
+Run from the repo root:
+    python -m benchmarks.bench_stream
+"""
+
+import os
+import tempfile
+import time
+import tracemalloc
+
+from pyCC.pyCmp import lexer, parser
+
+
+def make_source(num_terms: int) -> str:
+    body = " + ".join(str(i % 97) for i in range(num_terms))
+    return f"int main(void) {{\n    return {body};\n}}\n"
+
+
+def parse_list(file_name):
+    with open(file_name, "r", encoding="utf-8") as file_in:
+        return parser.parse(lexer.lex(file_in.read()))
+
+
+def parse_streamed(file_name):
+    with open(file_name, "rb") as file_in:
+        return parser.parse(lexer.lex_iter(file_in))
+
+
+def measure(parse_fn, file_name):
+    tracemalloc.start()
+    start = time.perf_counter()
+    parse_fn(file_name)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_name = os.path.join(tmp_dir, "big.i")
+        with open(file_name, "w", encoding="utf-8") as file_out:
+            file_out.write(make_source(100_000))
+        print(f"input: {os.path.getsize(file_name)} bytes")
+        for label, parse_fn in (("token list", parse_list), ("streamed", parse_streamed)):
+            seconds, peak = measure(parse_fn, file_name)
+            print(f"{label:>10}: {seconds:8.3f} s, peak {peak / 2**20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""TACKY generation time on long operator chains
+
+Run from the repo root:
+    python -m benchmarks.bench_tackygen
+
+Time per term should stay flat as the chains grow (linear scaling), for
+left-leaning (1 + 2 + ...), right-leaning (1 + (2 + ...)) and && chains.
+The no-gc column leaves out the cyclic GC, whose full collections get
+slower as the heap (ASTs included) grows.
+"""
+
+import gc
+import time
+
+from pyCC.pyCmp import lexer, parser, tackygen
+
+
+def left_chain(num_terms: int) -> str:
+    return " + ".join(str(i % 100) for i in range(num_terms))
+
+
+def right_chain(num_terms: int) -> str:
+    return "(1 + " * (num_terms - 1) + "1" + ")" * (num_terms - 1)
+
+
+def logic_chain(num_terms: int) -> str:
+    return " && ".join(str(i % 7 + 1) for i in range(num_terms))
+
+
+def bench(expression: str, repeat: int = 3, use_gc: bool = True):
+    ast = parser.parse(lexer.lex_stream(f"int main(void) {{ return {expression}; }}"))
+    best = float("inf")
+    for _ in range(repeat):
+        if not use_gc:
+            gc.disable()
+        start = time.perf_counter()
+        tackygen.tackify(ast)
+        best = min(best, time.perf_counter() - start)
+        gc.enable()
+    return best
+
+
+def main():
+    print(f"{'chain':>6} {'terms':>8} {'seconds':>10} {'us/term':>10} {'no-gc':>10}")
+    for label, make in (("left", left_chain), ("right", right_chain), ("&&", logic_chain)):
+        for num_terms in (10_000, 30_000, 100_000):
+            expression = make(num_terms)
+            seconds = bench(expression)
+            no_gc = bench(expression, use_gc=False)
+            print(
+                f"{label:>6} {num_terms:>8} {seconds:>10.4f} "
+                f"{seconds / num_terms * 1e6:>10.2f} {no_gc / num_terms * 1e6:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
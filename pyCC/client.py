@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import socket
+import sys
+
+from pyCmp import protocol  # pylint: disable=all
+
+## Thin client for the compile server (`pyCC.py --serve`): same arguments
+## and outputs as pyCC.py's codegen, fast and default modes, but the
+## compiling happens in the server. Without a server it runs pyCC.py.
+
+DRIVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pyCC.py")
+
+## py_compile's modes, pyCmp.pyCmp isn't imported so the lexer isn't loaded
+MODE_FLAGS = {"--codegen": 3, "--fast": 5}
+
+
+def usage(program: str) -> int:
+    print(f"Usage: {program} <C file> {{--codegen|--fast}}", file=sys.stderr)
+    print(f"       {program} --stats", file=sys.stderr)
+    return 1
+
+
+def connect():
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(protocol.default_socket_path())
+    except (FileNotFoundError, ConnectionRefusedError):
+        sock.close()
+        return None
+    return sock
+
+
+def main() -> int:
+    args = sys.argv
+    if len(args) == 2 and args[1] == "--stats":
+        sock = connect()
+        if sock is None:
+            print("Err: No compile server running", file=sys.stderr)
+            return 1
+        with sock:
+            protocol.send_request(sock, protocol.STATS, 0)
+            print(protocol.read_response(sock)[1].decode())
+        return 0
+
+    if len(args) < 2 or len(args) > 3 or (len(args) == 3 and args[2] not in MODE_FLAGS):
+        return usage(args[0])
+    file_name = args[1]
+    if file_name[-2:] != ".c":
+        print(f'Err: Invalid File Type "{file_name}"', file=sys.stderr)
+        return 1
+    file_prefix = file_name[:-2]
+    ## Compile as far as assembly, linking (if asked for) happens here
+    link = len(args) == 2 or args[2] == "--fast"
+    mode = MODE_FLAGS[args[2]] if len(args) == 3 else 3
+
+    sock = connect()
+    if sock is None:
+        os.execv(sys.executable, [sys.executable, DRIVER, *args[1:]])
+    with sock:
+        protocol.send_request(sock, protocol.PATH, mode, os.path.abspath(file_name).encode())
+        status, body = protocol.read_response(sock)
+    if status != protocol.OK:
+        print(f"Err: {body.decode()}", file=sys.stderr)
+        return 1
+
+    if not link:
+        with open(f"{file_prefix}.s", "wb") as file_out:
+            file_out.write(body)
+        return 0
+
+    import subprocess
+
+    result = subprocess.run(
+        ["gcc", "-x", "assembler", "-", "-o", file_prefix], input=body, capture_output=True
+    )
+    if result.returncode != 0:
+        print("Err: Unable to Assemble", file=sys.stderr)
+        print(result.stderr.decode(errors="replace"), file=sys.stderr, end="")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
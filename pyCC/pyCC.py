@@ -1,77 +1,180 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import os
 import sys
-import subprocess
+import time
 
-from pyCmp.pyCmp import py_compile  # pylint: disable=all
+from pyCmp.pyCmp import FAST_MODE, LINK_MODE  # pylint: disable=all
 
+MODE_FLAGS = {
+    "--lex": 0,
+    "--parse": 1,
+    "--tacky": 2,
+    "--codegen": 3,
+    "--fast": FAST_MODE,
+}
 
-def main() -> int:
-    """
-    _summary_ Main Function for Compiler
-    """
+## The stages before codegen print their output, which would interleave
+BATCH_MODES = (3, LINK_MODE, FAST_MODE)
 
-    args = sys.argv
-    mode = 4
-    if len(args) < 2 or len(args) > 3:
-        print(f"Usage: {args[0]} <C file> {{--lex|--parse|--codegen}}", file=sys.stderr)
+
+def open_cache():
+    ## The compile cache, when $PYCC_CACHE_DIR asks for one. Imported only
+    ## then, it loads hashlib, json and tempfile
+    if not os.environ.get("PYCC_CACHE_DIR"):
+        return None
+    from pyCmp.cache import cache_from_env  # pylint: disable=all
+
+    return cache_from_env()
+
+
+def cache_main(args: list[str]) -> int:
+    ## --cache-stats / --cache-clear
+    cache = open_cache()
+    if cache is None:
+        print("Err: PYCC_CACHE_DIR is not set", file=sys.stderr)
         return 1
+    if args[1] == "--cache-clear":
+        cache.clear()
+        return 0
+    stats = cache.stats()
+    lookups = stats["hits"] + stats["misses"]
+    for name, value in stats.items():
+        print(f"{name:<18} {value}")
+    print(f"{'hit rate':<18} {stats['hits'] / lookups if lookups else 0.0:.1%}")
+    return 0
 
-    if len(args) == 3:
-        if args[2] == "--lex":
-            mode = 0
-        elif args[2] == "--parse":
-            mode = 1
-        elif args[2] == "--tacky":
-            mode = 2
-        elif args[2] == "--codegen":
-            mode = 3
+
+def usage(program: str) -> int:
+    print(
+        f"Usage: {program} <C file> [--lex|--parse|--codegen|--fast] [--keep-temps] "
+        "[--direct-link|--native]",
+        file=sys.stderr,
+    )
+    print(f"       {program} --serve [<socket>]", file=sys.stderr)
+    print(f"       {program} {{--cache-stats|--cache-clear}}", file=sys.stderr)
+    print(
+        f"       {program} {{--batch|--pipeline}} [-j <jobs>] [--codegen|--fast] "
+        "[--keep-temps] [--direct-link|--native] <C file|@manifest>...",
+        file=sys.stderr,
+    )
+    return 1
+
+
+def parse_batch_args(args: list[str]):
+    ## (mode, job count, file names) of a --batch/--pipeline command line,
+    ## None if it's invalid
+    from pyCmp.driver import read_manifest  # pylint: disable=all
+
+    mode = LINK_MODE
+    jobs = None
+    file_names = []
+    arg_iter = iter(args[2:])
+    for arg in arg_iter:
+        if arg in MODE_FLAGS:
+            mode = MODE_FLAGS[arg]
+        elif arg == "-j":
+            jobs = next(arg_iter, None)
+            if jobs is None or not jobs.isdigit() or int(jobs) < 1:
+                return None
+            jobs = int(jobs)
+        elif arg.startswith("@"):
+            file_names.extend(read_manifest(arg[1:]))
         else:
-            print(
-                f"Usage: {args[0]} <C file> {{--lex|--parse|--codegen}}",
-                file=sys.stderr,
-            )
-            return 1
+            file_names.append(arg)
+    if mode not in BATCH_MODES or not file_names:
+        return None
+    return mode, jobs, file_names
 
-    file_name = args[1]
-    if file_name[-2:] != ".c":
-        print(f'Err: Invalid File Type "{file_name}"', file=sys.stderr)
-        return 1
-    file_prefix = file_name[:-2]
 
-    result = subprocess.run(
-        ["gcc", "-E", "-P", file_name, "-o", f"{file_prefix}.i"],
-        capture_output=True,
-        text=True,
-        check=True,
+def report(result):
+    if result.ok:
+        print(f"ok    {result.file_name} ({result.seconds * 1000:.1f} ms)")
+    else:
+        print(f"FAIL  {result.file_name}: {result.error}")
+
+
+def summarize(results, seconds: float) -> int:
+    failed = sum(not result.ok for result in results)
+    print(
+        f"{len(results) - failed}/{len(results)} compiled, {failed} failed "
+        f"in {seconds:.2f} s ({len(results) / seconds:.0f} files/s)"
     )
+    return 1 if failed else 0
 
-    if result.returncode != 0:
-        print("Err: Unable to PreProcess", file=sys.stderr)
-        print(result.stderr, file=sys.stderr, end="")
-        return 1
-    ## Compile time : )
-    py_compile(f"{file_prefix}.i", f"{file_prefix}.s", mode)
-    subprocess.run(["rm", f"{file_prefix}.i"], check=True)
 
-    if mode < 4:
+def batch_main(args: list[str], keep_temps: bool, direct_link: bool, native: bool) -> int:
+    ## Compile every file named in `args`, either across a process pool
+    ## (--batch) or through the asyncio pipeline (--pipeline), which never
+    ## writes intermediate files and always links through gcc
+    parsed = parse_batch_args(args)
+    if parsed is None or ((keep_temps or direct_link or native) and args[1] == "--pipeline"):
+        return usage(args[0])
+    mode, jobs, file_names = parsed
+    if native and mode != LINK_MODE:
+        return usage(args[0])
+
+    start = time.perf_counter()
+    if args[1] == "--batch":
+        from pyCmp.driver import compile_batch  # pylint: disable=all
+
+        results = compile_batch(
+            file_names, mode, jobs, report, open_cache(), keep_temps, direct_link, native
+        )
+    else:
+        from pyCmp.pipeline import compile_pipelined  # pylint: disable=all
+
+        results, stats = compile_pipelined(file_names, mode, jobs, report)
+        print(stats)
+    return summarize(results, time.perf_counter() - start)
+
+
+def main() -> int:
+    """
+    _summary_ Main Function for Compiler
+    """
+
+    ## These go anywhere on the line
+    keep_temps = "--keep-temps" in sys.argv
+    direct_link = "--direct-link" in sys.argv
+    native = "--native" in sys.argv
+    args = [
+        arg for arg in sys.argv if arg not in ("--keep-temps", "--direct-link", "--native")
+    ]
+    if len(args) >= 2 and args[1] in ("--batch", "--pipeline"):
+        return batch_main(args, keep_temps, direct_link, native)
+    if len(args) == 2 and args[1] in ("--cache-stats", "--cache-clear"):
+        return cache_main(args)
+    if len(args) in (2, 3) and args[1] == "--serve":
+        from pyCmp.server import serve  # pylint: disable=all
+
+        try:
+            serve(args[2] if len(args) == 3 else None)
+        except OSError as err:
+            print(f"Err: {err}", file=sys.stderr)
+            return 1
         return 0
 
-    ## Assembling time : )
-    result = subprocess.run(
-        ["gcc", f"{file_prefix}.s", "-o", file_prefix],
-        capture_output=True,
-        text=True,
-        check=True,
-    )
-    if result.returncode != 0:
-        print("Err: Unable to PreProcess", file=sys.stderr)
-        print(result.stderr, file=sys.stderr, end="")
-        return 1
+    mode = LINK_MODE
+    if len(args) < 2 or len(args) > 3:
+        return usage(args[0])
+
+    if len(args) == 3:
+        if args[2] not in MODE_FLAGS:
+            return usage(args[0])
+        mode = MODE_FLAGS[args[2]]
 
-    subprocess.run(["rm", f"{file_prefix}.s"], check=True)
+    if native and mode != LINK_MODE:
+        return usage(args[0])
 
+    ## The driver is only loaded once there's a file to compile
+    from pyCmp.driver import compile_file  # pylint: disable=all
+
+    result = compile_file(args[1], mode, open_cache(), keep_temps, direct_link, native)
+    if not result.ok:
+        print(f"Err: {result.error}", file=sys.stderr)
+        return 1
     return 0
 
 
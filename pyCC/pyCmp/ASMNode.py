@@ -1,9 +1,18 @@
 from enum import Enum, auto
-from typing import List
+
+from .tackyNode import label_text, var_text
 
 
 class ASM:
-    pass
+    __slots__ = ()
+
+
+def asm_label(label: int | str) -> str:
+    ## Label ids from TACKY become text here, str labels are already spelled
+    ## the way the assembler wants them
+    if type(label) is int:
+        return f".L{label_text(label)}"
+    return label
 
 
 ## TODO: make this register allocation stuff better
@@ -21,12 +30,42 @@ class RegisterEnum(Enum):
 
 
 class OperandASM(ASM):
-    pass
+    """Immutable operand
+
+    Registers, stack slots and small ints are canonical: constructing one
+    that already exists returns the existing object, so identity is
+    equality and `is` is enough to compare them.
+    """
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        ## Rebuild through the constructor, so canonical operands stay unique
+        return type(self), (getattr(self, self.__match_args__[0]),)
 
 
 class RegisterASM(OperandASM):
-    def __init__(self, reg: RegisterEnum):
-        self.val = reg
+    __slots__ = ("val",)
+    __match_args__ = ("val",)
+
+    ## One instance per register
+    _instances = {}
+
+    def __new__(cls, reg: RegisterEnum):
+        instance = cls._instances.get(reg)
+        if instance is None:
+            if not isinstance(reg, RegisterEnum):
+                raise TypeError("Invalid Register: ", reg)
+            instance = object.__new__(cls)
+            object.__setattr__(instance, "val", reg)
+            cls._instances[reg] = instance
+        return instance
 
     def __repr__(self):
         return repr(self.val)
@@ -57,10 +96,28 @@ class RegisterASM(OperandASM):
                 raise TypeError("Invalid Register: ", self.val)
 
 
+## Immediates in this range are cached, others get a fresh IntASM each time
+SMALL_INT_MIN = -128
+SMALL_INT_MAX = 255
+
+
 class IntASM(OperandASM):
     # Right now it's just immediate ints
-    def __init__(self, val: int):
-        self.val = val
+    __slots__ = ("val",)
+    __match_args__ = ("val",)
+
+    _small = [None] * (SMALL_INT_MAX - SMALL_INT_MIN + 1)
+
+    def __new__(cls, val: int):
+        if SMALL_INT_MIN <= val <= SMALL_INT_MAX:
+            instance = cls._small[val - SMALL_INT_MIN]
+            if instance is not None:
+                return instance
+            instance = cls._small[val - SMALL_INT_MIN] = object.__new__(cls)
+        else:
+            instance = object.__new__(cls)
+        object.__setattr__(instance, "val", val)
+        return instance
 
     def __repr__(self):
         return f"INT({self.val})"
@@ -70,19 +127,35 @@ class IntASM(OperandASM):
 
 
 class PsuedoRegASM(OperandASM):
-    def __init__(self, identifier: str):
-        self.identifier = identifier
+    __slots__ = ("identifier",)
+    __match_args__ = ("identifier",)
+
+    def __new__(cls, identifier: int | str):
+        instance = object.__new__(cls)
+        object.__setattr__(instance, "identifier", identifier)
+        return instance
 
     def __repr__(self):
-        return f"PsuedoReg({self.identifier})"
+        return f"PsuedoReg({var_text(self.identifier)})"
     
     def codegen(self):
         raise Exception("You should not be generating assembly from a PsuedoRegister")
 
 
 class StackASM(OperandASM):
-    def __init__(self, num_vals: int):
-        self.index = num_vals
+    __slots__ = ("index",)
+    __match_args__ = ("index",)
+
+    ## One instance per slot
+    _instances = {}
+
+    def __new__(cls, index: int):
+        instance = cls._instances.get(index)
+        if instance is None:
+            instance = object.__new__(cls)
+            object.__setattr__(instance, "index", index)
+            cls._instances[index] = instance
+        return instance
 
     def __repr__(self):
         return f"Stack({self.index})"
@@ -92,11 +165,14 @@ class StackASM(OperandASM):
 
 
 class InstructionASM(ASM):
-    pass
+    __slots__ = ()
 
 
 class MoveASM(InstructionASM):
     # WE only have move rn
+    __slots__ = ("src", "dst")
+    __match_args__ = ("src", "dst")
+
     def __init__(self, src: OperandASM, dst: OperandASM):
         self.src = src
         self.dst = dst
@@ -148,6 +224,9 @@ class BinaryOpASM(Enum):
 
 class BinaryASM(InstructionASM):
 
+    __slots__ = ("op", "r_src", "dst")
+    __match_args__ = ("op", "r_src", "dst")
+
     def __init__(self, op: BinaryOpASM, r_src: OperandASM, dst: OperandASM):
         self.op = op
         self.r_src = r_src
@@ -174,6 +253,9 @@ class UnaryOpASM(Enum):
 
 class UnaryASM(InstructionASM):
 
+    __slots__ = ("op", "dst")
+    __match_args__ = ("op", "dst")
+
     def __init__(self, op: UnaryOpASM, dst: OperandASM):
         self.op = op
         self.dst = dst
@@ -186,6 +268,9 @@ class UnaryASM(InstructionASM):
 
 
 class IDivASM(InstructionASM):
+    __slots__ = ("src",)
+    __match_args__ = ("src",)
+
     def __init__(self, src: OperandASM):
         self.src = src
 
@@ -197,6 +282,9 @@ class IDivASM(InstructionASM):
 
 
 class CdqASM(InstructionASM):
+    __slots__ = ()
+    __match_args__ = ()
+
     def __repr__(self):
         return "CDQ"
 
@@ -206,6 +294,9 @@ class CdqASM(InstructionASM):
 
 class AllocateStack(InstructionASM):
 
+    __slots__ = ("num_vals",)
+    __match_args__ = ("num_vals",)
+
     def __init__(self, num_vals: int):
         self.num_vals = num_vals
 
@@ -217,6 +308,9 @@ class AllocateStack(InstructionASM):
 
 
 class ReturnASM(InstructionASM):
+    __slots__ = ()
+    __match_args__ = ()
+
     def __repr__(self):
         return "RET"
 
@@ -228,6 +322,10 @@ class ReturnASM(InstructionASM):
 
 
 class CmpASM(InstructionASM):
+    ## Operands in AT&T order, flags are set from right_operand - left_operand
+    __slots__ = ("left_operand", "right_operand")
+    __match_args__ = ("left_operand", "right_operand")
+
     def __init__(self, left_operand: OperandASM, right_operand: OperandASM):
         self.left_operand = left_operand
         self.right_operand = right_operand
@@ -240,25 +338,31 @@ class CmpASM(InstructionASM):
 
 
 class LabelASM(InstructionASM):
-    def __init__(self, name: str):
+    __slots__ = ("name",)
+    __match_args__ = ("name",)
+
+    def __init__(self, name: int | str):
         self.name = name
 
     def __repr__(self):
-        return f"Label({self.name})"
-    
+        return f"Label({asm_label(self.name)})"
+
     def codegen(self):
-        return f".L{self.name}:"
+        return f"{asm_label(self.name)}:"
 
 
 class JumpASM(InstructionASM):
-    def __init__(self, dest: str):
+    __slots__ = ("dest",)
+    __match_args__ = ("dest",)
+
+    def __init__(self, dest: int | str):
         self.dest = dest
 
     def __repr__(self):
-        return f"JMP({self.dest})"
+        return f"JMP({asm_label(self.dest)})"
 
     def codegen(self):
-        return f"jmp {self.dest}"
+        return f"jmp {asm_label(self.dest)}"
 
 class CondFlags(Enum):
     E = auto()
@@ -286,17 +390,23 @@ class CondFlags(Enum):
 
 
 class JumpCCASM(InstructionASM):
-    def __init__(self, cond_code: CondFlags, name: str):
+    __slots__ = ("cond_code", "name")
+    __match_args__ = ("cond_code", "name")
+
+    def __init__(self, cond_code: CondFlags, name: int | str):
         self.cond_code = cond_code
         self.name = name
 
     def __repr__(self):
-        return f"JMPCC({self.cond_code}, {self.name})"
+        return f"JMPCC({self.cond_code}, {asm_label(self.name)})"
 
     def codegen(self):
-        return f"j{self.cond_code.codegen()} {self.name}"
+        return f"j{self.cond_code.codegen()} {asm_label(self.name)}"
 
 class SetCCASM(InstructionASM):
+    __slots__ = ("cond_code", "src")
+    __match_args__ = ("cond_code", "src")
+
     def __init__(self, cond_code: CondFlags, src: OperandASM):
         self.cond_code = cond_code
         self.src = src
@@ -311,7 +421,10 @@ class SetCCASM(InstructionASM):
 
 
 class FunctionASM(ASM):
-    def __init__(self, name: str, instructions: List[InstructionASM]):
+    __slots__ = ("name", "instructions")
+    __match_args__ = ("name", "instructions")
+
+    def __init__(self, name: str, instructions: list[InstructionASM]):
         self.name = name
         self.instructions = instructions
 
@@ -334,6 +447,9 @@ class FunctionASM(ASM):
 
 
 class ProgramASM(ASM):
+    __slots__ = ("function",)
+    __match_args__ = ("function",)
+
     def __init__(self, function: FunctionASM):
         self.function = function
 
@@ -1,29 +1,51 @@
 from enum import Enum, auto
-from .ASMNode import (
-    FunctionASM,
-    IntASM,
-    MoveASM,
-    ProgramASM,
-    RegisterASM,
-    RegisterEnum,
-    ReturnASM,
-)
+
+## The assemble() methods import ASMNode when they're called: the lexer and
+## parser import this module, and they shouldn't pay for the backend
 
 
 class ASTNode:
     # Base Node Class
-    pass
+    __slots__ = ()
+
+    def repr_parts(self):
+        ## Pieces of this node's repr, str pieces are copied as they are,
+        ## anything else gets repr'd by render
+        raise NotImplementedError("repr_parts isn't implemented for ", type(self))
+
+    def __repr__(self):
+        return render(self)
+
+
+def render(node) -> str:
+    """repr of an AST, walked with a stack so deep trees don't recurse"""
+    res = []
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        if type(item) is str:
+            res.append(item)
+        elif isinstance(item, ASTNode):
+            stack.extend(reversed(item.repr_parts()))
+        else:
+            res.append(repr(item))
+    return "".join(res)
 
 
 class IdentifierNode(ASTNode):
+    __slots__ = ("name",)
+    __match_args__ = ("name",)
+
     def __init__(self, name: str):
         self.name = name
 
-    def __repr__(self):
-        return self.name
+    def repr_parts(self):
+        return [self.name]
 
 
 class ExpressionNode(ASTNode):
+    __slots__ = ()
+
     def assemble(self):
         raise ValueError(
             "ExpressionNode is an Abstract Class, something went terribly wrong"
@@ -31,13 +53,18 @@ class ExpressionNode(ASTNode):
 
 
 class ConstIntNode(ExpressionNode):
+    __slots__ = ("value",)
+    __match_args__ = ("value",)
+
     def __init__(self, value: int):
         self.value = value
 
-    def __repr__(self):
-        return f"ConstIntNode({repr(self.value)})"
+    def repr_parts(self):
+        return [f"ConstIntNode({repr(self.value)})"]
 
     def assemble(self):
+        from .ASMNode import IntASM
+
         return IntASM(self.value)
 
 
@@ -48,12 +75,15 @@ class UnaryOperatorNode(Enum):
 
 
 class UnaryExpressionNode(ExpressionNode):
+    __slots__ = ("op", "expr")
+    __match_args__ = ("op", "expr")
+
     def __init__(self, op: UnaryOperatorNode, expr: ExpressionNode):
         self.op = op
         self.expr = expr
 
-    def __repr__(self):
-        return f"Unary({repr(self.op)}, {repr(self.expr)})"
+    def repr_parts(self):
+        return [f"Unary({repr(self.op)}, ", self.expr, ")"]
 
 
 class BinaryOperatorNode(Enum):
@@ -78,48 +108,66 @@ class BinaryOperatorNode(Enum):
 
 
 class BinaryExpressionNode(ExpressionNode):
+    __slots__ = ("op", "left_expr", "right_expr")
+    __match_args__ = ("op", "left_expr", "right_expr")
+
     def __init__(self, op: BinaryOperatorNode, left_expr: ExpressionNode, right_expr: ExpressionNode):
         self.op = op
         self.left_expr = left_expr
         self.right_expr = right_expr
 
-    def __repr__(self):
-        return f"Binary({repr(self.op)}, {repr(self.left_expr)}, {repr(self.right_expr)})"
+    def repr_parts(self):
+        return [f"Binary({repr(self.op)}, ", self.left_expr, ", ", self.right_expr, ")"]
 
 
 class ReturnNode(ASTNode):
+    __slots__ = ("expression",)
+    __match_args__ = ("expression",)
+
     def __init__(self, expression: ExpressionNode):
         self.expression = expression
 
-    def __repr__(self):
-        return f"ReturnNode({repr(self.expression)})"
+    def repr_parts(self):
+        return ["ReturnNode(", self.expression, ")"]
 
     def assemble(self):
+        from .ASMNode import MoveASM, RegisterASM, RegisterEnum, ReturnASM
+
         expr_asm = self.expression.assemble()
         return [MoveASM(expr_asm, RegisterASM(RegisterEnum.EAX)), ReturnASM()]
 
 
 class FunctionNode(ASTNode):
+    __slots__ = ("identifier", "statement")
+    __match_args__ = ("identifier", "statement")
+
     def __init__(self, identifier: IdentifierNode, statement: ReturnNode):
         self.identifier = identifier
         self.statement = statement
 
-    def __repr__(self):
-        return f"FunctionNode({repr(self.identifier)}, {repr(self.statement)})"
+    def repr_parts(self):
+        return ["FunctionNode(", self.identifier, ", ", self.statement, ")"]
 
     def assemble(self):
+        from .ASMNode import FunctionASM
+
         func_name = repr(self.identifier)
         statement_asm = self.statement.assemble()
         return FunctionASM(func_name, statement_asm)
 
 
 class ProgramNode(ASTNode):
+    __slots__ = ("function",)
+    __match_args__ = ("function",)
+
     def __init__(self, function: FunctionNode):
         self.function = function
 
-    def __repr__(self):
-        return f"ProgramNode({repr(self.function)})"
+    def repr_parts(self):
+        return ["ProgramNode(", self.function, ")"]
 
     def assemble(self):
+        from .ASMNode import ProgramASM
+
         func_asm = self.function.assemble()
         return ProgramASM(func_asm)
@@ -0,0 +1,138 @@
+from collections.abc import Callable
+
+from .ASMNode import (
+    AllocateStack,
+    BinaryASM,
+    BinaryOpASM,
+    CdqASM,
+    CmpASM,
+    CondFlags,
+    FunctionASM,
+    IDivASM,
+    JumpASM,
+    JumpCCASM,
+    LabelASM,
+    MoveASM,
+    ProgramASM,
+    RegisterASM,
+    ReturnASM,
+    SetCCASM,
+    StackASM,
+    UnaryASM,
+    UnaryOpASM,
+    asm_label,
+)
+
+## Streaming emission: the assembly text is written to a sink (anything
+## with a `write`, usually a buffered file) in chunks of lines, so it never
+## exists as one string next to the ASM it came from. The output is the
+## same text the codegen() methods build.
+
+## Lines joined into one write
+CHUNK_LINES = 4096
+
+FUNCTION_HEADER = "\t.globl %s\n%s:\npushq %%rbp\nmovq %%rsp, %%rbp\n"
+PROGRAM_FOOTER = '\n.section .note.GNU-stack,"",@progbits\n'
+
+## Per opcode line templates, operands go in with %
+MOVE = "\tmovl %s, %s\n"
+CMP = "\tcmpl %s, %s\n"
+IDIV = "\tidivl %s\n"
+ALLOCATE = "\tsubq $%d, %%rsp\n"
+CDQ = "\tcdq\n"
+RETURN = "\tmovq %rbp, %rsp\npopq %rbp\nret\n"
+LABEL = "\t%s:\n"
+JUMP = "\tjmp %s\n"
+BINARY = {
+    op: f"\t{op.codegen()} %s, %s\n"
+    for op in (
+        BinaryOpASM.ADD,
+        BinaryOpASM.SUB,
+        BinaryOpASM.MUL,
+        BinaryOpASM.LSHIFT,
+        BinaryOpASM.RSHIFT,
+        BinaryOpASM.BAND,
+        BinaryOpASM.BOR,
+        BinaryOpASM.BXOR,
+    )
+}
+UNARY = {op: f"\t{op.codegen()} %s\n" for op in UnaryOpASM}
+JUMP_CC = {cond: f"\tj{cond.codegen()} %s\n" for cond in CondFlags}
+SET_CC = {cond: f"\tset{cond.codegen()} %s\n" for cond in CondFlags}
+
+
+class OperandText(dict):
+    """Register/immediate -> assembly text, each one is formatted once
+
+    Registers and small ints are canonical objects, so most lookups hit.
+    Stack slots are formatted on every use instead, a function can have as
+    many of them as it has temporaries.
+    """
+
+    def __missing__(self, operand):
+        text = self[operand] = operand.codegen()
+        return text
+
+
+def operandText():
+    ## Text of an operand, for one emission
+    cached = OperandText().__getitem__
+
+    def text(operand):
+        if type(operand) is StackASM:
+            return f"{operand.index}(%rbp)"
+        return cached(operand)
+
+    return text
+
+
+def emitSetCC(ins: SetCCASM, text):
+    if type(ins.src) is RegisterASM:
+        ## Not produced by asmgen, keep whatever codegen() says
+        return f"\t{ins.codegen()}\n"
+    return SET_CC[ins.cond_code] % text(ins.src)
+
+
+EMITTERS = {
+    MoveASM: lambda ins, text: MOVE % (text(ins.src), text(ins.dst)),
+    BinaryASM: lambda ins, text: BINARY[ins.op] % (text(ins.r_src), text(ins.dst)),
+    UnaryASM: lambda ins, text: UNARY[ins.op] % text(ins.dst),
+    CmpASM: lambda ins, text: CMP % (text(ins.left_operand), text(ins.right_operand)),
+    IDivASM: lambda ins, text: IDIV % text(ins.src),
+    AllocateStack: lambda ins, text: ALLOCATE % ins.num_vals,
+    CdqASM: lambda ins, text: CDQ,
+    ReturnASM: lambda ins, text: RETURN,
+    LabelASM: lambda ins, text: LABEL % asm_label(ins.name),
+    JumpASM: lambda ins, text: JUMP % asm_label(ins.dest),
+    JumpCCASM: lambda ins, text: JUMP_CC[ins.cond_code] % asm_label(ins.name),
+    SetCCASM: emitSetCC,
+}
+
+
+def emitFunction(function: FunctionASM, write: Callable[[str], object]):
+    write(FUNCTION_HEADER % (function.name, function.name))
+    text = operandText()
+    lines = []
+    line = lines.append
+    for ins in function.instructions:
+        emitter = EMITTERS.get(type(ins))
+        if emitter is None:
+            raise ValueError("Invalid Instruction", ins)
+        line(emitter(ins, text))
+        if len(lines) >= CHUNK_LINES:
+            write("".join(lines))
+            lines.clear()
+    if lines:
+        write("".join(lines))
+
+
+def emitProgram(program: ProgramASM, sink):
+    """Write the assembly for `program` to `sink`
+
+    Args:
+        program (ProgramASM): The generated assembly
+        sink: Anything with a `write(str)`, e.g. a file opened for text
+    """
+    write = sink.write
+    emitFunction(program.function, write)
+    write(PROGRAM_FOOTER)
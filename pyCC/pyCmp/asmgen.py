@@ -22,6 +22,7 @@ from .ASMNode import (
     ProgramASM,
     UnaryOpASM,
 )
+from .asmemit import emitProgram
 from .tackyNode import (
     BinaryOpTacky,
     BinaryTacky,
@@ -37,6 +38,7 @@ from .tackyNode import (
     UnaryTacky,
     FuncTacky,
     ProgramTacky,
+    SymbolTable,
     UnaryOpTacky,
 )
 
@@ -63,6 +65,24 @@ REL_TO_FLAGS = {
 }
 
 
+## Canonical operands, RegisterASM/IntASM return these same objects anyway
+EAX = RegisterASM(RegisterEnum.EAX)
+ECX = RegisterASM(RegisterEnum.ECX)
+CL = RegisterASM(RegisterEnum.CL)
+EDX = RegisterASM(RegisterEnum.EDX)
+R10D = RegisterASM(RegisterEnum.R10D)
+R11D = RegisterASM(RegisterEnum.R11D)
+ZERO = IntASM(0)
+
+
+def labelFromTacky(name):
+    ## Label ids are passed through and spelled out at emission, str names
+    ## from hand written TACKY get their ".L" prefix now
+    if type(name) is int:
+        return name
+    return f".L{name}"
+
+
 def asmFromTacky(node: TackyNode):
     match node:
         case ConstIntTacky(val=val):
@@ -71,266 +91,72 @@ def asmFromTacky(node: TackyNode):
             return PsuedoRegASM(name)
         case ReturnTacky(val=val):
             asm_val = asmFromTacky(val)
-            return [MoveASM(asm_val, RegisterASM(RegisterEnum.EAX)), ReturnASM()]
+            return [MoveASM(asm_val, EAX), ReturnASM()]
         case CopyTacky(src=src, dst=dst):
             return [MoveASM(asmFromTacky(src), asmFromTacky(dst))]
         case UnaryTacky(op=op, src=src, dst=dst) if op == UnaryOpTacky.NOT:
+            asm_dst = asmFromTacky(dst)
             return [
-                CmpASM(IntASM(0), asmFromTacky(src)),
-                MoveASM(IntASM(0), asmFromTacky(dst)),
-                SetCCASM(CondFlags.E, asmFromTacky(dst))
+                CmpASM(asmFromTacky(src), ZERO),
+                MoveASM(ZERO, asm_dst),
+                SetCCASM(CondFlags.E, asm_dst)
             ]
         case UnaryTacky(op=op, src=src, dst=dst):
+            asm_dst = asmFromTacky(dst)
             return [
-                MoveASM(asmFromTacky(src), asmFromTacky(dst)),
-                UnaryASM(OP_TABLE[op], asmFromTacky(dst)),
+                MoveASM(asmFromTacky(src), asm_dst),
+                UnaryASM(OP_TABLE[op], asm_dst),
             ]
         case BinaryTacky(
             op=op, left_val=left_val, right_val=right_val, dst=dst
         ) if op in REL_TO_FLAGS:
+            asm_dst = asmFromTacky(dst)
+            ## left_val - right_val, in AT&T order
             return [
-                CmpASM(asmFromTacky(left_val), asmFromTacky(right_val)),
-                MoveASM(IntASM(0), asmFromTacky(dst)),
-                SetCCASM(REL_TO_FLAGS[op], asmFromTacky(dst)),
+                CmpASM(asmFromTacky(right_val), asmFromTacky(left_val)),
+                MoveASM(ZERO, asm_dst),
+                SetCCASM(REL_TO_FLAGS[op], asm_dst),
             ]
         case BinaryTacky(op=op, left_val=left_val, right_val=right_val, dst=dst):
+            asm_dst = asmFromTacky(dst)
             if op == BinaryOpTacky.DIV or op == BinaryOpTacky.MOD:
-                dst_reg = RegisterEnum.EAX
+                dst_reg = EAX
                 if op == BinaryOpTacky.MOD:
-                    dst_reg = RegisterEnum.EDX
+                    dst_reg = EDX
 
                 return [
-                    MoveASM(asmFromTacky(left_val), RegisterASM(RegisterEnum.EAX)),
+                    MoveASM(asmFromTacky(left_val), EAX),
                     CdqASM(),
                     IDivASM(asmFromTacky(right_val)),
-                    MoveASM(RegisterASM(dst_reg), asmFromTacky(dst)),
+                    MoveASM(dst_reg, asm_dst),
                 ]
             return [
-                MoveASM(asmFromTacky(left_val), asmFromTacky(dst)),
-                BinaryASM(OP_TABLE[op], asmFromTacky(right_val), asmFromTacky(dst)),
+                MoveASM(asmFromTacky(left_val), asm_dst),
+                BinaryASM(OP_TABLE[op], asmFromTacky(right_val), asm_dst),
             ]
         case JumpTacky(target=LabelTacky(name=name)):
             return [
-                JumpASM(f".L{name}")
+                JumpASM(labelFromTacky(name))
             ]
         case JumpIfZero(condition=condition, target=LabelTacky(name=name)):
             return [
-                # It's easier to keep the known constant on the RHS
+                # It's easier to keep the known constant as the source
                 # That way we don't need to waste stack space on IntAsm(0)
                 # Which will ALWAYS be zero
-                CmpASM(asmFromTacky(condition), IntASM(0)),
-                JumpCCASM(CondFlags.E, f".L{name}"),
+                CmpASM(ZERO, asmFromTacky(condition)),
+                JumpCCASM(CondFlags.E, labelFromTacky(name)),
             ]
         case JumpIfNotZero(condition=condition, target=LabelTacky(name=name)):
             return [
-                CmpASM(asmFromTacky(condition), IntASM(0)),
-                JumpCCASM(CondFlags.NE, f".L{name}"),
+                CmpASM(ZERO, asmFromTacky(condition)),
+                JumpCCASM(CondFlags.NE, labelFromTacky(name)),
             ]
         case LabelTacky(name=name):
-            return [LabelASM(name)]
-        case FuncTacky(identifier=identifier, instructions=instructions):
-            res = [AllocateStack(0)]
-            # Number of bytes/int in our version of C
-            sizeof_int = 4
-
-            num_vars = 0
-            found = {}
-            for instruction in instructions:
-                new_ins = asmFromTacky(instruction)
-                for ins in new_ins:
-                    match ins:
-                        case MoveASM(
-                            src=PsuedoRegASM(identifier=src_id),
-                            dst=PsuedoRegASM(identifier=dst_id),
-                        ):
-                            if src_id not in found:
-                                num_vars += 1
-                                found[src_id] = num_vars
-                            if dst_id not in found:
-                                num_vars += 1
-                                found[dst_id] = num_vars
-                            new_src = StackASM(-1 * sizeof_int * found[src_id])
-                            new_dst = StackASM(-1 * sizeof_int * found[dst_id])
-                            res.append(MoveASM(new_src, RegisterASM(RegisterEnum.R10D)))
-                            res.append(MoveASM(RegisterASM(RegisterEnum.R10D), new_dst))
-                        case MoveASM(src=PsuedoRegASM(identifier=src_id), dst=cur_dst):
-                            if src_id not in found:
-                                num_vars += 1
-                                found[src_id] = num_vars
-                            new_src = StackASM(-1 * sizeof_int * found[src_id])
-                            res.append(MoveASM(new_src, cur_dst))
-                        case MoveASM(
-                            src=cur_source, dst=PsuedoRegASM(identifier=dst_id)
-                        ):
-                            if dst_id not in found:
-                                num_vars += 1
-                                found[dst_id] = num_vars
-                            new_dst = StackASM(-1 * sizeof_int * found[dst_id])
-                            res.append(MoveASM(cur_source, new_dst))
-
-                        case CmpASM(left_operand=IntASM(val=x), right_operand=PsuedoRegASM(identifier=r_name)):
-                            
-                            # Constant to R11 (second operand)
-                            res.append(MoveASM(IntASM(x), RegisterASM(RegisterEnum.R11D)))
-                            if r_name not in found:
-                                num_vars += 1
-                                found[r_name] = num_vars
-
-                            new_right = StackASM(-1 * sizeof_int * found[r_name])
-                            res.append(CmpASM(new_right, RegisterASM(RegisterEnum.R11D)))
-                        case CmpASM(left_operand=IntASM(val=x), right_operand=right_operand):
-                            res.append(MoveASM(IntASM(x), RegisterASM(RegisterEnum.R11D)))
-                            res.append(CmpASM(right_operand, RegisterASM(RegisterEnum.R11D)))
-
-                        case CmpASM(left_operand=PsuedoRegASM(identifier=l_name), right_operand=PsuedoRegASM(identifier=r_name)):
-                            if l_name not in found:
-                                num_vars += 1
-                                found[l_name] = num_vars
-                            if r_name not in found:
-                                num_vars += 1
-                                found[r_name] = num_vars
-
-                            new_left = StackASM(-1 * sizeof_int * found[l_name])
-                            new_right = StackASM(-1 * sizeof_int * found[r_name])
-                            res.append(MoveASM(new_right, RegisterASM(RegisterEnum.R10D)))
-                            res.append(CmpASM(RegisterASM(RegisterEnum.R10D), new_left))
-
-                        case CmpASM(left_operand=PsuedoRegASM(identifier=l_name), right_operand=right_operand):
-                            if l_name not in found:
-                                num_vars += 1
-                                found[l_name] = num_vars
-                            new_left = StackASM(-1 * sizeof_int * found[l_name])
-                            res.append(CmpASM(right_operand, new_left))
-
-                        case CmpASM(left_operand=left_operand, right_operand=PsuedoRegASM(identifier=r_name)):
-                            if r_name not in found:
-                                num_vars += 1
-                                found[r_name] = num_vars
-
-                            new_right = StackASM(-1 * sizeof_int * found[r_name])
-                            res.append(CmpASM(new_right, left_operand))
-
-                        case SetCCASM(cond_code=cond_code, src=PsuedoRegASM(identifier=name)):
-                            if name not in found:
-                                num_vars += 1
-                                found[name] = num_vars
-                            new_src = StackASM(-1 * sizeof_int * found[name])
-                            res.append(SetCCASM(cond_code, new_src))
-
-
-                        case UnaryASM(op=cur_op, dst=PsuedoRegASM(identifier=dst_id)):
-                            if dst_id not in found:
-                                num_vars += 1
-                                found[dst_id] = num_vars
-                            new_dst = StackASM(-1 * sizeof_int * found[dst_id])
-                            res.append(UnaryASM(cur_op, new_dst))
-
-                        case BinaryASM(
-                            op=cur_op,
-                            r_src=PsuedoRegASM(identifier=r_src_id),
-                            dst=PsuedoRegASM(identifier=dst_id),
-                        ):
-                            if r_src_id not in found:
-                                num_vars += 1
-                                found[r_src_id] = num_vars
-                            if dst_id not in found:
-                                num_vars += 1
-                                found[dst] = num_vars
-                            new_r_src = StackASM(-1 * sizeof_int * found[r_src_id])
-                            new_dst = StackASM(-1 * sizeof_int * found[dst_id])
-
-                            res.append(
-                                MoveASM(new_r_src, RegisterASM(RegisterEnum.R10D))
-                            )
-                            if cur_op == BinaryOpASM.MUL:
-                                ## TODO: rename the src/dst parameters
-                                res.append(
-                                    MoveASM(new_dst, RegisterASM(RegisterEnum.R11D))
-                                )
-                                res.append(
-                                    BinaryASM(
-                                        cur_op,
-                                        RegisterASM(RegisterEnum.R10D),
-                                        RegisterASM(RegisterEnum.R11D),
-                                    )
-                                )
-                                res.append(
-                                    MoveASM(RegisterASM(RegisterEnum.R11D), new_dst)
-                                )
-                            elif cur_op in {BinaryOpASM.LSHIFT, BinaryOpASM.RSHIFT}:
-                                res.append(
-                                    MoveASM(new_r_src, RegisterASM(RegisterEnum.ECX))
-                                )
-                                res.append(
-                                    BinaryASM(
-                                        cur_op, RegisterASM(RegisterEnum.CL), new_dst
-                                    )
-                                )
-                            else:
-                                res.append(
-                                    BinaryASM(
-                                        cur_op, RegisterASM(RegisterEnum.R10D), new_dst
-                                    )
-                                )
-                        case BinaryASM(
-                            op=cur_op, r_src=r_src, dst=PsuedoRegASM(identifier=dst_id)
-                        ):
-                            if dst_id not in found:
-                                num_vars += 1
-                                found[dst] = num_vars
-                            new_dst = StackASM(-1 * sizeof_int * found[dst_id])
-                            if cur_op == BinaryOpASM.MUL:
-                                res.append(
-                                    MoveASM(new_dst, RegisterASM(RegisterEnum.R11D))
-                                )
-                                res.append(
-                                    BinaryASM(
-                                        cur_op, r_src, RegisterASM(RegisterEnum.R11D)
-                                    )
-                                )
-                                res.append(
-                                    MoveASM(RegisterASM(RegisterEnum.R11D), new_dst)
-                                )
-                            elif cur_op in {BinaryOpASM.LSHIFT, BinaryOpASM.RSHIFT}:
-                                res.append(
-                                    MoveASM(r_src, RegisterASM(RegisterEnum.ECX))
-                                )
-                                res.append(
-                                    BinaryASM(
-                                        cur_op, RegisterASM(RegisterEnum.CL), new_dst
-                                    )
-                                )
-                            else:
-                                res.append(BinaryASM(cur_op, r_src, new_dst))
-
-                        case BinaryASM(
-                            op=cur_op,
-                            r_src=PsuedoRegASM(identifier=r_src_id),
-                            dst=dst,
-                        ):
-                            if r_src_id not in found:
-                                num_vars += 1
-                                found[r_src_id] = num_vars
-                            new_r_src = StackASM(-1 * sizeof_int * found[r_src_id])
-
-                            res.append(BinaryASM(cur_op, new_r_src, dst))
-
-                        case IDivASM(src=PsuedoRegASM(identifier=id)):
-                            if id not in found:
-                                num_vars += 1
-                                found[id] = num_vars
-                            res.append(IDivASM(StackASM(-1 * sizeof_int * found[id])))
-
-                        case IDivASM(src=IntASM(val=val)):
-                            res.append(
-                                MoveASM(IntASM(val), RegisterASM(RegisterEnum.R10D))
-                            )
-                            res.append(IDivASM(RegisterASM(RegisterEnum.R10D)))
-
-                        case _:
-                            res.append(ins)
-            res[0].num_vals = num_vars * sizeof_int
-
+            return [LabelASM(labelFromTacky(name))]
+        case FuncTacky(identifier=identifier, instructions=instructions, symbols=symbols):
+            selected = selectInstructions(instructions)
+            res = [AllocateStack(assignStackSlots(selected, symbols))]
+            legalizeOperands(selected, res)
             return FunctionASM(identifier, res)
 
         case ProgramTacky(func=func):
@@ -340,6 +166,156 @@ def asmFromTacky(node: TackyNode):
             raise ValueError("Invalid TACKY Expr: ", node)
 
 
+# Number of bytes/int in our version of C
+SIZEOF_INT = 4
+
+
+def selectInstructions(instructions):
+    ## Pass 1: ASM for every TACKY instruction, still using pseudo-registers
+    res = []
+    extend = res.extend
+    for instruction in instructions:
+        extend(asmFromTacky(instruction))
+    return res
+
+
+## The fields of each instruction that hold operands, in the order slots
+## are handed out
+OPERAND_FIELDS = {
+    MoveASM: ("src", "dst"),
+    CmpASM: ("left_operand", "right_operand"),
+    BinaryASM: ("r_src", "dst"),
+    UnaryASM: ("dst",),
+    IDivASM: ("src",),
+    SetCCASM: ("src",),
+}
+
+
+def assignStackSlots(instructions, symbols: SymbolTable) -> int:
+    ## Pass 2: replace every pseudo-register with its stack slot, in place.
+    ## Slots are numbered in order of first appearance. Temporaries find
+    ## theirs by list index on their id, str names (hand written TACKY)
+    ## through a dict. Returns the bytes of stack needed
+    num_vars = 0
+    temp_slots = [None] * symbols.num_temps
+    found = {}
+    for instruction in instructions:
+        fields = OPERAND_FIELDS.get(type(instruction))
+        if fields is None:
+            continue
+        for field in fields:
+            operand = getattr(instruction, field)
+            if type(operand) is not PsuedoRegASM:
+                continue
+            identifier = operand.identifier
+            if type(identifier) is int:
+                if identifier >= len(temp_slots):
+                    temp_slots.extend([None] * (identifier + 1 - len(temp_slots)))
+                slot = temp_slots[identifier]
+                if slot is None:
+                    num_vars += 1
+                    slot = temp_slots[identifier] = StackASM(-SIZEOF_INT * num_vars)
+            else:
+                slot = found.get(identifier)
+                if slot is None:
+                    num_vars += 1
+                    slot = found[identifier] = StackASM(-SIZEOF_INT * num_vars)
+            setattr(instruction, field, slot)
+    return num_vars * SIZEOF_INT
+
+
+## Pass 3: operand combinations x86 can't encode, rewritten through the
+## scratch registers. R10D stands in for a source, R11D for a destination
+
+
+def fixMemoryMove(ins: MoveASM, emit):
+    emit(MoveASM(ins.src, R10D))
+    emit(MoveASM(R10D, ins.dst))
+
+
+def fixMemoryCmp(ins: CmpASM, emit):
+    emit(MoveASM(ins.left_operand, R10D))
+    emit(CmpASM(R10D, ins.right_operand))
+
+
+def fixImmediateCmp(ins: CmpASM, emit):
+    emit(MoveASM(ins.right_operand, R11D))
+    emit(CmpASM(ins.left_operand, R11D))
+
+
+def fixMemoryBinary(ins: BinaryASM, emit):
+    emit(MoveASM(ins.r_src, R10D))
+    emit(BinaryASM(ins.op, R10D, ins.dst))
+
+
+def fixMemoryMul(ins: BinaryASM, emit):
+    ## imul can't write to memory
+    emit(MoveASM(ins.dst, R11D))
+    emit(BinaryASM(ins.op, ins.r_src, R11D))
+    emit(MoveASM(R11D, ins.dst))
+
+
+def fixShift(ins: BinaryASM, emit):
+    ## The shift count goes through %cl
+    emit(MoveASM(ins.r_src, ECX))
+    emit(BinaryASM(ins.op, CL, ins.dst))
+
+
+def fixImmediateIDiv(ins: IDivASM, emit):
+    emit(MoveASM(ins.src, R10D))
+    emit(IDivASM(R10D))
+
+
+## Operand kinds are the operand classes
+IMM = IntASM
+REG = RegisterASM
+MEM = StackASM
+
+## Key of an instruction in LEGALIZE: (instruction kind, operand kinds...).
+## BinaryASM is keyed on its operator, since imul and the shifts have
+## constraints of their own
+LEGALIZE_KEY = {
+    MoveASM: lambda ins: (MoveASM, type(ins.src), type(ins.dst)),
+    CmpASM: lambda ins: (CmpASM, type(ins.left_operand), type(ins.right_operand)),
+    BinaryASM: lambda ins: (ins.op, type(ins.r_src), type(ins.dst)),
+    IDivASM: lambda ins: (IDivASM, type(ins.src)),
+}
+
+LEGALIZE = {
+    (MoveASM, MEM, MEM): fixMemoryMove,
+    (CmpASM, MEM, MEM): fixMemoryCmp,
+    (IDivASM, IMM): fixImmediateIDiv,
+}
+for operand_kind in (IMM, REG, MEM):
+    LEGALIZE[(CmpASM, operand_kind, IMM)] = fixImmediateCmp
+    LEGALIZE[(BinaryOpASM.MUL, operand_kind, MEM)] = fixMemoryMul
+    LEGALIZE[(BinaryOpASM.LSHIFT, operand_kind, MEM)] = fixShift
+    LEGALIZE[(BinaryOpASM.RSHIFT, operand_kind, MEM)] = fixShift
+for binary_op in (
+    BinaryOpASM.ADD,
+    BinaryOpASM.SUB,
+    BinaryOpASM.BAND,
+    BinaryOpASM.BOR,
+    BinaryOpASM.BXOR,
+):
+    LEGALIZE[(binary_op, MEM, MEM)] = fixMemoryBinary
+
+
+def legalizeOperands(instructions, res):
+    ## Pass 3: append `instructions` to `res`, rewriting the ones LEGALIZE
+    ## has a fix for
+    emit = res.append
+    for instruction in instructions:
+        key = LEGALIZE_KEY.get(type(instruction))
+        if key is not None:
+            fix = LEGALIZE.get(key(instruction))
+            if fix is not None:
+                fix(instruction, emit)
+                continue
+        emit(instruction)
+    return res
+
+
 def asmgenerate(tacky: TackyNode) -> str:
     """Generate Assembly from the ProgNode
 
@@ -351,3 +327,13 @@ def asmgenerate(tacky: TackyNode) -> str:
     """
     asm = asmFromTacky(tacky)
     return asm.codegen()
+
+
+def asmwrite(tacky: TackyNode, sink):
+    """Generate Assembly from the ProgNode, streaming it into `sink`
+
+    Args:
+        tacky (ProgramTacky): The TACKY generated from the AST
+        sink: Anything with a `write(str)`, e.g. a file opened for text
+    """
+    emitProgram(asmFromTacky(tacky), sink)
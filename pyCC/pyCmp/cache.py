@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+## Content addressed cache of compiler outputs, keyed on the preprocessed
+## source, the compiler itself and the mode. Entries live in BUCKETS
+## subdirectories by the first hex digit of their key, and each bucket is
+## kept under its share of the size limit on its own, so a store only ever
+## scans one bucket. Entries are written to a temporary file and renamed
+## into place, so concurrent builds never see half an entry. Evicting an
+## entry another build is about to use only costs that build a miss.
+##
+## Preprocessed sources are cached too, under PREPROCESSED, keyed on the
+## source's path instead: an entry is the preprocessed source, the make rule of
+## its dependencies and each dependency's mtime, size and hash. The entry
+## is reused as long as every dependency still matches. PREPROCESSED is
+## one more bucket, kept under its share of the size limit the same way,
+## so outputs and preprocessed sources together stay under it. Like any cache
+## driven by dependency files, it can't see a new header that would shadow
+## one it recorded.
+
+BUCKETS = 16
+## The hex buckets and PREPROCESSED each get this share of the size limit
+SHARES = BUCKETS + 1
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+STATS_FILE = "stats.json"
+PREPROCESSED = "preprocessed"
+STAT_NAMES = ("hits", "misses", "stores", "evictions", "preprocess_hits", "preprocess_misses")
+
+_compiler_digest = None
+
+
+def compiler_digest() -> bytes:
+    """Digest of the compiler's own sources, any change to them is a new compiler"""
+    global _compiler_digest
+    if _compiler_digest is None:
+        digest = hashlib.sha256()
+        package = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(package)):
+            if name.endswith(".py"):
+                with open(os.path.join(package, name), "rb") as source:
+                    digest.update(name.encode() + b"\0" + source.read() + b"\0")
+        _compiler_digest = digest.digest()
+    return _compiler_digest
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_depfile(text: str) -> list[str]:
+    """Prerequisites of the first rule of a make dependency file"""
+    rule = text.replace("\\\n", " ").split("\n", 1)[0]
+    prerequisites = rule.split(": ", 1)[1] if ": " in rule else ""
+    ## Spaces in names are escaped, "$" is doubled
+    words = prerequisites.replace("\\ ", "\0").replace("$$", "$").split()
+    return [word.replace("\0", " ") for word in words]
+
+
+def dependencies_match(dependencies) -> bool:
+    ## Same mtime and size is taken as unchanged, anything else is hashed
+    for path, mtime_ns, size, digest in dependencies:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_size != size:
+            return False
+        if stat.st_mtime_ns != mtime_ns and file_digest(path) != digest:
+            return False
+    return True
+
+
+class CompileCache:
+    """Compiler outputs on disk, shared by every build that uses `directory`
+
+    Args:
+        directory (str): Where the entries go, created if it's missing
+        max_bytes (int): Size the entries are kept under, least recently
+                         used ones are evicted first
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        for bucket in range(BUCKETS):
+            os.makedirs(os.path.join(directory, f"{bucket:x}"), exist_ok=True)
+        os.makedirs(os.path.join(directory, PREPROCESSED), exist_ok=True)
+
+    def key(self, source: bytes, mode: int, native: bool = False) -> str:
+        digest = hashlib.sha256(compiler_digest())
+        digest.update(f"\0{mode}\0".encode())
+        ## The native backend's objects link to different (equivalent) binaries
+        if native:
+            digest.update(b"native\0")
+        digest.update(source)
+        return digest.hexdigest()
+
+    def entry(self, key: str) -> str:
+        return os.path.join(self.directory, key[0], key)
+
+    def fetch(self, key: str, destination: str) -> bool:
+        """Copy the entry for `key` to `destination`, False on a miss"""
+        entry = self.entry(key)
+        try:
+            shutil.copy(entry, destination)
+            ## The entry's mtime is its last use, for eviction
+            os.utime(entry)
+        except FileNotFoundError:
+            self.count("misses")
+            return False
+        self.count("hits")
+        return True
+
+    def store(self, key: str, artifact: str):
+        """Add the file `artifact` as the entry for `key`"""
+        bucket = os.path.dirname(self.entry(key))
+        fd, temporary = tempfile.mkstemp(dir=bucket, prefix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out, open(artifact, "rb") as src:
+                shutil.copyfileobj(src, out)
+            shutil.copymode(artifact, temporary)
+            os.replace(temporary, self.entry(key))
+        except BaseException:
+            os.remove(temporary)
+            raise
+        self.count("stores")
+        self.evict(bucket)
+
+    def evict(self, bucket: str):
+        ## Oldest entries first until the bucket fits its share of the limit
+        entries = []
+        total = 0
+        with os.scandir(bucket) as scan:
+            for dir_entry in scan:
+                if dir_entry.name.startswith(".tmp"):
+                    continue
+                stat = dir_entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, dir_entry.path))
+                total += stat.st_size
+        limit = self.max_bytes // SHARES
+        if total <= limit:
+            return
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        self.count("evictions", evicted)
+
+    def preprocessed_entry(self, file_name: str, target: str) -> str:
+        ## Dependency files name paths relative to where gcc ran
+        key = hashlib.sha256(
+            "\0".join((os.getcwd(), os.path.abspath(file_name), target)).encode()
+        ).hexdigest()
+        return os.path.join(self.directory, PREPROCESSED, key)
+
+    def fetch_preprocessed(self, file_name: str, target: str, depfile: str) -> bytes | None:
+        """The cached preprocessed source of `file_name`, None on a miss
+
+        Args:
+            file_name (str): The C file
+            target (str): What the make rule is for
+            depfile (str): Where the make rule goes on a hit
+        """
+        try:
+            with open(self.preprocessed_entry(file_name, target), "rb") as entry:
+                header = json.loads(entry.readline())
+                source = entry.read() if dependencies_match(header["dependencies"]) else None
+        except (FileNotFoundError, ValueError, KeyError):
+            source = None
+        if source is None:
+            self.count("preprocess_misses")
+            return None
+        try:
+            os.utime(self.preprocessed_entry(file_name, target))
+        except FileNotFoundError:
+            pass
+        with open(depfile, "w", encoding="utf-8") as out:
+            out.write(header["depfile"])
+        self.count("preprocess_hits")
+        return source
+
+    def store_preprocessed(
+        self, file_name: str, target: str, source: bytes, depfile: str, started_ns: int
+    ):
+        """Cache the preprocessed source of `file_name` and its make rule
+
+        Args:
+            source (bytes): The preprocessed source
+            started_ns (int): time.time_ns() from before preprocessing. A
+                dependency changed since might not match `source`, so then
+                nothing is stored.
+        """
+        with open(depfile, encoding="utf-8") as f:
+            depfile_text = f.read()
+        dependencies = []
+        for path in parse_depfile(depfile_text):
+            stat = os.stat(path)
+            if stat.st_mtime_ns >= started_ns:
+                return
+            dependencies.append(
+                (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, file_digest(path))
+            )
+        header = json.dumps({"dependencies": dependencies, "depfile": depfile_text})
+
+        entry = self.preprocessed_entry(file_name, target)
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(entry), prefix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                out.write(header.encode() + b"\n")
+                out.write(source)
+            os.replace(temporary, entry)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        self.evict(os.path.dirname(entry))
+
+    def count(self, name: str, amount: int = 1):
+        ## Read, add and write back under an exclusive lock, for concurrent builds
+        with open(os.path.join(self.directory, STATS_FILE), "a+", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            text = f.read()
+            stats = json.loads(text) if text else {}
+            stats[name] = stats.get(name, 0) + amount
+            f.seek(0)
+            f.truncate()
+            json.dump(stats, f)
+
+    def stats(self) -> dict[str, int]:
+        """Counts of every STAT_NAMES since the cache was created, plus its size
+
+        Preprocessed sources count towards "entries" and "bytes" too.
+        """
+        try:
+            with open(os.path.join(self.directory, STATS_FILE), encoding="utf-8") as f:
+                fcntl.flock(f, fcntl.LOCK_SH)
+                text = f.read()
+        except FileNotFoundError:
+            text = ""
+        counts = json.loads(text) if text else {}
+        stats = {name: counts.get(name, 0) for name in STAT_NAMES}
+        stats["entries"] = 0
+        stats["bytes"] = 0
+        for bucket in [f"{bucket:x}" for bucket in range(BUCKETS)] + [PREPROCESSED]:
+            with os.scandir(os.path.join(self.directory, bucket)) as scan:
+                for dir_entry in scan:
+                    if not dir_entry.name.startswith(".tmp"):
+                        stats["entries"] += 1
+                        stats["bytes"] += dir_entry.stat().st_size
+        return stats
+
+    def clear(self):
+        for bucket in [f"{bucket:x}" for bucket in range(BUCKETS)] + [PREPROCESSED]:
+            bucket_dir = os.path.join(self.directory, bucket)
+            for name in os.listdir(bucket_dir):
+                os.remove(os.path.join(bucket_dir, name))
+        stats_path = os.path.join(self.directory, STATS_FILE)
+        if os.path.exists(stats_path):
+            os.remove(stats_path)
+
+
+def cache_from_env() -> CompileCache | None:
+    """The cache $PYCC_CACHE_DIR names, with $PYCC_CACHE_SIZE (MB) as its limit"""
+    directory = os.environ.get("PYCC_CACHE_DIR")
+    if not directory:
+        return None
+    size = os.environ.get("PYCC_CACHE_SIZE")
+    max_bytes = int(float(size) * 1024 * 1024) if size else DEFAULT_MAX_BYTES
+    return CompileCache(directory, max_bytes)
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import time
+
+from .pyCmp import LINK_MODE, compile_to
+
+## subprocess and threading are imported where gcc, as or ld run, the
+## modes that preprocess in process and stop before assembling never
+## start a process
+
+
+class FileResult:
+    """Outcome of compiling one file
+
+    Attributes:
+        file_name (str): The C file
+        ok (bool): Whether every step succeeded
+        error (str): What went wrong, None when ok
+        seconds (float): Wall clock of the whole file
+    """
+
+    __slots__ = ("file_name", "ok", "error", "seconds")
+
+    def __init__(self, file_name: str, ok: bool, error: str | None, seconds: float):
+        self.file_name = file_name
+        self.ok = ok
+        self.error = error
+        self.seconds = seconds
+
+    def __repr__(self):
+        return f"FileResult({self.file_name!r}, {self.ok!r}, {self.error!r}, {self.seconds!r})"
+
+
+## What a bad file or a failed tool raises, reported by the message alone
+INPUT_ERRORS = (ValueError, NotImplementedError, OSError)
+
+
+def error_message(err: Exception) -> str:
+    ## Anything else is a bug in a stage, where the type says more than
+    ## the message (a KeyError's is only the key)
+    return str(err) if isinstance(err, INPUT_ERRORS) else f"{type(err).__name__}: {err}"
+
+
+def run_command(command: list[str], failure: str) -> bytes:
+    ## The command's stdout, a ValueError with its errors if it fails
+    import subprocess
+
+    result = subprocess.run(command, capture_output=True, check=False)
+    if result.returncode != 0:
+        raise ValueError(f"{failure}\n{result.stderr.decode(errors='replace')}".rstrip())
+    return result.stdout
+
+
+def run_gcc(args: list[str], failure: str) -> bytes:
+    return run_command(["gcc", *args], failure)
+
+
+def pipe_into(command: list[str], write, failure: str):
+    """Run an assembler, with the assembly `write` streams into its stdin
+
+    Args:
+        command (list[str]): gcc or as, reading assembly from stdin
+        write (Callable[[TextIO], object]): Writes the assembly to the
+            stream it's given
+        failure (str): What the ValueError says when the command fails
+    """
+    import subprocess
+    import threading
+
+    process = subprocess.Popen(
+        command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    ## Errors are read as they're written, a full stderr pipe would stop
+    ## the assembler reading the assembly
+    errors = []
+    reader = threading.Thread(target=lambda: errors.append(process.stderr.read()))
+    reader.start()
+    stdin = io.TextIOWrapper(process.stdin, encoding="utf-8")
+    try:
+        write(stdin)
+    except BrokenPipeError:
+        ## The assembler stopped reading, its errors say why
+        pass
+    except BaseException:
+        ## Half the assembly mustn't be linked. Failing the assembler on
+        ## purpose lets it (and gcc) clean up after itself.
+        try:
+            stdin.write('\n.error "compile failed"\n')
+        except BrokenPipeError:
+            pass
+        raise
+    finally:
+        try:
+            stdin.close()
+        except BrokenPipeError:
+            pass
+        process.wait()
+        reader.join()
+        process.stderr.close()
+    if process.returncode != 0:
+        raise ValueError(f"{failure}\n{errors[0].decode(errors='replace')}".rstrip())
+
+
+def object_path(output: str, keep_object: bool) -> str:
+    ## <output>.o when it's kept, otherwise a temporary file, so whatever
+    ## object the user already has next to the source is left alone
+    if keep_object:
+        return f"{output}.o"
+    import tempfile
+
+    fd, path = tempfile.mkstemp(prefix="pycc-", suffix=".o")
+    os.close(fd)
+    return path
+
+
+def assemble(write, output: str, direct_link: bool = False, keep_object: bool = False):
+    """Assemble and link the assembly `write` streams out
+
+    Args:
+        write (Callable[[TextIO], object]): Writes the assembly to the
+            stream it's given
+        output (str): The binary
+        direct_link (bool): Run as and ld directly, with the commands gcc
+            would run (see toolchain), instead of gcc itself
+        keep_object (bool): Leave as's object next to the binary, for
+            direct_link. Otherwise it goes to a temporary file.
+    """
+    object_file = None
+    try:
+        if direct_link:
+            from .toolchain import link_commands
+
+            object_file = object_path(output, keep_object)
+            try:
+                assemble_command, link_command = link_commands(object_file, output)
+            except NotImplementedError:
+                ## A gcc that works some other way still links through gcc
+                direct_link = False
+        if not direct_link:
+            pipe_into(["gcc", "-x", "assembler", "-", "-o", output], write, "Unable to Assemble")
+            return
+        pipe_into(assemble_command, write, "Unable to Assemble")
+        run_command(link_command, "Unable to Link")
+    finally:
+        if object_file is not None and not keep_object and os.path.exists(object_file):
+            os.remove(object_file)
+
+
+def link_native(source: bytes, output: str, keep_object: bool = False):
+    """Compile to an ELF object with the native backend and link it
+
+    No assembly text and no assembler: the encoder turns the ASM into
+    machine code, and ld links the object, with the command gcc would use
+    (see toolchain).
+
+    Args:
+        source (bytes): The preprocessed C source
+        output (str): The binary
+        keep_object (bool): Leave the object next to the binary, otherwise
+            it goes to a temporary file
+    """
+    from . import elf, encoder
+    from .pyCmp import Stage, compile_source
+    from .toolchain import link_commands
+
+    code, functions = encoder.encodeProgram(compile_source(source, Stage.ASM).asm)
+    object_file = object_path(output, keep_object)
+    try:
+        with open(object_file, "wb") as file_out:
+            file_out.write(elf.objectBytes(code, functions))
+        try:
+            link_command = link_commands(object_file, output)[1]
+        except NotImplementedError:
+            link_command = ["gcc", object_file, "-o", output]
+        run_command(link_command, "Unable to Link")
+    finally:
+        if not keep_object:
+            os.remove(object_file)
+
+
+def make_rule(target: str, dependencies: list[str]) -> str:
+    ## What gcc -MD -MT target -MP writes: the rule, then an empty rule per
+    ## header so make doesn't fail when one is deleted
+    escaped = [path.replace("$", "$$").replace(" ", "\\ ") for path in dependencies]
+    lines = [f"{target}: {' '.join(escaped)}"]
+    lines.extend(f"{path}:" for path in escaped[1:])
+    return "\n".join(lines) + "\n"
+
+
+def preprocess_source(file_name: str, depfile: str = None, target: str = None) -> bytes:
+    """Preprocess in process when the source allows it, with gcc -E otherwise
+
+    Args:
+        file_name (str): The C file
+        depfile (str): Where the make rule of `target` goes, if anywhere
+        target (str): What the make rule is for
+
+    Returns:
+        bytes: The preprocessed source
+    """
+    ## Imported on first use, so the runs that import the driver but never
+    ## preprocess in process (--cache-stats, --cache-clear, --pipeline,
+    ## usage errors) don't pay for the import
+    from .preprocessor import preprocess
+
+    try:
+        source, dependencies = preprocess(file_name)
+    except NotImplementedError:
+        depfile_args = ["-MD", "-MF", depfile, "-MT", target, "-MP"] if depfile else []
+        return run_gcc(["-E", "-P", file_name, "-o", "-"] + depfile_args, "Unable to PreProcess")
+    if depfile:
+        with open(depfile, "w", encoding="utf-8") as out:
+            out.write(make_rule(target, dependencies))
+    return source.encode()
+
+
+def write_assembly(source: bytes, file_name: str, mode: int):
+    try:
+        with open(file_name, "w", encoding="utf-8") as file_out:
+            compile_to(source, file_out, mode)
+    except Exception:
+        ## The assembly is written as it's generated, don't leave half of it
+        if os.path.exists(file_name):
+            os.remove(file_name)
+        raise
+
+
+def compile_file(
+    file_name: str,
+    mode: int = LINK_MODE,
+    cache=None,
+    keep_temps: bool = False,
+    direct_link: bool = False,
+    native: bool = False,
+) -> FileResult:
+    """Preprocess, compile and (from LINK_MODE up) assemble and link one file
+
+    The preprocessed source is kept in memory and the assembly is piped
+    into gcc, only the output is written. Errors, a stage's own bugs
+    included, are caught and reported in the result, so a bad file doesn't
+    stop a batch.
+
+    Args:
+        file_name (str): The C file, the outputs go next to it
+        mode (int): The py_compile mode
+        cache (CompileCache): Where to look up and keep the output (the
+            binary, or the .s for --codegen) by its preprocessed source, and
+            the preprocessed source by its dependencies. With a cache, the
+            make rule of the output is written to a .d file.
+        keep_temps (bool): Also write the preprocessed source to a .i file
+            and the assembly to a .s file (and with direct_link, the object
+            to a .o file), and assemble from the .s. The output cache is
+            skipped, its entries don't have them.
+        direct_link (bool): Assemble and link with as and ld, not gcc. The
+            binary is the same either way.
+        native (bool): Encode the machine code and write the object
+            in process, then link it with ld, LINK_MODE only. keep_temps
+            keeps the .i and .o, there's no .s.
+
+    Returns:
+        FileResult: How it went
+    """
+    start = time.perf_counter()
+    try:
+        if file_name[-2:] != ".c":
+            raise ValueError(f'Invalid File Type "{file_name}"')
+        if native and mode != LINK_MODE:
+            raise ValueError("The native backend only runs in the link mode")
+        file_prefix = file_name[:-2]
+        output = file_prefix if mode >= LINK_MODE else f"{file_prefix}.s"
+        ## The earlier modes print instead of writing an output
+        cached = cache is not None and mode >= 3
+
+        source = None
+        if cached:
+            source = cache.fetch_preprocessed(file_name, output, f"{file_prefix}.d")
+        if source is None:
+            depfile = f"{file_prefix}.d" if cached else None
+            started_ns = time.time_ns()
+            source = preprocess_source(file_name, depfile, output)
+            if cached:
+                cache.store_preprocessed(file_name, output, source, depfile, started_ns)
+        if keep_temps:
+            with open(f"{file_prefix}.i", "wb") as file_out:
+                file_out.write(source)
+
+        ## A cached output comes without the temporaries, so keep_temps
+        ## always compiles
+        key = None
+        if cached and not keep_temps:
+            key = cache.key(source, mode, native)
+            if cache.fetch(key, output):
+                return FileResult(file_name, True, None, time.perf_counter() - start)
+        if mode < 3:
+            compile_to(source, None, mode)
+        elif native:
+            link_native(source, file_prefix, keep_temps)
+        elif mode < LINK_MODE or keep_temps:
+            write_assembly(source, f"{file_prefix}.s", mode)
+            if mode >= LINK_MODE:
+                with open(f"{file_prefix}.s", encoding="utf-8") as assembly:
+                    assemble(
+                        lambda stdin: stdin.write(assembly.read()),
+                        file_prefix,
+                        direct_link,
+                        keep_temps,
+                    )
+        else:
+            assemble(lambda stdin: compile_to(source, stdin, mode), file_prefix, direct_link)
+        if key is not None:
+            cache.store(key, output)
+    except Exception as err:
+        return FileResult(file_name, False, error_message(err), time.perf_counter() - start)
+    return FileResult(file_name, True, None, time.perf_counter() - start)
+
+
+def read_manifest(manifest_name: str) -> list[str]:
+    """File names listed in a manifest, one per line
+
+    Blank lines and lines starting with "#" are skipped. Relative names are
+    taken relative to the working directory, like gcc's @file.
+    """
+    with open(manifest_name, encoding="utf-8") as manifest:
+        lines = (line.strip() for line in manifest)
+        return [line for line in lines if line and not line.startswith("#")]
+
+
+def compile_batch(
+    file_names,
+    mode: int = LINK_MODE,
+    workers: int | None = None,
+    on_result=None,
+    cache=None,
+    keep_temps: bool = False,
+    direct_link: bool = False,
+    native: bool = False,
+):
+    """Compile many files across a pool of worker processes
+
+    Each worker imports the compiler once and then takes files in chunks,
+    running gcc for its own files, so gcc runs in parallel too.
+
+    Args:
+        file_names (list[str]): The C files
+        mode (int): The py_compile mode, the same for every file
+        workers (int): Worker processes, default is one per CPU
+        on_result (Callable[[FileResult], object]): Called with each result
+            as it's ready, in the order of `file_names`
+        cache (CompileCache): Passed on to compile_file
+        keep_temps (bool): Passed on to compile_file
+        direct_link (bool): Passed on to compile_file
+        native (bool): Passed on to compile_file
+
+    Returns:
+        list[FileResult]: One per file, in the order of `file_names`
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    file_names = list(file_names)
+    workers = workers or os.cpu_count() or 1
+    ## Chunks amortize the round trip to a worker, while leaving enough of
+    ## them that a slow file doesn't hold one worker up at the end
+    chunksize = max(1, len(file_names) // (workers * 8))
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(
+            compile_file,
+            file_names,
+            [mode] * len(file_names),
+            [cache] * len(file_names),
+            [keep_temps] * len(file_names),
+            [direct_link] * len(file_names),
+            [native] * len(file_names),
+            chunksize=chunksize,
+        ):
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+    return results
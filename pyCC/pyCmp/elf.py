@@ -0,0 +1,127 @@
+import struct
+
+## ELF64 relocatable objects for x86-64 Linux, as much of the format as a
+## .o of one .text section needs: the code, a symbol table with a global
+## function symbol per function, and an empty .note.GNU-stack so the
+## linker doesn't make the stack executable. Every jump is within its
+## function and already resolved by the encoder, so there are no
+## relocations.
+
+ELF_HEADER = struct.Struct("<16sHHIQQQIHHHHHH")
+SECTION_HEADER = struct.Struct("<IIQQQQIIQQ")
+SYMBOL = struct.Struct("<IBBHQQ")
+
+IDENT = b"\x7fELF" + bytes((2, 1, 1, 0))  ## 64 bit, little endian, v1, System V
+ET_REL = 1
+EM_X86_64 = 62
+
+SHT_PROGBITS = 1
+SHT_SYMTAB = 2
+SHT_STRTAB = 3
+SHF_ALLOC = 0x2
+SHF_EXECINSTR = 0x4
+
+STB_LOCAL = 0
+STB_GLOBAL = 1
+STT_FUNC = 2
+STT_SECTION = 3
+
+## Section indices, in the order they're written
+TEXT, NOTE, SYMTAB, STRTAB, SHSTRTAB = 1, 2, 3, 4, 5
+SECTION_NAMES = (".text", ".note.GNU-stack", ".symtab", ".strtab", ".shstrtab")
+
+
+def stringTable(names) -> tuple[bytes, dict[str, int]]:
+    ## NUL separated names after a leading NUL, and each name's offset
+    table = bytearray(b"\0")
+    offsets = {}
+    for name in names:
+        if name not in offsets:
+            offsets[name] = len(table)
+            table += name.encode() + b"\0"
+    return bytes(table), offsets
+
+
+def align(data: bytearray, alignment: int):
+    data += bytes(-len(data) % alignment)
+
+
+def objectBytes(code: bytes, functions: list[tuple[str, int, int]]) -> bytes:
+    """An ELF64 relocatable object holding `code` as its .text
+
+    Args:
+        code (bytes): The machine code
+        functions (list[tuple[str, int, int]]): (name, offset, size) of
+            each function in `code`, each becomes a global symbol
+
+    Returns:
+        bytes: The whole .o file
+    """
+    strtab, name_offsets = stringTable(name for name, _, _ in functions)
+    shstrtab, section_offsets = stringTable(SECTION_NAMES)
+
+    ## The null symbol and .text's section symbol are the locals, every
+    ## global comes after them
+    symbols = [SYMBOL.pack(0, 0, 0, 0, 0, 0), SYMBOL.pack(0, STT_SECTION, 0, TEXT, 0, 0)]
+    first_global = len(symbols)
+    for name, offset, size in functions:
+        symbols.append(
+            SYMBOL.pack(name_offsets[name], STB_GLOBAL << 4 | STT_FUNC, 0, TEXT, offset, size)
+        )
+    symtab = b"".join(symbols)
+
+    ## Section contents straight after the ELF header, then the headers
+    data = bytearray(ELF_HEADER.size)
+    placed = {}
+    for index, contents, alignment in (
+        (TEXT, code, 16),
+        (NOTE, b"", 1),
+        (SYMTAB, symtab, 8),
+        (STRTAB, strtab, 1),
+        (SHSTRTAB, shstrtab, 1),
+    ):
+        align(data, alignment)
+        placed[index] = (len(data), len(contents), alignment)
+        data += contents
+    align(data, 8)
+    section_headers_offset = len(data)
+
+    def header(index, kind, flags=0, link=0, info=0, entry_size=0):
+        offset, size, alignment = placed[index]
+        return SECTION_HEADER.pack(
+            section_offsets[SECTION_NAMES[index - 1]],
+            kind,
+            flags,
+            0,
+            offset,
+            size,
+            link,
+            info,
+            alignment,
+            entry_size,
+        )
+
+    data += bytes(SECTION_HEADER.size)
+    data += header(TEXT, SHT_PROGBITS, SHF_ALLOC | SHF_EXECINSTR)
+    data += header(NOTE, SHT_PROGBITS)
+    data += header(SYMTAB, SHT_SYMTAB, link=STRTAB, info=first_global, entry_size=SYMBOL.size)
+    data += header(STRTAB, SHT_STRTAB)
+    data += header(SHSTRTAB, SHT_STRTAB)
+
+    data[: ELF_HEADER.size] = ELF_HEADER.pack(
+        IDENT,
+        ET_REL,
+        EM_X86_64,
+        1,
+        0,
+        0,
+        section_headers_offset,
+        0,
+        ELF_HEADER.size,
+        0,
+        0,
+        SECTION_HEADER.size,
+        len(SECTION_NAMES) + 1,
+        SHSTRTAB,
+    )
+    return bytes(data)
@@ -0,0 +1,312 @@
+from .ASMNode import (
+    AllocateStack,
+    BinaryASM,
+    BinaryOpASM,
+    CdqASM,
+    CmpASM,
+    CondFlags,
+    FunctionASM,
+    IDivASM,
+    IntASM,
+    JumpASM,
+    JumpCCASM,
+    LabelASM,
+    MoveASM,
+    ProgramASM,
+    RegisterASM,
+    RegisterEnum,
+    ReturnASM,
+    SetCCASM,
+    StackASM,
+    UnaryASM,
+    UnaryOpASM,
+    asm_label,
+)
+
+## x86-64 machine code straight from the ASM, for the native object
+## backend: the bytes are the ones `as` makes from the text asmemit writes.
+## Every operation is 32 bit, the same as the text's l suffix (and as's
+## default where the text has none). Each instruction is encoded on its
+## own, except jumps, which are sized once every label has an offset: all
+## start short and any that can't reach grows, until none have to.
+
+## Register numbers, 8 and up need a REX bit. CL shares ECX's number
+REGISTER_CODES = {
+    RegisterEnum.EAX: 0,
+    RegisterEnum.ECX: 1,
+    RegisterEnum.CL: 1,
+    RegisterEnum.EDX: 2,
+    RegisterEnum.R10D: 10,
+    RegisterEnum.R11D: 11,
+}
+
+## Condition codes, the low nibble of jcc and setcc
+CONDITION_CODES = {
+    CondFlags.E: 0x4,
+    CondFlags.NE: 0x5,
+    CondFlags.L: 0xC,
+    CondFlags.GE: 0xD,
+    CondFlags.LE: 0xE,
+    CondFlags.G: 0xF,
+}
+
+## ALU operations: (/digit of the immediate forms, reg -> r/m opcode,
+## r/m -> reg opcode, opcode of the short form with an imm32 into %eax)
+ALU = {
+    BinaryOpASM.ADD: (0, 0x01, 0x03, 0x05),
+    BinaryOpASM.BOR: (1, 0x09, 0x0B, 0x0D),
+    BinaryOpASM.BAND: (4, 0x21, 0x23, 0x25),
+    BinaryOpASM.SUB: (5, 0x29, 0x2B, 0x2D),
+    BinaryOpASM.BXOR: (6, 0x31, 0x33, 0x35),
+}
+CMP = (7, 0x39, 0x3B, 0x3D)
+## The ones asmemit writes with an l suffix
+SIZED = (BinaryOpASM.ADD, BinaryOpASM.SUB)
+
+## /digit of the shifts and of the 0xF7 group
+SHIFTS = {BinaryOpASM.LSHIFT: 4, BinaryOpASM.RSHIFT: 7}
+UNARY = {UnaryOpASM.BITFLIP: 2, UnaryOpASM.NEG: 3}
+IDIV = 7
+
+PROLOGUE = b"\x55\x48\x89\xe5"  ## pushq %rbp; movq %rsp, %rbp
+EPILOGUE = b"\x48\x89\xec\x5d\xc3"  ## movq %rbp, %rsp; popq %rbp; ret
+
+## Jump sizes: short is opcode + rel8, near is (0F) opcode + rel32
+SHORT_JUMP = 2
+NEAR_JMP = 5
+NEAR_JCC = 6
+
+
+def fitsByte(value: int) -> bool:
+    return -128 <= value <= 127
+
+
+def imm32(operand: IntASM) -> int:
+    ## The immediate as the 32 bit operation sees it, like as's truncation
+    return (operand.val + (1 << 31)) % (1 << 32) - (1 << 31)
+
+
+def modrm(reg: int, operand) -> tuple[int, bytes]:
+    """REX bits and ModRM (+ displacement) for `reg` and a r/m operand
+
+    Returns:
+        tuple[int, bytes]: REX.R/REX.B bits (0 if neither) and the bytes
+    """
+    rex = 0x44 if reg >= 8 else 0
+    if type(operand) is RegisterASM:
+        code = REGISTER_CODES[operand.val]
+        if code >= 8:
+            rex |= 0x41
+        return rex, bytes((0xC0 | (reg & 7) << 3 | code & 7,))
+    if type(operand) is StackASM:
+        ## Always %rbp based, so never a SIB byte
+        displacement = operand.index
+        if fitsByte(displacement):
+            return rex, bytes((0x45 | (reg & 7) << 3, displacement & 0xFF))
+        return rex, bytes((0x85 | (reg & 7) << 3,)) + displacement.to_bytes(
+            4, "little", signed=True
+        )
+    raise ValueError("Not a register or stack operand: ", operand)
+
+
+def withRex(rex: int, opcode: bytes, encoded: bytes) -> bytes:
+    return (bytes((rex,)) if rex else b"") + opcode + encoded
+
+
+def encodeRm(opcode: bytes, reg: int, operand) -> bytes:
+    rex, encoded = modrm(reg, operand)
+    return withRex(rex, opcode, encoded)
+
+
+def registerCode(operand) -> int:
+    if type(operand) is not RegisterASM:
+        raise ValueError("Not a register: ", operand)
+    return REGISTER_CODES[operand.val]
+
+
+def encodeAlu(codes, src, dst, sized: bool = True) -> bytes:
+    ## add/sub/and/or/xor/cmp, src and dst in AT&T order. `sized` is False
+    ## for the ones the text leaves without a suffix
+    digit, to_rm, from_rm, eax_short = codes
+    if type(src) is IntASM:
+        value = imm32(src)
+        ## With no suffix and no register to size it, as checks the value
+        ## before truncating it to 32 bits against imm8
+        short = fitsByte(value if sized or type(dst) is RegisterASM else src.val)
+        if short:
+            return encodeRm(b"\x83", digit, dst) + bytes((value & 0xFF,))
+        immediate = value.to_bytes(4, "little", signed=True)
+        if type(dst) is RegisterASM and dst.val == RegisterEnum.EAX:
+            return bytes((eax_short,)) + immediate
+        return encodeRm(b"\x81", digit, dst) + immediate
+    if type(src) is RegisterASM:
+        return encodeRm(bytes((to_rm,)), registerCode(src), dst)
+    if type(dst) is RegisterASM:
+        return encodeRm(bytes((from_rm,)), registerCode(dst), src)
+    raise ValueError("x86 can't take both operands from memory: ", src, dst)
+
+
+def encodeMove(ins: MoveASM) -> bytes:
+    src, dst = ins.src, ins.dst
+    if type(src) is IntASM:
+        immediate = imm32(src).to_bytes(4, "little", signed=True)
+        if type(dst) is RegisterASM:
+            code = registerCode(dst)
+            return withRex(0x41 if code >= 8 else 0, bytes((0xB8 | code & 7,)), immediate)
+        return encodeRm(b"\xc7", 0, dst) + immediate
+    if type(src) is RegisterASM:
+        return encodeRm(b"\x89", registerCode(src), dst)
+    if type(dst) is RegisterASM:
+        return encodeRm(b"\x8b", registerCode(dst), src)
+    raise ValueError("x86 can't move from memory to memory: ", ins)
+
+
+def encodeBinary(ins: BinaryASM) -> bytes:
+    op, src, dst = ins.op, ins.r_src, ins.dst
+    if op in ALU:
+        return encodeAlu(ALU[op], src, dst, op in SIZED)
+    if op == BinaryOpASM.MUL:
+        ## imul only writes a register
+        reg = registerCode(dst)
+        if type(src) is IntASM:
+            value = imm32(src)
+            if fitsByte(value):
+                return encodeRm(b"\x6b", reg, dst) + bytes((value & 0xFF,))
+            return encodeRm(b"\x69", reg, dst) + value.to_bytes(4, "little", signed=True)
+        return encodeRm(b"\x0f\xaf", reg, src)
+    if op in SHIFTS:
+        digit = SHIFTS[op]
+        if type(src) is IntASM:
+            if src.val == 1:
+                return encodeRm(b"\xd1", digit, dst)
+            return encodeRm(b"\xc1", digit, dst) + bytes((src.val & 0xFF,))
+        if type(src) is RegisterASM and src.val == RegisterEnum.CL:
+            return encodeRm(b"\xd3", digit, dst)
+        raise ValueError("x86 shifts by %cl or an immediate: ", ins)
+    raise NotImplementedError("Can't encode ", op)
+
+
+def encodeCmp(ins: CmpASM) -> bytes:
+    if type(ins.right_operand) is IntASM:
+        raise ValueError("x86 can't compare into an immediate: ", ins)
+    return encodeAlu(CMP, ins.left_operand, ins.right_operand)
+
+
+def encodeIDiv(ins: IDivASM) -> bytes:
+    return encodeRm(b"\xf7", IDIV, ins.src)
+
+
+def encodeSetCC(ins: SetCCASM) -> bytes:
+    opcode = bytes((0x0F, 0x90 | CONDITION_CODES[ins.cond_code]))
+    ## The byte registers %al, %cl, %dl, %r10b, %r11b share the numbers of
+    ## their 32 bit registers
+    return encodeRm(opcode, 0, ins.src)
+
+
+def encodeAllocate(ins: AllocateStack) -> bytes:
+    if fitsByte(ins.num_vals):
+        return b"\x48\x83\xec" + bytes((ins.num_vals & 0xFF,))
+    return b"\x48\x81\xec" + ins.num_vals.to_bytes(4, "little", signed=True)
+
+
+ENCODERS = {
+    MoveASM: encodeMove,
+    BinaryASM: encodeBinary,
+    UnaryASM: lambda ins: encodeRm(b"\xf7", UNARY[ins.op], ins.dst),
+    CmpASM: encodeCmp,
+    IDivASM: encodeIDiv,
+    SetCCASM: encodeSetCC,
+    AllocateStack: encodeAllocate,
+    CdqASM: lambda ins: b"\x99",
+    ReturnASM: lambda ins: EPILOGUE,
+}
+
+
+class Jump:
+    """A jump whose size waits on the label offsets
+
+    Attributes:
+        condition (int): Condition code, None for jmp
+        label (str): Where it goes
+        near (bool): Whether it needs a rel32
+    """
+
+    __slots__ = ("condition", "label", "near")
+
+    def __init__(self, condition: int | None, label: str):
+        self.condition = condition
+        self.label = label
+        self.near = False
+
+    def size(self) -> int:
+        if not self.near:
+            return SHORT_JUMP
+        return NEAR_JMP if self.condition is None else NEAR_JCC
+
+    def encode(self, displacement: int) -> bytes:
+        if not self.near:
+            opcode = 0xEB if self.condition is None else 0x70 | self.condition
+            return bytes((opcode, displacement & 0xFF))
+        opcode = b"\xe9" if self.condition is None else bytes((0x0F, 0x80 | self.condition))
+        return opcode + displacement.to_bytes(4, "little", signed=True)
+
+
+def encodeFunction(function: FunctionASM) -> bytes:
+    """Machine code of `function`, prologue included
+
+    Raises:
+        ValueError: An instruction x86 can't encode (asmgen rewrites
+                    those), or a jump to a label that isn't defined once
+    """
+    ## Pass 1: bytes for everything but jumps, label names for the offsets
+    pieces = [PROLOGUE]
+    labels = {}
+    for ins in function.instructions:
+        kind = type(ins)
+        encoder = ENCODERS.get(kind)
+        if encoder is not None:
+            pieces.append(encoder(ins))
+        elif kind is LabelASM:
+            name = asm_label(ins.name)
+            if name in labels:
+                raise ValueError("Label defined twice: ", name)
+            labels[name] = len(pieces)
+        elif kind is JumpASM:
+            pieces.append(Jump(None, asm_label(ins.dest)))
+        elif kind is JumpCCASM:
+            pieces.append(Jump(CONDITION_CODES[ins.cond_code], asm_label(ins.name)))
+        else:
+            raise ValueError("Invalid Instruction", ins)
+    jumps = [index for index, piece in enumerate(pieces) if type(piece) is Jump]
+    for index in jumps:
+        if pieces[index].label not in labels:
+            raise ValueError("Jump to an undefined label: ", pieces[index].label)
+
+    ## Pass 2: grow the jumps that can't reach until none have to. Jumps
+    ## only ever grow, so this stops
+    while True:
+        offsets = [0]
+        for piece in pieces:
+            offsets.append(offsets[-1] + (piece.size() if type(piece) is Jump else len(piece)))
+        grew = False
+        for index in jumps:
+            jump = pieces[index]
+            if not jump.near:
+                displacement = offsets[labels[jump.label]] - offsets[index + 1]
+                if not fitsByte(displacement):
+                    jump.near = True
+                    grew = True
+        if not grew:
+            break
+
+    ## Pass 3: the jumps' bytes, now that every offset is known
+    for index in jumps:
+        jump = pieces[index]
+        pieces[index] = jump.encode(offsets[labels[jump.label]] - offsets[index + 1])
+    return b"".join(pieces)
+
+
+def encodeProgram(program: ProgramASM) -> tuple[bytes, list[tuple[str, int, int]]]:
+    """Machine code of `program` and its functions' (name, offset, size)"""
+    code = encodeFunction(program.function)
+    return code, [(program.function.name, 0, len(code))]
@@ -0,0 +1,220 @@
+from .ASTNode import BinaryOperatorNode, UnaryOperatorNode
+from .asmemit import CHUNK_LINES, FUNCTION_HEADER, PROGRAM_FOOTER
+from .lexer import TokenStream, TokenType
+from .parser import (
+    GROUP_PREC,
+    INFIX_OPERATOR,
+    INFIX_PRECEDENCE,
+    PREFIX_OPERATOR,
+    UNARY_PREC,
+    StreamCursor,
+    TokenCursor,
+)
+
+## Single pass -O0 code generation: the expression is parsed with the same
+## tables and loop as Parser.parseExpression, but instead of building an
+## AST, every step emits stack machine assembly right away. Each value ends
+## up in %eax, the left side of a pending binary operator waits on the
+## machine stack (or, for && and ||, behind a conditional jump).
+
+## Right side in %ecx, left side popped into %eax
+POP_LEFT = "\tmovl %eax, %ecx\n\tpopq %rax\n"
+
+BINARY_CODE = {
+    BinaryOperatorNode.ADD: POP_LEFT + "\taddl %ecx, %eax\n",
+    BinaryOperatorNode.SUB: POP_LEFT + "\tsubl %ecx, %eax\n",
+    BinaryOperatorNode.MUL: POP_LEFT + "\timull %ecx, %eax\n",
+    BinaryOperatorNode.DIV: POP_LEFT + "\tcdq\n\tidivl %ecx\n",
+    BinaryOperatorNode.MOD: POP_LEFT + "\tcdq\n\tidivl %ecx\n\tmovl %edx, %eax\n",
+    BinaryOperatorNode.LSHIFT: POP_LEFT + "\tsall %cl, %eax\n",
+    BinaryOperatorNode.RSHIFT: POP_LEFT + "\tsarl %cl, %eax\n",
+    BinaryOperatorNode.BITAND: POP_LEFT + "\tandl %ecx, %eax\n",
+    BinaryOperatorNode.BITOR: POP_LEFT + "\torl %ecx, %eax\n",
+    BinaryOperatorNode.BITXOR: POP_LEFT + "\txorl %ecx, %eax\n",
+}
+for relation_op, cond in (
+    (BinaryOperatorNode.GE, "g"),
+    (BinaryOperatorNode.GEQ, "ge"),
+    (BinaryOperatorNode.LE, "l"),
+    (BinaryOperatorNode.LEQ, "le"),
+    (BinaryOperatorNode.EQ, "e"),
+    (BinaryOperatorNode.NEQ, "ne"),
+):
+    BINARY_CODE[relation_op] = POP_LEFT + f"\tcmpl %ecx, %eax\n\tmovl $0, %eax\n\tset{cond} %al\n"
+
+UNARY_CODE = {
+    UnaryOperatorNode.NEG: "\tnegl %eax\n",
+    UnaryOperatorNode.BITFLIP: "\tnotl %eax\n",
+    UnaryOperatorNode.NOT: "\tcmpl $0, %eax\n\tmovl $0, %eax\n\tsete %al\n",
+}
+
+## Short circuiting operators, formatted with their label number.
+## (left side done, whole operator done)
+LOGIC_CODE = {
+    BinaryOperatorNode.LAND: (
+        "\tcmpl $0, %eax\n\tje .Land_false{0}\n",
+        "\tcmpl $0, %eax\n\tje .Land_false{0}\n\tmovl $1, %eax\n\tjmp .Land_end{0}\n"
+        ".Land_false{0}:\n\tmovl $0, %eax\n.Land_end{0}:\n",
+    ),
+    BinaryOperatorNode.LOR: (
+        "\tcmpl $0, %eax\n\tjne .Lor_true{0}\n",
+        "\tcmpl $0, %eax\n\tjne .Lor_true{0}\n\tmovl $0, %eax\n\tjmp .Lor_end{0}\n"
+        ".Lor_true{0}:\n\tmovl $1, %eax\n.Lor_end{0}:\n",
+    ),
+}
+
+PUSH_LEFT = "\tpushq %rax\n"
+RETURN = "\tmovq %rbp, %rsp\n\tpopq %rbp\n\tret\n"
+
+
+class FastCompiler:
+    """Parses a program and writes its assembly to `sink` in one pass
+
+    Accepts exactly the grammar Parser does, with the same error messages,
+    but never builds an AST or TACKY.
+    """
+
+    def __init__(self, tokens, sink):
+        ## Streams are read in place, anything else is pulled from lazily
+        if isinstance(tokens, TokenStream):
+            self.cursor = StreamCursor(tokens)
+        else:
+            self.cursor = TokenCursor(tokens)
+        self.write = sink.write
+        self.lines = []
+        self.emit = self.lines.append
+        self.labels_used = 0
+
+    def flush(self):
+        if self.lines:
+            self.write("".join(self.lines))
+            self.lines.clear()
+
+    def expectToken(self, token: TokenType, message: str):
+        if self.cursor.current != token.value:
+            raise ValueError(f"{message} at {self.location()}")
+        self.cursor.advance()
+
+    def location(self):
+        return self.cursor.location()
+
+    def compileProgram(self):
+        self.compileFunction()
+        if not self.cursor.at_end():
+            raise ValueError(f"Didn't quite parse everything, stopped at {self.location()}")
+        self.emit(PROGRAM_FOOTER)
+        self.flush()
+
+    def compileFunction(self):
+        self.expectToken(TokenType.INT, "Function did not start with Int")
+
+        if self.cursor.current != TokenType.IDENTIFIER.value:
+            raise ValueError(f"Can't parse Identifier at {self.location()}")
+        name = self.cursor.text()
+        self.cursor.advance()
+
+        for token in (TokenType.POPEN, TokenType.VOID, TokenType.PCLOSE, TokenType.BOPEN):
+            self.expectToken(token, "Function did not start with '(){'")
+
+        self.emit(FUNCTION_HEADER % (name, name))
+        self.compileStatement()
+        self.expectToken(TokenType.BCLOSE, "Can't parse Function")
+
+    def compileStatement(self):
+        ## Parser gives up without a "return", there's nothing else to compile
+        self.expectToken(TokenType.RETURN, "Can't parse Statement, expected 'return'")
+        self.compileExpression()
+        self.expectToken(TokenType.SEMICOLON, "Can't parse Statement, expected ';'")
+        self.emit(RETURN)
+
+    def compileExpression(self):
+        ## Same walk as Parser.parseExpression. Where it would build a node,
+        ## the code for that node is emitted instead
+        cursor = self.cursor
+        emit = self.emit
+        lines = self.lines
+        constint = TokenType.CONSTINT.value
+        popen = TokenType.POPEN.value
+        pclose = TokenType.PCLOSE.value
+        precs = []
+        ops = []
+        labels = []
+        while True:
+            ## Prefix position, stack up unary operators and "(" until a value
+            kind = cursor.current
+            while True:
+                op = PREFIX_OPERATOR[kind]
+                if op is not None:
+                    precs.append(UNARY_PREC)
+                    ops.append(op)
+                elif kind == popen:
+                    precs.append(GROUP_PREC)
+                    ops.append(None)
+                else:
+                    break
+                cursor.advance()
+                kind = cursor.current
+
+            if kind != constint:
+                raise ValueError(f"Can't parse Expression: expected a value at {self.location()}")
+            emit(f"\tmovl ${int(cursor.text())}, %eax\n")
+            cursor.advance()
+            if len(lines) >= CHUNK_LINES:
+                self.flush()
+
+            ## Infix position, finish everything the value completes
+            while True:
+                while precs and precs[-1] == UNARY_PREC:
+                    precs.pop()
+                    emit(UNARY_CODE[ops.pop()])
+
+                kind = cursor.current
+                prec = INFIX_PRECEDENCE[kind]
+                if prec >= 0:
+                    ## Left associative, equal precedence finishes first
+                    while precs and precs[-1] >= prec:
+                        precs.pop()
+                        self.emitBinary(ops.pop(), labels)
+                    op = INFIX_OPERATOR[kind]
+                    logic = LOGIC_CODE.get(op)
+                    if logic is None:
+                        emit(PUSH_LEFT)
+                    else:
+                        label = self.labels_used
+                        self.labels_used += 1
+                        labels.append(label)
+                        emit(logic[0].format(label))
+                    precs.append(prec)
+                    ops.append(op)
+                    cursor.advance()
+                    break
+
+                ## End of a group, or of the whole expression
+                while precs and precs[-1] != GROUP_PREC:
+                    precs.pop()
+                    self.emitBinary(ops.pop(), labels)
+                if not precs:
+                    return
+                if kind != pclose:
+                    raise ValueError(
+                        f"Can't parse Expression: Invalid Paranthesis Closure at {self.location()}"
+                    )
+                precs.pop()
+                ops.pop()
+                cursor.advance()
+
+    def emitBinary(self, op: BinaryOperatorNode, labels):
+        code = BINARY_CODE.get(op)
+        if code is None:
+            code = LOGIC_CODE[op][1].format(labels.pop())
+        self.emit(code)
+
+
+def fastcompile(tokens, sink):
+    """Compile straight from tokens to assembly, without AST or TACKY
+
+    Args:
+        tokens: A TokenStream, or any iterable of (TokenType, str)
+        sink: Anything with a `write(str)`, e.g. a file opened for text
+    """
+    FastCompiler(tokens, sink).compileProgram()
@@ -0,0 +1,188 @@
+from array import array
+
+from .tackyNode import (
+    BinaryOpTacky,
+    BinaryTacky,
+    ConstIntTacky,
+    CopyTacky,
+    FuncTacky,
+    InstructionTacky,
+    JumpIfNotZero,
+    JumpIfZero,
+    JumpTacky,
+    LabelTacky,
+    ReturnTacky,
+    SymbolTable,
+    UnaryOpTacky,
+    UnaryTacky,
+    ValTacky,
+    VarTacky,
+)
+
+## Flat encoding of a FuncTacky: parallel arrays of opcode, dst, src1, src2.
+##
+## Value operands are (index << 1) | tag, tag CONST_TAG indexes `consts`,
+## tag VAR_TAG indexes `names`. Label operands are plain indexes into
+## `labels`, kept in dst. Unused operand slots hold NO_OPERAND.
+##
+##   RETURN          src1
+##   COPY            src1 -> dst
+##   UNARY_<op>      src1 -> dst
+##   BINARY_<op>     src1, src2 -> dst
+##   LABEL           dst (label)
+##   JUMP            dst (label)
+##   JUMP_ZERO       src1, dst (label)
+##   JUMP_NOT_ZERO   src1, dst (label)
+
+VAR_TAG = 0
+CONST_TAG = 1
+NO_OPERAND = -1
+
+OP_RETURN = 0
+OP_COPY = 1
+OP_LABEL = 2
+OP_JUMP = 3
+OP_JUMP_ZERO = 4
+OP_JUMP_NOT_ZERO = 5
+
+## Unary and binary operators get an opcode each, after the fixed ones
+UNARY_OPCODE = {}
+BINARY_OPCODE = {}
+OPCODE_TO_OP = [None] * (OP_JUMP_NOT_ZERO + 1)
+for unary_op in UnaryOpTacky:
+    UNARY_OPCODE[unary_op] = len(OPCODE_TO_OP)
+    OPCODE_TO_OP.append(unary_op)
+FIRST_BINARY = len(OPCODE_TO_OP)
+for binary_op in BinaryOpTacky:
+    BINARY_OPCODE[binary_op] = len(OPCODE_TO_OP)
+    OPCODE_TO_OP.append(binary_op)
+FIRST_UNARY = OP_JUMP_NOT_ZERO + 1
+
+
+def is_const(operand: int) -> bool:
+    return operand & 1 == CONST_TAG
+
+
+class FlatFuncTacky:
+    """A FuncTacky as parallel arrays with integer operands"""
+
+    def __init__(self, identifier: str, symbols: SymbolTable = None):
+        self.identifier = identifier
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.opcodes = array("B")
+        self.dst = array("q")
+        self.src1 = array("q")
+        self.src2 = array("q")
+        self.names: list[int | str] = []
+        self.consts: list[int] = []
+        self.labels: list[int | str] = []
+        self._name_ids = {}
+        self._const_ids = {}
+        self._label_ids = {}
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def __repr__(self):
+        return f"Flat{repr(self.to_func())}"
+
+    def var(self, name: int | str) -> int:
+        index = self._name_ids.get(name)
+        if index is None:
+            index = self._name_ids[name] = len(self.names)
+            self.names.append(name)
+        return index << 1 | VAR_TAG
+
+    def const(self, val: int) -> int:
+        index = self._const_ids.get(val)
+        if index is None:
+            index = self._const_ids[val] = len(self.consts)
+            self.consts.append(val)
+        return index << 1 | CONST_TAG
+
+    def label(self, name: int | str) -> int:
+        index = self._label_ids.get(name)
+        if index is None:
+            index = self._label_ids[name] = len(self.labels)
+            self.labels.append(name)
+        return index
+
+    def value(self, val: ValTacky) -> int:
+        match val:
+            case ConstIntTacky(val=const_val):
+                return self.const(const_val)
+            case VarTacky(name=name):
+                return self.var(name)
+        raise TypeError("Not a TACKY value: ", val)
+
+    def append(self, opcode: int, dst: int = NO_OPERAND, src1: int = NO_OPERAND, src2: int = NO_OPERAND):
+        self.opcodes.append(opcode)
+        self.dst.append(dst)
+        self.src1.append(src1)
+        self.src2.append(src2)
+
+    def append_instruction(self, instruction: InstructionTacky):
+        match instruction:
+            case ReturnTacky(val=val):
+                self.append(OP_RETURN, src1=self.value(val))
+            case CopyTacky(src=src, dst=dst):
+                self.append(OP_COPY, self.value(dst), self.value(src))
+            case UnaryTacky(op=op, src=src, dst=dst):
+                self.append(UNARY_OPCODE[op], self.value(dst), self.value(src))
+            case BinaryTacky(op=op, left_val=left_val, right_val=right_val, dst=dst):
+                self.append(
+                    BINARY_OPCODE[op], self.value(dst), self.value(left_val), self.value(right_val)
+                )
+            case LabelTacky(name=name):
+                self.append(OP_LABEL, self.label(name))
+            case JumpTacky(target=LabelTacky(name=name)):
+                self.append(OP_JUMP, self.label(name))
+            case JumpIfZero(condition=condition, target=LabelTacky(name=name)):
+                self.append(OP_JUMP_ZERO, self.label(name), self.value(condition))
+            case JumpIfNotZero(condition=condition, target=LabelTacky(name=name)):
+                self.append(OP_JUMP_NOT_ZERO, self.label(name), self.value(condition))
+            case _:
+                raise TypeError("Not a TACKY instruction: ", instruction)
+
+    @classmethod
+    def from_func(cls, func: FuncTacky) -> "FlatFuncTacky":
+        res = cls(func.identifier, func.symbols)
+        for instruction in func.instructions:
+            res.append_instruction(instruction)
+        return res
+
+    def to_func(self) -> FuncTacky:
+        ## One object per distinct operand/label, shared by every use
+        vals = [VarTacky(name) for name in self.names]
+        consts = [ConstIntTacky(val) for val in self.consts]
+        labels = [LabelTacky(name) for name in self.labels]
+
+        def val(operand):
+            if operand & 1 == CONST_TAG:
+                return consts[operand >> 1]
+            return vals[operand >> 1]
+
+        instructions = []
+        emit = instructions.append
+        for opcode, dst, src1, src2 in zip(self.opcodes, self.dst, self.src1, self.src2):
+            if opcode >= FIRST_BINARY:
+                emit(BinaryTacky(OPCODE_TO_OP[opcode], val(src1), val(src2), val(dst)))
+            elif opcode >= FIRST_UNARY:
+                emit(UnaryTacky(OPCODE_TO_OP[opcode], val(src1), val(dst)))
+            elif opcode == OP_RETURN:
+                emit(ReturnTacky(val(src1)))
+            elif opcode == OP_COPY:
+                emit(CopyTacky(val(src1), val(dst)))
+            elif opcode == OP_LABEL:
+                emit(labels[dst])
+            elif opcode == OP_JUMP:
+                emit(JumpTacky(labels[dst]))
+            elif opcode == OP_JUMP_ZERO:
+                emit(JumpIfZero(val(src1), labels[dst]))
+            else:
+                emit(JumpIfNotZero(val(src1), labels[dst]))
+        return FuncTacky(self.identifier, instructions, self.symbols)
+
+
+def flatten(func: FuncTacky) -> FlatFuncTacky:
+    return FlatFuncTacky.from_func(func)
@@ -1,6 +1,9 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Iterator
 from enum import Enum, auto
+import io
 import re
-from typing import List, Tuple
 
 ## TODO: Fix the ordering issues, make them make more sense
 class TokenType(Enum):
@@ -37,44 +40,100 @@ class TokenType(Enum):
     IDENTIFIER = auto()
 
 
-TokenToRegex = {
-    TokenType.CONSTINT: re.compile(r"[0-9]+\b"),
-    TokenType.INT: re.compile(r"int\b"),
-    TokenType.VOID: re.compile(r"void\b"),
-    TokenType.RETURN: re.compile(r"return\b"),
-    TokenType.POPEN: re.compile(r"\("),
-    TokenType.PCLOSE: re.compile(r"\)"),
-    TokenType.BOPEN: re.compile(r"\{"),
-    TokenType.BCLOSE: re.compile(r"\}"),
-    TokenType.SEMICOLON: re.compile(r";"),
-    TokenType.PLUS: re.compile(r"\+"),
-    TokenType.ASTERISK: re.compile(r"\*"),
-    TokenType.FSLASH: re.compile(r"/"),
-    TokenType.MODULUS: re.compile(r"%"),
-    TokenType.DECREMENT: re.compile(r"--"),
-    TokenType.LSHIFT: re.compile(r"<<"),
-    TokenType.RSHIFT: re.compile(r">>"),
-    TokenType.GEQ: re.compile(r">="),
-    TokenType.LEQ: re.compile(r"<="),
-    TokenType.EQ: re.compile(r"=="),
-    TokenType.NEQ: re.compile(r"!="),
-    TokenType.LAND: re.compile(r"&&"),
-    TokenType.LOR: re.compile(r"\|\|"),
-    TokenType.NOT: re.compile(r"!"),
-    TokenType.GE: re.compile(r">"),
-    TokenType.LE: re.compile(r"<"),
-    TokenType.BITAND: re.compile(r"&"),
-    TokenType.BITXOR: re.compile(r"\^"),
-    TokenType.BITOR: re.compile(r"\|"),
-    TokenType.NEGATE: re.compile(r"-"),
-    TokenType.BITFLIP: re.compile(r"~"),
-    TokenType.IDENTIFIER: re.compile(r"[a-zA-Z_]\w*\b"),
+## Regex pattern of every token type. Only the master patterns below get
+## compiled at import, TokenToRegex compiles these when it's first used
+TOKEN_PATTERNS = {
+    TokenType.CONSTINT: r"[0-9]+\b",
+    TokenType.INT: r"int\b",
+    TokenType.VOID: r"void\b",
+    TokenType.RETURN: r"return\b",
+    TokenType.POPEN: r"\(",
+    TokenType.PCLOSE: r"\)",
+    TokenType.BOPEN: r"\{",
+    TokenType.BCLOSE: r"\}",
+    TokenType.SEMICOLON: r";",
+    TokenType.PLUS: r"\+",
+    TokenType.ASTERISK: r"\*",
+    TokenType.FSLASH: r"/",
+    TokenType.MODULUS: r"%",
+    TokenType.DECREMENT: r"--",
+    TokenType.LSHIFT: r"<<",
+    TokenType.RSHIFT: r">>",
+    TokenType.GEQ: r">=",
+    TokenType.LEQ: r"<=",
+    TokenType.EQ: r"==",
+    TokenType.NEQ: r"!=",
+    TokenType.LAND: r"&&",
+    TokenType.LOR: r"\|\|",
+    TokenType.NOT: r"!",
+    TokenType.GE: r">",
+    TokenType.LE: r"<",
+    TokenType.BITAND: r"&",
+    TokenType.BITXOR: r"\^",
+    TokenType.BITOR: r"\|",
+    TokenType.NEGATE: r"-",
+    TokenType.BITFLIP: r"~",
+    TokenType.IDENTIFIER: r"[a-zA-Z_]\w*\b",
 }
 
 
-def lex(input_str: str) -> List[Tuple[TokenType, str]]:
+## Keywords are matched as identifiers and then looked up here, this keeps
+## the master pattern down to one alternative per "shape" of token
+KEYWORDS = {
+    "int": TokenType.INT,
+    "void": TokenType.VOID,
+    "return": TokenType.RETURN,
+}
+
+## Every non-keyword token in one alternation, each alternative is a named
+## group of the token it matches. Order matters: the first alternative that
+## matches wins, which is the same rule the old per-type loop used.
+MASTER_TOKENS = [token_type for token_type in TokenType if token_type not in KEYWORDS.values()]
+MASTER_PATTERN = (
+    r"\s*(?:"
+    + "|".join(
+        f"(?P<{token_type.name}>{TOKEN_PATTERNS[token_type]})" for token_type in MASTER_TOKENS
+    )
+    + ")"
+)
+
+## The token patterns have no groups of their own, so group i + 1 is the
+## i-th alternative
+GROUP_TO_TOKEN = {index + 1: token_type for index, token_type in enumerate(MASTER_TOKENS)}
+
+## Same pattern over bytes, for lexing buffers (bytes/mmap) by offset.
+## Kinds are stored as the TokenType values, so they fit in a byte.
+BYTES_MASTER_REGEX = re.compile(MASTER_PATTERN.encode("ascii"))
+BYTES_TRAILING_SPACE = re.compile(rb"\s*\Z")
+BYTES_KEYWORDS = {
+    name.encode("ascii"): token_type.value for name, token_type in KEYWORDS.items()
+}
+GROUP_TO_KIND = [0] * (len(MASTER_TOKENS) + 1)
+for group_index, group_token in GROUP_TO_TOKEN.items():
+    GROUP_TO_KIND[group_index] = group_token.value
+KIND_TO_TOKEN = [None] * (max(token.value for token in TokenType) + 1)
+for kind_token in TokenType:
+    KIND_TO_TOKEN[kind_token.value] = kind_token
+
+
+def __getattr__(name):
+    ## TokenToRegex and the str MASTER_REGEX are only needed by lex() and
+    ## the tests, so they're compiled the first time they're asked for
+    if name == "TokenToRegex":
+        value = {token_type: re.compile(pattern) for token_type, pattern in TOKEN_PATTERNS.items()}
+    elif name == "MASTER_REGEX":
+        value = re.compile(MASTER_PATTERN)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def lex(input_str: str) -> list[tuple[TokenType, str]]:
     """Lexes input string into Tokens
 
+    Scans the input once, by offset, with a single master regex
+
     Args:
         input_str (str): The input string
 
@@ -82,23 +141,314 @@ def lex(input_str: str) -> List[Tuple[TokenType, str]]:
         ValueError: Error parsing
 
     Returns:
-        List[(TokenType, str)]: Tokens lexed
+        list[(TokenType, str)]: Tokens lexed
     """
     res = []
 
-    input_str = input_str.strip()
-    while input_str != "":
-        found = False
-        for token_type in TokenType:
-            match = TokenToRegex[token_type].match(input_str)
-            if match:
-                if token_type == TokenType.DECREMENT:
-                    raise NotImplementedError("Decrement isn't supported yet")
-                found = True
-                res.append((token_type, match[0]))
-                input_str = input_str[len(match[0]) :]
-                break
-        if not found:
-            raise ValueError("INVALID LEX: ", input_str)
-        input_str = input_str.strip()
+    ## re keeps compiled patterns around, only the first call compiles
+    match_at = re.compile(MASTER_PATTERN).match
+    pos = 0
+    end = len(input_str.rstrip())
+    while pos < end:
+        match = match_at(input_str, pos)
+        if not match:
+            raise ValueError("INVALID LEX: ", input_str[pos:].strip())
+        token_type = GROUP_TO_TOKEN[match.lastindex]
+        text = match[match.lastindex]
+        if token_type == TokenType.IDENTIFIER:
+            token_type = KEYWORDS.get(text, token_type)
+        elif token_type == TokenType.DECREMENT:
+            raise NotImplementedError("Decrement isn't supported yet")
+        res.append((token_type, text))
+        pos = match.end()
     return res
+
+
+class TokenStream:
+    """Compact token store over a source buffer
+
+    Tokens are kept as three parallel arrays: the kind code (TokenType.value)
+    and the start/end byte offsets into the source. Token text is only
+    decoded when asked for.
+    """
+
+    def __init__(self, source: bytes | bytearray | memoryview):
+        self.source = source
+        self.view = memoryview(source)
+        self.kinds = array("B")
+        self.starts = array("Q")
+        self.ends = array("Q")
+        self._newlines = None
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[tuple[TokenType, str]]) -> "TokenStream":
+        """Builds a stream from (TokenType, str) pairs, as returned by lex"""
+        pairs = list(pairs)
+        source = " ".join(text for _, text in pairs).encode("utf-8")
+        res = cls(source)
+        pos = 0
+        for token_type, text in pairs:
+            size = len(text.encode("utf-8"))
+            res.kinds.append(token_type.value)
+            res.starts.append(pos)
+            res.ends.append(pos + size)
+            pos += size + 1
+        return res
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index: int) -> tuple[TokenType, str]:
+        return (KIND_TO_TOKEN[self.kinds[index]], self.text(index))
+
+    def __iter__(self):
+        for index in range(len(self.kinds)):
+            yield self[index]
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def token_type(self, index: int) -> TokenType:
+        return KIND_TO_TOKEN[self.kinds[index]]
+
+    def slice(self, index: int) -> memoryview:
+        """Zero-copy view of the token's bytes"""
+        return self.view[self.starts[index] : self.ends[index]]
+
+    def text(self, index: int) -> str:
+        return str(self.slice(index), "utf-8")
+
+    def position(self, index: int) -> tuple[int, int]:
+        """(line, column) of the token, both starting at 1"""
+        offset = self.starts[index]
+        if self._newlines is None:
+            self._newlines = array(
+                "Q", (match.start() for match in re.finditer(b"\n", self.view))
+            )
+        line = bisect_right(self._newlines, offset)
+        line_start = self._newlines[line - 1] + 1 if line else 0
+        return line + 1, offset - line_start + 1
+
+    def release(self):
+        """Drops the view on the source, so an mmap can be closed"""
+        self.view.release()
+
+
+def lex_stream(source: str | bytes | bytearray | memoryview) -> TokenStream:
+    """Lexes a buffer into a TokenStream
+
+    Args:
+        source (str | bytes | mmap): The input, str is encoded as utf-8
+
+    Raises:
+        ValueError: Error parsing
+
+    Returns:
+        TokenStream: Tokens lexed
+    """
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    res = TokenStream(source)
+    kinds = res.kinds
+    starts = res.starts
+    ends = res.ends
+
+    match_at = BYTES_MASTER_REGEX.match
+    identifier = TokenType.IDENTIFIER.value
+    decrement = TokenType.DECREMENT.value
+    pos = 0
+    end = len(source)
+    try:
+        while pos < end:
+            match = match_at(source, pos)
+            if not match:
+                if BYTES_TRAILING_SPACE.match(source, pos):
+                    break
+                rest = bytes(source[pos:]).strip().decode("utf-8", "replace")
+                raise ValueError("INVALID LEX: ", rest)
+            group = match.lastindex
+            kind = GROUP_TO_KIND[group]
+            start, pos = match.span(group)
+            if kind == identifier:
+                kind = BYTES_KEYWORDS.get(source[start:pos], kind)
+            elif kind == decrement:
+                raise NotImplementedError("Decrement isn't supported yet")
+            kinds.append(kind)
+            starts.append(start)
+            ends.append(pos)
+    except Exception:
+        res.release()
+        raise
+    return res
+
+
+## How much of the input lex_iter reads at a time
+CHUNK_SIZE = 1 << 16
+
+## Token text for the fixed-spelling kinds, so lex_iter doesn't decode them
+KIND_TO_SPELLING = [None] * len(KIND_TO_TOKEN)
+for spelled_token in TokenType:
+    if spelled_token not in (TokenType.CONSTINT, TokenType.IDENTIFIER):
+        KIND_TO_SPELLING[spelled_token.value] = (
+            TOKEN_PATTERNS[spelled_token].replace("\\b", "").replace("\\", "")
+        )
+
+
+def lex_iter(
+    source: str | bytes | io.IOBase, chunk_size: int = CHUNK_SIZE
+) -> Iterator[tuple[TokenType, str]]:
+    """Lexes input as it is read, yielding the same tokens as lex
+
+    Only one chunk (plus a partial token) is held at a time, so the whole
+    input and token list never have to be in memory together.
+
+    Args:
+        source (str | bytes | file): The input, files are read chunk by chunk
+        chunk_size (int): How many bytes/characters to read at a time
+
+    Raises:
+        ValueError: Error parsing
+
+    Yields:
+        (TokenType, str): Tokens lexed
+    """
+    if isinstance(source, str):
+        source = io.StringIO(source)
+    elif isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    match_at = BYTES_MASTER_REGEX.match
+    identifier = TokenType.IDENTIFIER.value
+    constint = TokenType.CONSTINT.value
+    decrement = TokenType.DECREMENT.value
+    buffer = b""
+    at_eof = False
+    while not at_eof:
+        chunk = source.read(chunk_size)
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        at_eof = not chunk
+        buffer += chunk
+
+        pos = 0
+        end = len(buffer)
+        while pos < end:
+            match = match_at(buffer, pos)
+            if not match:
+                if BYTES_TRAILING_SPACE.match(buffer, pos):
+                    pos = end
+                    break
+                ## More input can't make a failed match succeed
+                rest = buffer[pos:].strip().decode("utf-8", "replace")
+                raise ValueError("INVALID LEX: ", rest)
+            group = match.lastindex
+            start, token_end = match.span(group)
+            if token_end == end and not at_eof:
+                ## The next chunk could still extend this token
+                break
+            kind = GROUP_TO_KIND[group]
+            if kind == identifier:
+                text = buffer[start:token_end]
+                kind = BYTES_KEYWORDS.get(text, kind)
+                text = KIND_TO_SPELLING[kind] or text.decode("utf-8")
+            elif kind == constint:
+                text = buffer[start:token_end].decode("utf-8")
+            elif kind == decrement:
+                raise NotImplementedError("Decrement isn't supported yet")
+            else:
+                text = KIND_TO_SPELLING[kind]
+            yield KIND_TO_TOKEN[kind], text
+            pos = token_end
+        buffer = buffer[pos:]
+
+
+def relex(
+    tokens: TokenStream, offset: int, deleted: int, inserted: str | bytes
+) -> tuple[TokenStream, int, int, int]:
+    """Re-lexes a TokenStream after an edit to its source
+
+    Only the tokens around the edit are scanned again. Tokens that end
+    before the edit can't change (the lexer looks at most one character
+    past a token), and once a new token starts where an old one did, past
+    the edit, the rest of the stream is the old one shifted.
+
+    Args:
+        tokens (TokenStream): Tokens of the source before the edit
+        offset (int): Byte offset of the edit
+        deleted (int): Number of bytes removed at offset
+        inserted (str | bytes): Text inserted at offset
+
+    Raises:
+        ValueError: Error parsing
+
+    Returns:
+        (TokenStream, int, int, int): The new tokens, and (start, old_end,
+            new_end) such that tokens[start:old_end] were replaced by
+            new_tokens[start:new_end]
+    """
+    if isinstance(inserted, str):
+        inserted = inserted.encode("utf-8")
+    old_source = tokens.source
+    if offset < 0 or deleted < 0 or offset + deleted > len(old_source):
+        raise ValueError("Edit is out of range: ", offset, deleted)
+    source = bytes(old_source[:offset]) + inserted + bytes(old_source[offset + deleted :])
+    delta = len(inserted) - deleted
+    tail = offset + len(inserted)
+
+    old_kinds = tokens.kinds
+    old_starts = tokens.starts
+    old_ends = tokens.ends
+    num_old = len(old_kinds)
+
+    ## First token that could see the edit
+    start = bisect_left(old_ends, offset)
+    pos = old_ends[start - 1] if start else 0
+
+    kinds = old_kinds[:start]
+    starts = old_starts[:start]
+    ends = old_ends[:start]
+
+    match_at = BYTES_MASTER_REGEX.match
+    identifier = TokenType.IDENTIFIER.value
+    decrement = TokenType.DECREMENT.value
+    end = len(source)
+    old_end = num_old
+    while pos < end:
+        match = match_at(source, pos)
+        if not match:
+            if BYTES_TRAILING_SPACE.match(source, pos):
+                break
+            rest = source[pos:].strip().decode("utf-8", "replace")
+            raise ValueError("INVALID LEX: ", rest)
+        group = match.lastindex
+        token_start, token_end = match.span(group)
+        if token_start >= tail:
+            ## Past the edit, see if an old token started here too
+            old_index = bisect_left(old_starts, token_start - delta)
+            if old_index < num_old and old_starts[old_index] == token_start - delta:
+                old_end = old_index
+                break
+        kind = GROUP_TO_KIND[group]
+        if kind == identifier:
+            kind = BYTES_KEYWORDS.get(source[token_start:token_end], kind)
+        elif kind == decrement:
+            raise NotImplementedError("Decrement isn't supported yet")
+        kinds.append(kind)
+        starts.append(token_start)
+        ends.append(token_end)
+        pos = token_end
+    new_end = len(kinds)
+
+    kinds.extend(old_kinds[old_end:])
+    if delta:
+        starts.extend([index + delta for index in old_starts[old_end:]])
+        ends.extend([index + delta for index in old_ends[old_end:]])
+    else:
+        starts.extend(old_starts[old_end:])
+        ends.extend(old_ends[old_end:])
+
+    res = TokenStream(source)
+    res.kinds = kinds
+    res.starts = starts
+    res.ends = ends
+    return res, start, old_end, new_end
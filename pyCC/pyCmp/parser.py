@@ -10,7 +10,9 @@ from .ASTNode import (
     UnaryExpressionNode,
     UnaryOperatorNode,
 )
-from .lexer import TokenType
+from collections import deque
+
+from .lexer import KIND_TO_TOKEN, TokenStream, TokenType
 
 #### OUR CURRENT GRAMMAR 
 #### <program> ::= <function>
@@ -67,35 +69,147 @@ BINOP_TOK_TO_AST = {
     TokenType.LOR: BinaryOperatorNode.LOR,
 }
 
-class Parser:
-    def __init__(self, tokens):
+## Pratt tables, indexed by token kind code (TokenType.value)
+NUM_KINDS = len(KIND_TO_TOKEN)
+
+## -1 marks "not an infix operator", so it never clears a min_prec
+INFIX_PRECEDENCE = [-1] * NUM_KINDS
+INFIX_OPERATOR = [None] * NUM_KINDS
+for binop_token, binop_prec in BINOP_TOKENS.items():
+    INFIX_PRECEDENCE[binop_token.value] = binop_prec
+    INFIX_OPERATOR[binop_token.value] = BINOP_TOK_TO_AST[binop_token]
+
+PREFIX_OPERATOR = [None] * NUM_KINDS
+PREFIX_OPERATOR[TokenType.NEGATE.value] = UnaryOperatorNode.NEG
+PREFIX_OPERATOR[TokenType.BITFLIP.value] = UnaryOperatorNode.BITFLIP
+PREFIX_OPERATOR[TokenType.NOT.value] = UnaryOperatorNode.NOT
+
+## Precedence of the markers on the operator stack: unary operators bind
+## tighter than any binary one, "(" is never reduced by a binary operator
+UNARY_PREC = 1000
+GROUP_PREC = -1
+
+## The most tokens the grammar ever needs to look at before consuming:
+## "(" "void" ")" "{" after a function name
+LOOKAHEAD = 4
+
+
+class StreamCursor:
+    """Cursor over a TokenStream that's already in memory
+
+    `current` is the kind code of the next token (0 at the end), so looking
+    at it is an attribute read.
+    """
+
+    def __init__(self, tokens: TokenStream):
         self.tokens = tokens
-        self.root = ProgramNode(None)
-        self.pos = 0
+        self.kinds = tokens.kinds
+        self.size = len(tokens.kinds)
+        self.index = 0
+        self.current = self.kinds[0] if self.size else 0
+
+    def kind(self, offset):
+        ## Kind code of the token `offset` ahead, 0 past the end
+        index = self.index + offset
+        if index >= self.size:
+            return 0
+        return self.kinds[index]
+
+    def text(self):
+        return self.tokens.text(self.index)
+
+    def advance(self):
+        index = self.index + 1
+        self.index = index
+        self.current = self.kinds[index] if index < self.size else 0
+
+    def at_end(self):
+        return self.index >= self.size
+
+    def location(self):
+        if self.at_end():
+            return "end of input"
+        line, column = self.tokens.position(self.index)
+        return f"line {line}, column {column}"
+
 
-    def verifyTokens(self, *expectedTokens):
-        if self.pos + len(expectedTokens) > len(self.tokens):
-            return False
+class TokenCursor:
+    """Cursor that pulls (TokenType, str) pairs from an iterator on demand
 
-        for index, token in enumerate(expectedTokens):
-            if self.tokens[self.pos + index][0] != token:
+    At most LOOKAHEAD tokens are buffered, so the token list never has to
+    exist in full.
+    """
+
+    def __init__(self, tokens):
+        self.tokens = iter(tokens)
+        self.kinds = deque()
+        self.texts = deque()
+        self.index = 0
+        self.current = self.kind(0)
+
+    def fill(self, count):
+        if count > LOOKAHEAD:
+            raise IndexError(f"Lookahead is limited to {LOOKAHEAD} tokens")
+        while len(self.kinds) < count:
+            token = next(self.tokens, None)
+            if token is None:
                 return False
+            self.kinds.append(token[0].value)
+            self.texts.append(token[1])
         return True
 
-    def consumeTokens(self, *expectedTokens):
-        if self.verifyTokens(*expectedTokens):
-            self.pos += len(expectedTokens)
+    def kind(self, offset):
+        if offset >= len(self.kinds) and not self.fill(offset + 1):
+            return 0
+        return self.kinds[offset]
+
+    def text(self):
+        return self.texts[0]
+
+    def advance(self):
+        self.kinds.popleft()
+        self.texts.popleft()
+        self.index += 1
+        self.current = self.kinds[0] if self.kinds or self.fill(1) else 0
+
+    def at_end(self):
+        return self.current == 0
+
+    def location(self):
+        if self.at_end():
+            return "end of input"
+        return f"token {self.index}"
+
+
+class Parser:
+    def __init__(self, tokens):
+        ## Streams are read in place, anything else is pulled from lazily
+        if isinstance(tokens, TokenStream):
+            self.cursor = StreamCursor(tokens)
+        else:
+            self.cursor = TokenCursor(tokens)
+        self.root = ProgramNode(None)
+
+    def peek(self, offset=0):
+        ## Kind code `offset` tokens ahead, 0 past the end
+        if offset == 0:
+            return self.cursor.current
+        return self.cursor.kind(offset)
+
+    def consumeToken(self, token: TokenType):
+        if self.cursor.current == token.value:
+            self.cursor.advance()
             return True
         return False
 
-    def peek(self, num_tokens=1):
-        if self.pos + num_tokens > len(self.tokens):
-            return []
-        res = []
-        for i in range(num_tokens):
-            res.append(self.tokens[self.pos + i][0])
+    def expectToken(self, token: TokenType, message: str):
+        if self.cursor.current != token.value:
+            raise ValueError(f"{message} at {self.location()}")
+        self.cursor.advance()
 
-        return res
+    def location(self):
+        ## Where the parser is, for error messages
+        return self.cursor.location()
 
     def parseProgram(self):
         ## Always start with a 'prog'
@@ -105,100 +219,111 @@ class Parser:
 
         ## Should ensure that there isn't anything extra
         ## This may actually be unecessary
-        if len(self.tokens) != self.pos:
-            raise ValueError("Didn't quite parse everything")
+        if not self.cursor.at_end():
+            raise ValueError(f"Didn't quite parse everything, stopped at {self.location()}")
         self.root.function = parsedFunc
         return self.root
 
     def parseFunction(self):
-        startingPos = self.pos
-
-        if self.pos > len(self.tokens):
-            self.pos = startingPos
-            return None
-
-        if not self.consumeTokens(TokenType.INT):
-            self.pos = startingPos
-            raise ValueError("Function did not start with Int")
+        self.expectToken(TokenType.INT, "Function did not start with Int")
 
         parsed_identifier = self.parseIdentifier()
 
-        if not self.consumeTokens(
-            TokenType.POPEN, TokenType.VOID, TokenType.PCLOSE, TokenType.BOPEN
-        ):
-            self.pos = startingPos
-            raise ValueError("Function did not start with '(){'")
+        for token in (TokenType.POPEN, TokenType.VOID, TokenType.PCLOSE, TokenType.BOPEN):
+            self.expectToken(token, "Function did not start with '(){'")
 
         parsed_statement = self.parseStatement()
         if not parsed_statement:
             return None
 
-        if not self.consumeTokens(TokenType.BCLOSE):
-            self.pos = startingPos
-            raise ValueError("Can't parse Function")
+        self.expectToken(TokenType.BCLOSE, "Can't parse Function")
 
         return FunctionNode(parsed_identifier, parsed_statement)
 
     def parseStatement(self):
 
-        startingPos = self.pos
-        if not self.consumeTokens(TokenType.RETURN):
-            self.pos = startingPos
+        if not self.consumeToken(TokenType.RETURN):
             return None
 
         parsedExpr = self.parseExpression()
-        if not parsedExpr:
-            self.pos = startingPos
-            raise ValueError("Can't parse Statement")
-
-        if not self.consumeTokens(TokenType.SEMICOLON):
-            self.pos = startingPos
-            raise ValueError("Can't parse Statement")
+        self.expectToken(TokenType.SEMICOLON, "Can't parse Statement, expected ';'")
 
         return ReturnNode(parsedExpr)
 
-    def parseExpression(self, min_prec = 0):
-        left_expr = self.parseFactor()
-
-        next_token = self.peek(1)
-        while next_token != [] and next_token[0] in BINOP_TOKENS and BINOP_TOKENS[next_token[0]] >= min_prec:
-            self.pos += 1
-            op = BINOP_TOK_TO_AST[next_token[0]]
-            right_expr = self.parseExpression(min_prec=BINOP_TOKENS[next_token[0]] + 1)
-            left_expr = BinaryExpressionNode(op, left_expr, right_expr)
-            next_token = self.peek(1)
-
-        return left_expr
-   
-    def parseFactor(self):
-        if self.consumeTokens(TokenType.CONSTINT):
-            res = ConstIntNode(int(self.tokens[self.pos - 1][1]))
-            return res
-        elif self.consumeTokens(TokenType.NEGATE):
-            ## Unary time
-            expr = self.parseFactor()
-            return UnaryExpressionNode(UnaryOperatorNode.NEG, expr)
-        elif self.consumeTokens(TokenType.BITFLIP):
-            ## Unary time
-            expr = self.parseFactor()
-            return UnaryExpressionNode(UnaryOperatorNode.BITFLIP, expr)
-        elif self.consumeTokens(TokenType.NOT):
-            ## Unary time
-            expr = self.parseFactor()
-            return UnaryExpressionNode(UnaryOperatorNode.NOT, expr)
-        elif self.consumeTokens(TokenType.POPEN):
-            expr = self.parseExpression()
-            if not self.consumeTokens(TokenType.PCLOSE):
-                raise ValueError("Can't parse Expression: Invalid Paranthesis Closure")
-            return expr
-
+    def parseExpression(self):
+        ## Operator precedence parsing with explicit stacks instead of
+        ## recursion, so nesting depth is only limited by memory.
+        ## `operands` holds the left side of every pending binary operator,
+        ## `precs`/`ops` the pending operators, unary ones and "(" markers.
+        cursor = self.cursor
+        constint = TokenType.CONSTINT.value
+        popen = TokenType.POPEN.value
+        pclose = TokenType.PCLOSE.value
+        operands = []
+        precs = []
+        ops = []
+        while True:
+            ## Prefix position, stack up unary operators and "(" until a value
+            kind = cursor.current
+            while True:
+                op = PREFIX_OPERATOR[kind]
+                if op is not None:
+                    precs.append(UNARY_PREC)
+                    ops.append(op)
+                elif kind == popen:
+                    precs.append(GROUP_PREC)
+                    ops.append(None)
+                else:
+                    break
+                cursor.advance()
+                kind = cursor.current
+
+            if kind != constint:
+                raise ValueError(f"Can't parse Expression: expected a value at {self.location()}")
+            value = ConstIntNode(int(cursor.text()))
+            cursor.advance()
+
+            ## Infix position, fold everything `value` finishes
+            while True:
+                ## A finished factor takes the unary operators right before it
+                while precs and precs[-1] == UNARY_PREC:
+                    precs.pop()
+                    value = UnaryExpressionNode(ops.pop(), value)
+
+                kind = cursor.current
+                prec = INFIX_PRECEDENCE[kind]
+                if prec >= 0:
+                    ## Left associative, equal precedence folds first
+                    while precs and precs[-1] >= prec:
+                        precs.pop()
+                        value = BinaryExpressionNode(ops.pop(), operands.pop(), value)
+                    operands.append(value)
+                    precs.append(prec)
+                    ops.append(INFIX_OPERATOR[kind])
+                    cursor.advance()
+                    break
+
+                ## End of a group, or of the whole expression
+                while precs and precs[-1] != GROUP_PREC:
+                    precs.pop()
+                    value = BinaryExpressionNode(ops.pop(), operands.pop(), value)
+                if not precs:
+                    return value
+                if kind != pclose:
+                    raise ValueError(
+                        f"Can't parse Expression: Invalid Paranthesis Closure at {self.location()}"
+                    )
+                precs.pop()
+                ops.pop()
+                cursor.advance()
 
     def parseIdentifier(self):
 
-        if not self.consumeTokens(TokenType.IDENTIFIER):
-            raise ValueError("Can't parse Identifier")
+        if self.cursor.current != TokenType.IDENTIFIER.value:
+            raise ValueError(f"Can't parse Identifier at {self.location()}")
 
-        name = self.tokens[self.pos - 1][1]
+        name = self.cursor.text()
+        self.cursor.advance()
         return IdentifierNode(name)
 
 
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+
+from .driver import LINK_MODE, FileResult, error_message
+from .pyCmp import FAST_MODE, compile_source
+
+## Pipelined driver: preprocess -> compile -> assemble/link over many files,
+## with queues between the stages. gcc runs as async subprocesses, at most
+## `gcc_jobs` at a time across both gcc stages, while the Python stage
+## compiles whatever has been preprocessed already. Sources and assembly
+## are passed through pipes, only the outputs are written.
+
+## Items each queue holds per gcc job before its producer waits
+QUEUE_SLOTS = 2
+
+
+class StageStats:
+    """Load of one stage of the pipeline
+
+    Attributes:
+        name (str): Stage name
+        workers (int): How many items the stage works on at once
+        busy (float): Seconds spent working, summed over workers
+        items (int): Items that went through the stage
+        max_depth (int): Longest the stage's input queue got
+    """
+
+    __slots__ = ("name", "workers", "busy", "items", "max_depth", "depth_total")
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.busy = 0.0
+        self.items = 0
+        self.max_depth = 0
+        self.depth_total = 0
+
+    def sample(self, depth: int):
+        ## Input queue depth, sampled every time the stage takes an item
+        self.items += 1
+        self.depth_total += depth
+        self.max_depth = max(self.max_depth, depth)
+
+    def mean_depth(self) -> float:
+        return self.depth_total / self.items if self.items else 0.0
+
+    def utilization(self, wall: float) -> float:
+        ## Fraction of the stage's capacity that was in use
+        return self.busy / (self.workers * wall) if wall else 0.0
+
+
+class PipelineStats:
+    """Per stage load of a whole run, printable as a table"""
+
+    __slots__ = ("stages", "wall")
+
+    def __init__(self, stages: list[StageStats], wall: float):
+        self.stages = stages
+        self.wall = wall
+
+    def __str__(self):
+        lines = [
+            f"{'stage':<12} {'workers':>7} {'items':>6} {'mean q':>7} {'max q':>6} {'busy':>6}"
+        ]
+        for stage in self.stages:
+            lines.append(
+                f"{stage.name:<12} {stage.workers:>7} {stage.items:>6} {stage.mean_depth():>7.1f} "
+                f"{stage.max_depth:>6} {stage.utilization(self.wall):>6.0%}"
+            )
+        return "\n".join(lines)
+
+
+class Pipeline:
+    def __init__(self, mode: int, gcc_jobs: int, on_result):
+        self.mode = mode
+        self.gcc_slots = asyncio.Semaphore(gcc_jobs)
+        self.on_result = on_result
+        self.results = {}
+        ## The Python stage runs in its own thread, so the event loop keeps
+        ## collecting gcc's output while it compiles
+        self.compiler = ThreadPoolExecutor(max_workers=1)
+        self.stats = [
+            StageStats("preprocess", gcc_jobs),
+            StageStats("compile", 1),
+            StageStats("assemble" if mode >= LINK_MODE else "write", gcc_jobs),
+        ]
+
+    def finish(self, index: int, file_name: str, start: float, error: str | None):
+        result = FileResult(file_name, error is None, error, time.perf_counter() - start)
+        self.results[index] = result
+        if self.on_result is not None:
+            self.on_result(result)
+
+    async def gcc(self, args: list[str], failure: str, stdin: bytes | None = None) -> bytes:
+        process = await asyncio.create_subprocess_exec(
+            "gcc",
+            *args,
+            stdin=asyncio.subprocess.PIPE if stdin is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        out, err = await process.communicate(stdin)
+        if process.returncode != 0:
+            raise ValueError(f"{failure}\n{err.decode(errors='replace')}".rstrip())
+        return out
+
+    async def preprocess(self, file_name: str) -> bytes:
+        if file_name[-2:] != ".c":
+            raise ValueError(f'Invalid File Type "{file_name}"')
+        return await self.gcc(["-E", "-P", file_name, "-o", "-"], "Unable to PreProcess")
+
+    async def compile(self, source: bytes) -> str:
+        fast = self.mode == FAST_MODE
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.compiler, lambda: compile_source(source, fast=fast).assembly
+        )
+
+    async def assemble(self, file_name: str, assembly: str):
+        file_prefix = file_name[:-2]
+        if self.mode < LINK_MODE:
+            with open(f"{file_prefix}.s", "w", encoding="utf-8") as file_out:
+                file_out.write(assembly)
+            return
+        await self.gcc(
+            ["-x", "assembler", "-", "-o", file_prefix], "Unable to Assemble", assembly.encode()
+        )
+
+    async def worker(self, inbox: asyncio.Queue, outbox: asyncio.Queue | None, work, stats, slots):
+        while True:
+            item = await inbox.get()
+            if item is None:
+                ## Pass the end on to this stage's other workers
+                inbox.put_nowait(None)
+                return
+            stats.sample(inbox.qsize())
+            index, file_name, start, data = item
+            ## Busy time starts once the stage has a slot, waiting for gcc
+            ## slots isn't work
+            async with slots:
+                began = time.perf_counter()
+                try:
+                    output = await work(file_name, data)
+                except Exception as err:
+                    self.finish(index, file_name, start, error_message(err))
+                    continue
+                finally:
+                    stats.busy += time.perf_counter() - began
+            if outbox is None:
+                self.finish(index, file_name, start, None)
+            else:
+                await outbox.put((index, file_name, start, output))
+
+    async def stage(self, inbox, outbox, work, stats: StageStats, slots: asyncio.Semaphore):
+        await asyncio.gather(
+            *(self.worker(inbox, outbox, work, stats, slots) for _ in range(stats.workers))
+        )
+        if outbox is not None:
+            await outbox.put(None)
+
+    async def run(self, file_names: list[str]) -> list[FileResult]:
+        ## The first queue gets every file up front, the others are bounded
+        ## so preprocessing can't run arbitrarily far ahead of compiling
+        sources = asyncio.Queue()
+        for index, file_name in enumerate(file_names):
+            sources.put_nowait((index, file_name, time.perf_counter(), None))
+        sources.put_nowait(None)
+        bound = QUEUE_SLOTS * self.stats[0].workers
+        preprocessed = asyncio.Queue(maxsize=bound)
+        compiled = asyncio.Queue(maxsize=bound)
+
+        try:
+            await asyncio.gather(
+                self.stage(
+                    sources,
+                    preprocessed,
+                    lambda name, _: self.preprocess(name),
+                    self.stats[0],
+                    self.gcc_slots,
+                ),
+                self.stage(
+                    preprocessed,
+                    compiled,
+                    lambda _, source: self.compile(source),
+                    self.stats[1],
+                    asyncio.Semaphore(1),
+                ),
+                self.stage(compiled, None, self.assemble, self.stats[2], self.gcc_slots),
+            )
+        finally:
+            self.compiler.shutdown()
+        return [self.results[index] for index in range(len(file_names))]
+
+
+def compile_pipelined(
+    file_names, mode: int = LINK_MODE, gcc_jobs: int | None = None, on_result=None
+):
+    """Compile many files, overlapping gcc with the Python compiler
+
+    Args:
+        file_names (list[str]): The C files
+        mode (int): The py_compile mode, 3 and up (earlier stages print)
+        gcc_jobs (int): Most gcc processes at once, default is one per CPU
+        on_result (Callable[[FileResult], object]): Called with each result
+            as soon as its file is done
+
+    Raises:
+        ValueError: `mode` stops before codegen
+
+    Returns:
+        tuple[list[FileResult], PipelineStats]: One result per file, in the
+            order of `file_names`, and the load of every stage
+    """
+    if mode < 3:
+        raise ValueError(f"The pipeline only runs codegen and later modes, not {mode}")
+    file_names = list(file_names)
+    pipeline_start = time.perf_counter()
+
+    async def run():
+        pipeline = Pipeline(mode, gcc_jobs or os.cpu_count() or 1, on_result)
+        return await pipeline.run(file_names), pipeline.stats
+
+    results, stages = asyncio.run(run())
+    return results, PipelineStats(stages, time.perf_counter() - pipeline_start)
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+
+from .lexer import MASTER_PATTERN, TokenType
+
+## In process preprocessor for the subset of C preprocessing our sources use:
+## comments, line splicing, object-like #define/#undef, #include "..."
+## relative to the including file, and #if/#ifdef/#ifndef/#elif/#else/#endif
+## with defined. Anything else raises NotImplementedError, and so does any
+## source the compiler's lexer can't read, so a caller can hand the file to
+## gcc -E instead and get gcc's own output or errors.
+##
+## The output is the same token stream as gcc -E -P's, not always the same
+## text: macro expansions are spaced out differently. Like gcc, a space goes
+## wherever an expansion's edge would otherwise paste two tokens into
+## something else, so `#define LT <` makes `LT<2` into `< <2`, not `<<2`.
+
+## What gcc predefines outside the reserved namespace, on Linux
+PREDEFINED = {"unix": "1", "linux": "1"}
+
+## gcc predefines plenty of these (__x86_64__, __LINE__, ...), none of which
+## are modelled here
+RESERVED = re.compile(r"_[_A-Z]")
+
+## gcc's limit on nested #includes
+MAX_INCLUDE_DEPTH = 200
+
+## Comments become a space, quoted text is only matched so that comment
+## markers inside it are left alone
+COMMENT_OR_QUOTE = re.compile(
+    r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'', re.S
+)
+
+DIRECTIVE = re.compile(r"\s*#\s*(\w*)\s*(.*)", re.S)
+DEFINE = re.compile(r"([A-Za-z_]\w*)(\(?)\s*(.*)", re.S)
+INCLUDE = re.compile(r'"([^"\n]+)"\s*')
+IDENTIFIER = re.compile(r"[A-Za-z_]\w*")
+OCTAL = re.compile(r"0[0-7]*")
+
+CONDITIONALS = ("if", "ifdef", "ifndef", "elif", "else", "endif")
+
+## #if arithmetic is done in intmax_t
+INTMAX_MIN = -(1 << 63)
+INTMAX_MAX = (1 << 63) - 1
+
+
+class Token:
+    __slots__ = ("kind", "text", "space")
+
+    def __init__(self, kind: str, text: str, space: bool):
+        ## kind is the lexer's group name, keywords come out as IDENTIFIER
+        self.kind = kind
+        self.text = text
+        self.space = space
+
+
+_match_token = None
+
+
+def tokenize(text: str) -> list[Token]:
+    """Preprocessing tokens of one logical line"""
+    global _match_token
+    if _match_token is None:
+        _match_token = re.compile(MASTER_PATTERN).match
+    tokens = []
+    pos = 0
+    end = len(text.rstrip())
+    while pos < end:
+        match = _match_token(text, pos)
+        if match is None:
+            raise NotImplementedError(f"Can't tokenize {text[pos:].strip()!r}")
+        kind = match.lastgroup
+        token = match.group(kind)
+        if kind == "IDENTIFIER" and RESERVED.match(token):
+            raise NotImplementedError(f"Reserved identifier {token}")
+        tokens.append(Token(kind, token, match.start(kind) > pos))
+        pos = match.end()
+    return tokens
+
+
+def pastes(left: Token, right: Token) -> bool:
+    """Whether `left` and `right` written with nothing between lex differently"""
+    try:
+        joined = tokenize(left.text + right.text)
+    except NotImplementedError:
+        return True
+    return [token.text for token in joined] != [left.text, right.text]
+
+
+def strip_comments(text: str) -> str:
+    def replace(match):
+        comment = match.group()
+        return " " if comment[0] == "/" else comment
+
+    text = COMMENT_OR_QUOTE.sub(replace, text)
+    if "/*" in COMMENT_OR_QUOTE.sub("", text):
+        raise NotImplementedError("Unterminated comment")
+    return text
+
+
+class Preprocessor:
+    def __init__(self):
+        self.macros = {name: tokenize(body) for name, body in PREDEFINED.items()}
+        ## Every file read, for dependency tracking
+        self.dependencies = []
+        self.lines = []
+
+    def expand(self, tokens: list[Token], hidden: frozenset = frozenset()) -> list[Token]:
+        ## A macro isn't expanded again inside its own expansion
+        out = []
+        after_expansion = False
+        for token in tokens:
+            body = self.macros.get(token.text) if token.kind == "IDENTIFIER" else None
+            if body is None or token.text in hidden:
+                ## Tokens from the same text never paste, only ones that
+                ## meet at the end of an expansion can
+                if after_expansion and not token.space and out and pastes(out[-1], token):
+                    token = Token(token.kind, token.text, True)
+                out.append(token)
+                after_expansion = False
+                continue
+            expansion = self.expand(body, hidden | {token.text})
+            if expansion:
+                first = expansion[0]
+                expansion[0] = Token(first.kind, first.text, True)
+            out.extend(expansion)
+            after_expansion = True
+        return out
+
+    def process_file(self, file_name: str, depth: int = 0):
+        if depth > MAX_INCLUDE_DEPTH:
+            raise NotImplementedError("#include nested too deeply")
+        try:
+            with open(file_name, encoding="utf-8") as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError) as err:
+            raise NotImplementedError(f"Can't read {file_name}") from err
+        self.dependencies.append(file_name)
+
+        ## (taking this group, some group of this #if was taken, #else seen)
+        conditions = []
+        for line in strip_comments(text.replace("\\\n", "")).split("\n"):
+            active = all(condition[0] for condition in conditions)
+            directive = DIRECTIVE.match(line)
+            if directive is None:
+                if active:
+                    self.emit_line(line)
+                continue
+
+            name, rest = directive.groups()
+            if name in CONDITIONALS:
+                self.conditional(name, rest, conditions, active)
+            elif not active:
+                ## Skipped groups may hold any directive
+                continue
+            elif name == "define":
+                self.define(rest)
+            elif name == "undef":
+                self.macros.pop(self.macro_name(rest), None)
+            elif name == "include":
+                self.include(rest, file_name, depth)
+            elif name or rest.strip():
+                raise NotImplementedError(f"Unsupported directive #{name}")
+        if conditions:
+            raise NotImplementedError("Unterminated #if")
+
+    def emit_line(self, line: str):
+        tokens = self.expand(tokenize(line))
+        if not tokens:
+            ## Like gcc -P, blank lines are dropped
+            return
+        indent = line[: len(line) - len(line.lstrip())]
+        parts = [indent, tokens[0].text]
+        for token in tokens[1:]:
+            if token.space:
+                parts.append(" ")
+            parts.append(token.text)
+        self.lines.append("".join(parts))
+
+    def macro_name(self, rest: str) -> str:
+        match = IDENTIFIER.fullmatch(rest.strip())
+        if match is None or RESERVED.match(match.group()):
+            raise NotImplementedError(f"Unsupported macro name {rest.strip()!r}")
+        return match.group()
+
+    def define(self, rest: str):
+        match = DEFINE.fullmatch(rest)
+        if match is None:
+            raise NotImplementedError(f"Unsupported #define {rest.strip()!r}")
+        name, function_like, body = match.groups()
+        if function_like:
+            raise NotImplementedError(f"Function-like macro {name}")
+        self.macros[self.macro_name(name)] = tokenize(body)
+
+    def include(self, rest: str, file_name: str, depth: int):
+        ## Only "file" relative to the including file, a <file> or a file
+        ## found further along gcc's search path goes to gcc
+        match = INCLUDE.fullmatch(rest)
+        if match is None:
+            raise NotImplementedError(f"Unsupported #include {rest.strip()!r}")
+        included = os.path.join(os.path.dirname(file_name), match.group(1))
+        if not os.path.isfile(included):
+            raise NotImplementedError(f"{match.group(1)} isn't next to {file_name}")
+        self.process_file(included, depth + 1)
+
+    def conditional(self, name: str, rest: str, conditions: list, active: bool):
+        if name in ("if", "ifdef", "ifndef"):
+            ## Nothing in a skipped group is evaluated
+            outer = active
+            taken = outer and self.condition(name, rest)
+            conditions.append([taken, taken or not outer, False])
+            return
+        if not conditions:
+            raise NotImplementedError(f"#{name} without #if")
+        condition = conditions[-1]
+        if name == "endif":
+            conditions.pop()
+        elif condition[2]:
+            raise NotImplementedError(f"#{name} after #else")
+        elif name == "else":
+            condition[0] = not condition[1]
+            condition[1] = condition[2] = True
+        else:
+            condition[0] = not condition[1] and self.condition("if", rest)
+            condition[1] = condition[1] or condition[0]
+
+    def condition(self, name: str, rest: str) -> bool:
+        if name != "if":
+            defined = self.macro_name(rest) in self.macros
+            return defined if name == "ifdef" else not defined
+        return evaluate(self.if_tokens(tokenize(rest))) != 0
+
+    def if_tokens(self, tokens: list[Token]) -> list[tuple[TokenType, str]]:
+        ## `defined` goes first, then macros expand, then whatever
+        ## identifiers are left are 0
+        resolved = []
+        index = 0
+        while index < len(tokens):
+            token = tokens[index]
+            if token.text == "defined":
+                names = [t.text for t in tokens[index + 1 : index + 4]]
+                if names[:1] == ["("] and names[2:3] == [")"]:
+                    name, index = names[1], index + 4
+                elif names:
+                    name, index = names[0], index + 2
+                else:
+                    raise NotImplementedError("defined without a macro name")
+                if not IDENTIFIER.fullmatch(name):
+                    raise NotImplementedError(f"defined {name}")
+                resolved.append(Token("CONSTINT", "1" if name in self.macros else "0", True))
+                continue
+            resolved.append(token)
+            index += 1
+
+        tokens = []
+        for token in self.expand(resolved):
+            if token.kind == "IDENTIFIER":
+                if token.text == "defined":
+                    raise NotImplementedError("defined produced by a macro")
+                tokens.append((TokenType.CONSTINT, "0"))
+            elif token.kind == "CONSTINT" and token.text[0] == "0" and token.text != "0":
+                ## A leading 0 is octal, the parser would read it as decimal
+                if not OCTAL.fullmatch(token.text):
+                    raise NotImplementedError(f"Invalid octal constant {token.text}")
+                tokens.append((TokenType.CONSTINT, str(int(token.text, 8))))
+            else:
+                tokens.append((TokenType[token.kind], token.text))
+        return tokens
+
+
+def evaluate(tokens: list[tuple[TokenType, str]]) -> int:
+    """Value of an #if expression, with C's intmax_t arithmetic"""
+    ## The parser is only loaded once a source has an #if
+    from .parser import Parser
+
+    parser = Parser(tokens)
+    try:
+        expression = parser.parseExpression()
+    except ValueError as err:
+        raise NotImplementedError(f"Can't parse #if expression: {err}") from err
+    if not parser.cursor.at_end():
+        raise NotImplementedError("Junk after #if expression")
+    try:
+        return value_of(expression)
+    except RecursionError as err:
+        raise NotImplementedError("#if expression nested too deeply") from err
+
+
+def value_of(node) -> int:
+    from .ASTNode import (
+        BinaryExpressionNode,
+        BinaryOperatorNode,
+        ConstIntNode,
+        UnaryExpressionNode,
+        UnaryOperatorNode,
+    )
+
+    match node:
+        case ConstIntNode(value=value):
+            result = value
+        case UnaryExpressionNode(op=op, expr=expr):
+            value = value_of(expr)
+            if op == UnaryOperatorNode.NEG:
+                result = -value
+            elif op == UnaryOperatorNode.BITFLIP:
+                result = ~value
+            else:
+                result = int(not value)
+        case BinaryExpressionNode(op=BinaryOperatorNode.LAND, left_expr=left, right_expr=right):
+            return int(bool(value_of(left)) and bool(value_of(right)))
+        case BinaryExpressionNode(op=BinaryOperatorNode.LOR, left_expr=left, right_expr=right):
+            return int(bool(value_of(left)) or bool(value_of(right)))
+        case BinaryExpressionNode(op=op, left_expr=left, right_expr=right):
+            result = binary_value(op, value_of(left), value_of(right))
+        case _:
+            raise TypeError("Attempted to evaluate a non-expression")
+    if not INTMAX_MIN <= result <= INTMAX_MAX:
+        raise NotImplementedError("Overflow in #if expression")
+    return result
+
+
+def binary_value(op, left: int, right: int) -> int:
+    from .ASTNode import BinaryOperatorNode
+
+    if op in (BinaryOperatorNode.DIV, BinaryOperatorNode.MOD):
+        if right == 0:
+            raise NotImplementedError("Division by zero in #if expression")
+        ## C truncates towards zero
+        quotient = abs(left) // abs(right) * (1 if (left < 0) == (right < 0) else -1)
+        return quotient if op == BinaryOperatorNode.DIV else left - quotient * right
+    if op in (BinaryOperatorNode.LSHIFT, BinaryOperatorNode.RSHIFT):
+        if not 0 <= right < 64 or (op == BinaryOperatorNode.LSHIFT and left < 0):
+            raise NotImplementedError("Undefined shift in #if expression")
+        return left << right if op == BinaryOperatorNode.LSHIFT else left >> right
+    return {
+        BinaryOperatorNode.ADD: lambda: left + right,
+        BinaryOperatorNode.SUB: lambda: left - right,
+        BinaryOperatorNode.MUL: lambda: left * right,
+        BinaryOperatorNode.BITAND: lambda: left & right,
+        BinaryOperatorNode.BITOR: lambda: left | right,
+        BinaryOperatorNode.BITXOR: lambda: left ^ right,
+        BinaryOperatorNode.GE: lambda: int(left > right),
+        BinaryOperatorNode.GEQ: lambda: int(left >= right),
+        BinaryOperatorNode.LE: lambda: int(left < right),
+        BinaryOperatorNode.LEQ: lambda: int(left <= right),
+        BinaryOperatorNode.EQ: lambda: int(left == right),
+        BinaryOperatorNode.NEQ: lambda: int(left != right),
+    }[op]()
+
+
+def preprocess(file_name: str) -> tuple[str, list[str]]:
+    """Preprocess `file_name` in process, if it sticks to the supported subset
+
+    Raises:
+        NotImplementedError: The file needs something only gcc -E does,
+                             including reporting an error
+
+    Returns:
+        tuple[str, list[str]]: The preprocessed source, and every file read
+    """
+    preprocessor = Preprocessor()
+    preprocessor.process_file(file_name)
+    preprocessor.lines.append("")
+    return "\n".join(preprocessor.lines), list(dict.fromkeys(preprocessor.dependencies))
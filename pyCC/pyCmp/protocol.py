@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import struct
+
+## Wire format between the compile server and its clients. Kept free of
+## compiler imports, so the client starts as fast as the interpreter does.
+##
+## Request:  kind (u8), mode (u8), body length (u32), body
+## Response: status (u8), body length (u32), body
+## Bodies are utf-8: a path or source in, assembly or diagnostics out.
+
+REQUEST = struct.Struct("!BBI")
+RESPONSE = struct.Struct("!BI")
+
+## Request kinds
+PATH = 1  ## Body is a .c file, the server preprocesses it
+SOURCE = 2  ## Body is already preprocessed source
+STATS = 3  ## No body, the answer is the server's latency summary
+
+## Response statuses
+OK = 0
+ERROR = 1
+
+
+def default_socket_path() -> str:
+    return os.environ.get("PYCC_SOCKET") or os.path.join(
+        os.environ.get("TMPDIR", "/tmp"), f"pycc-{os.getuid()}.sock"
+    )
+
+
+def recv_exact(sock, size: int) -> bytes:
+    """Read exactly `size` bytes, b"" if the peer closed before sending any"""
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            if chunks:
+                raise ConnectionError("Connection closed mid message")
+            return b""
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def send_request(sock, kind: int, mode: int, body: bytes = b""):
+    sock.sendall(REQUEST.pack(kind, mode, len(body)) + body)
+
+
+def read_request(sock):
+    """(kind, mode, body) of the next request, None once the client is done"""
+    header = recv_exact(sock, REQUEST.size)
+    if not header:
+        return None
+    kind, mode, size = REQUEST.unpack(header)
+    return kind, mode, recv_exact(sock, size)
+
+
+def send_response(sock, status: int, body: bytes):
+    sock.sendall(RESPONSE.pack(status, len(body)) + body)
+
+
+def read_response(sock) -> tuple[int, bytes]:
+    header = recv_exact(sock, RESPONSE.size)
+    if not header:
+        raise ConnectionError("Server closed the connection")
+    status, size = RESPONSE.unpack(header)
+    return status, recv_exact(sock, size)
@@ -1,10 +1,164 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from . import tackygen
+from enum import IntEnum
+import io
+import os
+
 from . import lexer
-from . import parser
-from . import asmgen
+
+## Later stages are imported inside py_compile, once the mode is known to
+## reach them. A --lex run never loads the parser or the backend.
+
+## py_compile's default mode, this one and FAST_MODE also assemble and
+## link (the driver does that part)
+LINK_MODE = 4
+
+## Single pass mode: straight from tokens to assembly, no AST or TACKY
+FAST_MODE = 5
+
+
+class Stage(IntEnum):
+    """Where compile_source stops, the values match py_compile's modes"""
+
+    LEX = 0
+    PARSE = 1
+    TACKY = 2
+    ASM = 3
+    ASSEMBLY = 4
+
+
+class CompileResult:
+    """What compile_source produced, stages it didn't reach are None
+
+    Attributes:
+        tokens (TokenStream): The lexed source
+        ast (ProgramNode): The parsed program
+        tacky (ProgramTacky): The TACKY generated from the AST
+        asm (ProgramASM): The generated assembly, as objects
+        assembly (str): The assembly text
+    """
+
+    __slots__ = ("tokens", "ast", "tacky", "asm", "assembly")
+
+    def __init__(self, tokens=None, ast=None, tacky=None, asm=None, assembly=None):
+        self.tokens = tokens
+        self.ast = ast
+        self.tacky = tacky
+        self.asm = asm
+        self.assembly = assembly
+
+    def __repr__(self):
+        reached = ", ".join(
+            f"{name}=..." for name in self.__slots__ if getattr(self, name) is not None
+        )
+        return f"CompileResult({reached})"
+
+
+def compile_source(
+    source: str | bytes, stop_after: Stage = Stage.ASSEMBLY, fast: bool = False
+) -> CompileResult:
+    """Compile preprocessed source held in memory, without files or printing
+
+    Args:
+        source (str | bytes): The preprocessed C source, str is encoded as utf-8
+        stop_after (Stage): Last stage to run (default is Stage.ASSEMBLY)
+        fast (bool): Go straight from tokens to assembly text, like FAST_MODE.
+                     Only the tokens and the assembly are filled in.
+
+    Raises:
+        ValueError: Invalid source, or `fast` without Stage.ASSEMBLY
+
+    Returns:
+        CompileResult: The output of every stage that ran
+    """
+    stop_after = Stage(stop_after)
+    if fast and stop_after != Stage.ASSEMBLY:
+        raise ValueError("fast compiles only produce assembly, stop_after must be Stage.ASSEMBLY")
+
+    result = CompileResult(tokens=lexer.lex_stream(source))
+    if fast:
+        from . import fastgen
+
+        out = io.StringIO()
+        fastgen.fastcompile(result.tokens, out)
+        result.assembly = out.getvalue()
+        return result
+    if stop_after == Stage.LEX:
+        return result
+
+    from . import parser
+
+    result.ast = parser.parse(result.tokens)
+    if stop_after == Stage.PARSE:
+        return result
+
+    from . import tackygen
+
+    result.tacky = tackygen.tackify(result.ast)
+    if stop_after == Stage.TACKY:
+        return result
+
+    from . import asmgen
+    from .asmemit import emitProgram
+
+    result.asm = asmgen.asmFromTacky(result.tacky)
+    if stop_after == Stage.ASM:
+        return result
+
+    out = io.StringIO()
+    emitProgram(result.asm, out)
+    result.assembly = out.getvalue()
+    return result
+
+
+def compile_to(source: bytes, file_out, mode: int):
+    """Like py_compile, for preprocessed source already in memory
+
+    Args:
+        source (bytes): The preprocessed C source
+        file_out (TextIO): Where the assembly is streamed, unused by the
+                           modes before codegen, which print
+        mode (int): Which level of compiling the compiler will run under
+    """
+    tokens = lexer.lex_stream(source)
+    if mode == FAST_MODE:
+        from . import fastgen
+
+        fastgen.fastcompile(tokens, file_out)
+        return
+    if mode < 1:
+        print(tokens)
+        return
+
+    from . import parser
+
+    program = parser.parse(tokens)
+    if mode < 2:
+        print(program)
+        return
+
+    from . import tackygen
+
+    tacky = tackygen.tackify(program)
+    if mode < 3:
+        print(tacky)
+        return
+
+    from . import asmgen
+
+    asmgen.asmwrite(tacky, file_out)
+
+
+def map_file(file_in):
+    """Read-only mmap of an open binary file (mmap can't map an empty file)"""
+    ## Only py_compile reads files, the driver hands compile_to the source
+    from contextlib import nullcontext
+    import mmap
+
+    if os.fstat(file_in.fileno()).st_size == 0:
+        return nullcontext(b"")
+    return mmap.mmap(file_in.fileno(), 0, access=mmap.ACCESS_READ)
 
 
 def py_compile(file_in_name: str, file_out_name: str, mode: int):
@@ -14,30 +168,57 @@ def py_compile(file_in_name: str, file_out_name: str, mode: int):
         file_in_name (str): Name of the input file
         file_out_name (str): name of the output file
         mode (int): Which level of compiling the compiler will run under,
-                    (default is 4 (max level))
+                    (default is 4 (max level), FAST_MODE skips AST and TACKY)
 
     Returns:
         _type_: _description_
     """
-    with open(file_in_name, "r", encoding="utf-8") as file_in:
-        lex_put = lexer.lex(file_in.read())
-        if mode < 1:
+    if mode == FAST_MODE:
+        from . import fastgen
+
+        with open(file_in_name, "rb") as file_in, map_file(file_in) as source:
+            tokens = lexer.lex_stream(source)
+            try:
+                with open(file_out_name, "w", encoding="utf-8") as file_out:
+                    fastgen.fastcompile(tokens, file_out)
+            except Exception:
+                ## The assembly is written as it's parsed, don't leave half
+                ## of it behind
+                if os.path.exists(file_out_name):
+                    os.remove(file_out_name)
+                raise
+            finally:
+                tokens.release()
+        return True
+
+    if mode < 1:
+        with open(file_in_name, "rb") as file_in, map_file(file_in) as source:
+            lex_put = lexer.lex_stream(source)
             print(lex_put)
-            return True
+            ## The mmap can't close while the tokens still view it
+            lex_put.release()
+        return True
+
+    from . import parser
+
+    with open(file_in_name, "rb") as file_in:
+        ## Tokens are lexed from the file as the parser asks for them
+        parse_put = parser.parse(lexer.lex_iter(file_in))
+    if mode < 2:
+        print(parse_put)
+        return True
 
-        parse_put = parser.parse(lex_put)
-        if mode < 2:
-            print(parse_put)
-            return True
+    from . import tackygen
 
-        tacky = tackygen.tackify(parse_put)
-        if mode < 3:
-            print(tacky)
-            return True
+    tacky = tackygen.tackify(parse_put)
+    if mode < 3:
+        print(tacky)
+        return True
 
-        asm = asmgen.asmgenerate(tacky)
+    from . import asmgen
 
-        with open(file_out_name, "w", encoding="utf-8") as file_out:
-            file_out.write(asm)
+    ## The assembly is streamed into the file as it's formatted
+    with open(file_out_name, "w", encoding="utf-8") as file_out:
+        asmgen.asmwrite(tacky, file_out)
 
     return True
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from collections import deque
+import os
+import socket
+import socketserver
+import stat
+import threading
+import time
+
+from . import protocol
+from .driver import error_message, preprocess_source
+from .pyCmp import FAST_MODE, compile_source
+
+## Long running compile server: the compiler's modules and tables are loaded
+## once, every request only pays for its own compile. One thread per
+## connection, a connection can send any number of requests.
+
+## Request latencies the percentiles are taken over
+LATENCY_WINDOW = 10_000
+
+
+class LatencyStats:
+    """Service times of the most recent requests, safe across threads"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+
+    def record(self, seconds: float, ok: bool):
+        with self.lock:
+            self.latencies.append(seconds)
+            self.requests += 1
+            self.errors += not ok
+
+    def percentiles(self, points=(50, 90, 99, 100)) -> dict[int, float]:
+        ## Nearest rank percentiles, in seconds
+        with self.lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return {point: 0.0 for point in points}
+        return {
+            point: latencies[max(0, -(-point * len(latencies) // 100) - 1)] for point in points
+        }
+
+    def summary(self) -> str:
+        parts = [f"requests {self.requests}", f"errors {self.errors}"]
+        for point, seconds in self.percentiles().items():
+            name = "max" if point == 100 else f"p{point}"
+            parts.append(f"{name} {seconds * 1000:.2f} ms")
+        return ", ".join(parts)
+
+
+def answer(kind: int, mode: int, body: bytes, stats: LatencyStats) -> tuple[int, bytes]:
+    """(status, body) of the response to one request"""
+    if kind == protocol.STATS:
+        return protocol.OK, stats.summary().encode()
+    try:
+        if kind == protocol.PATH:
+            body = preprocess_source(body.decode())
+        elif kind != protocol.SOURCE:
+            raise ValueError(f"Unknown request kind {kind}")
+        assembly = compile_source(body, fast=mode == FAST_MODE).assembly
+    except Exception as err:
+        return protocol.ERROR, error_message(err).encode()
+    return protocol.OK, assembly.encode()
+
+
+class CompileHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            request = protocol.read_request(self.request)
+            if request is None:
+                return
+            start = time.perf_counter()
+            status, body = answer(*request, self.server.stats)
+            protocol.send_response(self.request, status, body)
+            if request[0] != protocol.STATS:
+                self.server.stats.record(time.perf_counter() - start, status == protocol.OK)
+
+
+class CompileServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str):
+        ## A socket left behind by a server that died would block the bind,
+        ## one that still answers belongs to a running server. Anything but
+        ## a socket is someone's file, and left alone
+        try:
+            mode = os.lstat(socket_path).st_mode
+        except FileNotFoundError:
+            mode = None
+        if mode is not None:
+            if not stat.S_ISSOCK(mode):
+                raise OSError(f"{socket_path} exists and is not a socket")
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                if probe.connect_ex(socket_path) == 0:
+                    raise OSError(f"A server is already listening on {socket_path}")
+            os.remove(socket_path)
+        super().__init__(socket_path, CompileHandler)
+        self.socket_path = socket_path
+        self.stats = LatencyStats()
+        ## Load every stage now, not on the first request
+        compile_source("int main(void) { return 0; }")
+        compile_source("int main(void) { return 0; }", fast=True)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+def serve(socket_path: str | None = None):
+    """Serve compile requests on a Unix socket until interrupted
+
+    Args:
+        socket_path (str): Where to listen, default is protocol.default_socket_path()
+    """
+    with CompileServer(socket_path or protocol.default_socket_path()) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            print(server.stats.summary())
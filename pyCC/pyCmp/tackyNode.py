@@ -1,11 +1,10 @@
 from enum import Enum, auto
-from typing import List
 
 
 class TackyNode:
     # abstract class
     # Maybe i add stuff here to give errors?
-    pass
+    __slots__ = ()
 
 
 class UnaryOpTacky(Enum):
@@ -35,11 +34,60 @@ class BinaryOpTacky(Enum):
     LOR = auto()
 
 
+## Temporaries and labels are integer ids, handed out by a function's
+## SymbolTable. They only turn into text when something is printed or
+## emitted. Hand written TACKY may still use str names for either.
+##
+## A label id is (pair << 2) | kind: every short circuiting operator gets a
+## numbered pair of labels, and the kind says which label of the pair it is.
+LABEL_KINDS = ("or_true", "or_end", "and_false", "and_end")
+OR_TRUE = 0
+OR_END = 1
+AND_FALSE = 2
+AND_END = 3
+
+
+def var_text(name: int | str) -> str:
+    if type(name) is int:
+        return f".tmp{name}"
+    return name
+
+
+def label_text(name: int | str) -> str:
+    if type(name) is int:
+        return f"{LABEL_KINDS[name & 3]}{name >> 2}"
+    return name
+
+
+class SymbolTable:
+    """Temporaries and labels handed out for one function"""
+
+    __slots__ = ("num_temps", "num_label_pairs")
+
+    def __init__(self):
+        self.num_temps = 0
+        self.num_label_pairs = 0
+
+    def new_temp(self) -> int:
+        temp = self.num_temps
+        self.num_temps = temp + 1
+        return temp
+
+    def new_label_pair(self, first_kind: int) -> int:
+        ## Returns the id of the `first_kind` label, the other one is id + 1
+        pair = self.num_label_pairs
+        self.num_label_pairs = pair + 1
+        return pair << 2 | first_kind
+
+
 class ValTacky(TackyNode):
-    pass
+    __slots__ = ()
 
 
 class ConstIntTacky(ValTacky):
+    __slots__ = ("val",)
+    __match_args__ = ("val",)
+
     def __init__(self, val: int):
         self.val = val
 
@@ -48,18 +96,24 @@ class ConstIntTacky(ValTacky):
 
 
 class VarTacky(ValTacky):
-    def __init__(self, name: str):
+    __slots__ = ("name",)
+    __match_args__ = ("name",)
+
+    def __init__(self, name: int | str):
         self.name = name
 
     def __repr__(self):
-        return f"Var({self.name})"
+        return f"Var({var_text(self.name)})"
 
 
 class InstructionTacky(TackyNode):
-    pass
+    __slots__ = ()
 
 
 class ReturnTacky(InstructionTacky):
+    __slots__ = ("val",)
+    __match_args__ = ("val",)
+
     def __init__(self, val: ValTacky):
         self.val = val
 
@@ -68,6 +122,9 @@ class ReturnTacky(InstructionTacky):
 
 
 class UnaryTacky(InstructionTacky):
+    __slots__ = ("op", "src", "dst")
+    __match_args__ = ("op", "src", "dst")
+
     def __init__(self, op: UnaryOpTacky, src: ValTacky, dst: VarTacky):
         self.op = op
         self.src = src
@@ -78,6 +135,9 @@ class UnaryTacky(InstructionTacky):
 
 
 class BinaryTacky(InstructionTacky):
+    __slots__ = ("op", "left_val", "right_val", "dst")
+    __match_args__ = ("op", "left_val", "right_val", "dst")
+
     def __init__(
         self, op: BinaryOpTacky, left_val: ValTacky, right_val: ValTacky, dst: VarTacky
     ):
@@ -91,6 +151,9 @@ class BinaryTacky(InstructionTacky):
 
 
 class CopyTacky(InstructionTacky):
+    __slots__ = ("src", "dst")
+    __match_args__ = ("src", "dst")
+
     def __init__(self, src: ValTacky, dst: ValTacky):
         self.src = src
         self.dst = dst
@@ -100,14 +163,20 @@ class CopyTacky(InstructionTacky):
 
 
 class LabelTacky(InstructionTacky):
-    def __init__(self, name: str):
+    __slots__ = ("name",)
+    __match_args__ = ("name",)
+
+    def __init__(self, name: int | str):
         self.name = name
 
     def __repr__(self):
-        return f"Label({self.name})"
+        return f"Label({label_text(self.name)})"
 
 
 class JumpTacky(InstructionTacky):
+    __slots__ = ("target",)
+    __match_args__ = ("target",)
+
     def __init__(self, target: LabelTacky):
         self.target = target
 
@@ -116,6 +185,9 @@ class JumpTacky(InstructionTacky):
 
 
 class JumpIfZero(InstructionTacky):
+    __slots__ = ("condition", "target")
+    __match_args__ = ("condition", "target")
+
     def __init__(self, condition: ValTacky, target: LabelTacky):
         self.condition = condition
         self.target = target
@@ -125,6 +197,9 @@ class JumpIfZero(InstructionTacky):
 
 
 class JumpIfNotZero(InstructionTacky):
+    __slots__ = ("condition", "target")
+    __match_args__ = ("condition", "target")
+
     def __init__(self, condition: ValTacky, target: LabelTacky):
         self.condition = condition
         self.target = target
@@ -134,9 +209,18 @@ class JumpIfNotZero(InstructionTacky):
 
 
 class FuncTacky(TackyNode):
-    def __init__(self, identifier: str, instructions: List[InstructionTacky]):
+    __slots__ = ("identifier", "instructions", "symbols")
+    __match_args__ = ("identifier", "instructions", "symbols")
+
+    def __init__(
+        self,
+        identifier: str,
+        instructions: list[InstructionTacky],
+        symbols: SymbolTable = None,
+    ):
         self.identifier = identifier
         self.instructions = instructions
+        self.symbols = symbols if symbols is not None else SymbolTable()
 
     def __repr__(self):
         res = f"Func({self.identifier},["
@@ -148,6 +232,9 @@ class FuncTacky(TackyNode):
 
 
 class ProgramTacky(TackyNode):
+    __slots__ = ("func",)
+    __match_args__ = ("func",)
+
     def __init__(self, func: FuncTacky):
         self.func = func
 
@@ -12,6 +12,7 @@ from .ASTNode import (
     UnaryOperatorNode,
 )
 from .tackyNode import (
+    AND_FALSE,
     BinaryOpTacky,
     BinaryTacky,
     ConstIntTacky,
@@ -21,8 +22,10 @@ from .tackyNode import (
     JumpIfZero,
     JumpTacky,
     LabelTacky,
+    OR_TRUE,
     ProgramTacky,
     ReturnTacky,
+    SymbolTable,
     UnaryOpTacky,
     UnaryTacky,
     VarTacky,
@@ -54,78 +57,115 @@ OP_TABLE = {
 }
 
 
-class TackyGen:
-    def __init__(self):
-        self.vars_used = 0
-        self.labels_used = 0
+## Steps of the emit_tacky walk
+ENTER = 0
+UNARY_DONE = 1
+BINARY_DONE = 2
+LOGIC_LEFT_DONE = 3
+LOGIC_DONE = 4
 
-    def genVariable(self):
-        res = VarTacky(f".tmp{self.vars_used}")
-        self.vars_used += 1
-        return res
 
-    def emit_tacky(self, node: ExpressionNode):
-        match node:
-            case ConstIntNode(value=val):
-                return ConstIntTacky(val), []
-            case UnaryExpressionNode(op=op, expr=expr):
-                src, instructions = self.emit_tacky(expr)
-                new_var = self.genVariable()
-                instructions.append(UnaryTacky(OP_TABLE[op], src, new_var))
-                return new_var, instructions
-            case BinaryExpressionNode(
-                op=BinaryOperatorNode.LOR, left_expr=left_expr, right_expr=right_expr
-            ):
-                new_var = self.genVariable()
+class TackyBuilder:
+    """Instruction buffer for one function
 
-                left_src, instructions = self.emit_tacky(left_expr)
-                instructions.append(JumpIfNotZero(left_src, LabelTacky(f"or_true{self.labels_used}")))
+    Everything TackyGen produces for the function is appended here, in
+    order, so each instruction is written exactly once.
+    """
 
-                right_src, right_instructions = self.emit_tacky(right_expr)
-                instructions += right_instructions
-                instructions.append(JumpIfNotZero(right_src, LabelTacky(f"or_true{self.labels_used}")))
-                instructions.append(CopyTacky(ConstIntTacky(0), new_var))
-                instructions.append(JumpTacky(LabelTacky(f"or_end{self.labels_used}")))
+    def __init__(self):
+        self.instructions = []
+        self.emit = self.instructions.append
 
-                instructions.append(LabelTacky(f"or_true{self.labels_used}"))
-                instructions.append(CopyTacky(ConstIntTacky(1), new_var))
-                instructions.append(LabelTacky(f"or_end{self.labels_used}"))
 
-                self.labels_used += 1
-                return new_var, instructions
-            case BinaryExpressionNode(
-                op=BinaryOperatorNode.LAND, left_expr=left_expr, right_expr=right_expr
-            ):
+class TackyGen:
+    def __init__(self):
+        ## Replaced for every function, see create()
+        self.symbols = SymbolTable()
+        self.builder = None
+
+    def genVariable(self):
+        return VarTacky(self.symbols.new_temp())
+
+    def genLabels(self, op: BinaryOperatorNode):
+        ## (jump, decided label, end label) for a short circuiting operator,
+        ## the label objects are shared by the jumps and the definitions
+        if op == BinaryOperatorNode.LOR:
+            label = self.symbols.new_label_pair(OR_TRUE)
+            return JumpIfNotZero, LabelTacky(label), LabelTacky(label + 1)
+        label = self.symbols.new_label_pair(AND_FALSE)
+        return JumpIfZero, LabelTacky(label), LabelTacky(label + 1)
+
+    def emit_tacky(self, node: ExpressionNode, builder: TackyBuilder = None):
+        ## Post-order walk with an explicit stack, so nesting depth is only
+        ## limited by memory. Each stack entry is (step, node, data) and the
+        ## value of every finished subexpression goes onto `values`.
+        ## Instructions go straight into `builder` (a fresh one if not given)
+        if builder is None:
+            builder = TackyBuilder()
+        emit = builder.emit
+        values = []
+        stack = [(ENTER, node, None)]
+        while stack:
+            step, node, data = stack.pop()
+            if step == ENTER:
+                match node:
+                    case ConstIntNode(value=val):
+                        values.append(ConstIntTacky(val))
+                    case UnaryExpressionNode(expr=expr):
+                        stack.append((UNARY_DONE, node, None))
+                        stack.append((ENTER, expr, None))
+                    case BinaryExpressionNode(
+                        op=BinaryOperatorNode.LOR | BinaryOperatorNode.LAND,
+                        left_expr=left_expr,
+                        right_expr=right_expr,
+                    ):
+                        ## The result and labels belong to the outer operator,
+                        ## so they're picked before either side is walked
+                        new_var = self.genVariable()
+                        labels = self.genLabels(node.op)
+                        stack.append((LOGIC_DONE, node, (new_var, labels)))
+                        stack.append((ENTER, right_expr, None))
+                        stack.append((LOGIC_LEFT_DONE, node, labels))
+                        stack.append((ENTER, left_expr, None))
+                    case BinaryExpressionNode(left_expr=left_expr, right_expr=right_expr):
+                        stack.append((BINARY_DONE, node, None))
+                        stack.append((ENTER, right_expr, None))
+                        stack.append((ENTER, left_expr, None))
+                    case _:
+                        raise TypeError("Attempted to run 'emit_tacky' on a non-expression")
+
+            elif step == UNARY_DONE:
+                src = values.pop()
                 new_var = self.genVariable()
+                emit(UnaryTacky(OP_TABLE[node.op], src, new_var))
+                values.append(new_var)
 
-                left_src, instructions = self.emit_tacky(left_expr)
-                instructions.append(JumpIfZero(left_src, LabelTacky(f"and_false{self.labels_used}")))
-
-                right_src, right_instructions = self.emit_tacky(right_expr)
-                instructions += right_instructions
-                instructions.append(JumpIfZero(right_src, LabelTacky(f"and_false{self.labels_used}")))
-                instructions.append(CopyTacky(ConstIntTacky(1), new_var))
-                instructions.append(JumpTacky(LabelTacky(f"and_end{self.labels_used}")))
-
-                instructions.append(LabelTacky(f"and_false{self.labels_used}"))
-                instructions.append(CopyTacky(ConstIntTacky(0), new_var))
-                instructions.append(LabelTacky(f"and_end{self.labels_used}"))
-
-                self.labels_used += 1
-                return new_var, instructions
-            case BinaryExpressionNode(
-                op=op, left_expr=left_expr, right_expr=right_expr
-            ):
-                left_src, left_instructions = self.emit_tacky(left_expr)
-                right_src, right_instructions = self.emit_tacky(right_expr)
-                instructions = left_instructions + right_instructions
-                new_op = OP_TABLE[op]
+            elif step == BINARY_DONE:
+                right_src = values.pop()
+                left_src = values.pop()
                 new_var = self.genVariable()
-                instructions.append(BinaryTacky(new_op, left_src, right_src, new_var))
-                return new_var, instructions
+                emit(BinaryTacky(OP_TABLE[node.op], left_src, right_src, new_var))
+                values.append(new_var)
+
+            elif step == LOGIC_LEFT_DONE:
+                ## Short circuit: jump to the "decided" label on the left value
+                jump, decided_label, _ = data
+                emit(jump(values.pop(), decided_label))
+
+            else:
+                new_var, (jump, decided_label, end_label) = data
+                ## || is decided by a true side, && by a false one
+                decided = 1 if node.op == BinaryOperatorNode.LOR else 0
+                emit(jump(values.pop(), decided_label))
+                emit(CopyTacky(ConstIntTacky(1 - decided), new_var))
+                emit(JumpTacky(end_label))
 
+                emit(decided_label)
+                emit(CopyTacky(ConstIntTacky(decided), new_var))
+                emit(end_label)
+                values.append(new_var)
 
-        raise TypeError("Attempted to run 'emit_tacky' on a non-expression")
+        return values.pop(), builder.instructions
 
     def create(self, node: ASTNode):
         ## This should only be run at non instruction-producing Nodes
@@ -134,10 +174,16 @@ class TackyGen:
                 res = self.create(func)
                 return ProgramTacky(res)
             case FunctionNode(identifier=name, statement=statement):
-                return FuncTacky(self.create(name), self.create(statement))
+                self.builder = TackyBuilder()
+                self.symbols = SymbolTable()
+                self.create(statement)
+                res = FuncTacky(self.create(name), self.builder.instructions, self.symbols)
+                self.builder = None
+                return res
             case ReturnNode(expression=expression):
-                src, instructions = self.emit_tacky(expression)
-                instructions.append(ReturnTacky(src))
+                builder = self.builder or TackyBuilder()
+                src, instructions = self.emit_tacky(expression, builder)
+                builder.emit(ReturnTacky(src))
                 return instructions
             case IdentifierNode(name=name):
                 return name
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+
+## The as and ld commands the gcc driver runs to turn one assembly file into
+## a binary, so they can be run without it: no spec processing, no
+## collect2, one process less per step. gcc -### prints them without
+## running anything. They're kept on disk per gcc binary, so only the first
+## compile after gcc changes asks. ld gets exactly collect2's arguments bar
+## the LTO plugin, which has nothing to do for an assembly file, so the
+## binary is byte for byte the one gcc would have linked.
+
+## Stand-ins for the paths in the commands, swapped for the real ones on use
+OBJECT = "\0object"
+OUTPUT = "\0output"
+
+## What gcc -### is asked to build
+PROBE_INPUT = "pycc-probe.s"
+PROBE_OUTPUT = "pycc-probe"
+
+_commands = None
+
+
+def cache_directory() -> str:
+    return os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "pycc"
+    )
+
+
+def gcc_identity() -> str:
+    ## A new gcc, or the same one reinstalled, can link differently
+    gcc = shutil.which("gcc")
+    if gcc is None:
+        raise OSError("gcc not found")
+    stat = os.stat(gcc)
+    return hashlib.sha256(
+        f"{os.path.realpath(gcc)}\0{stat.st_mtime_ns}\0{stat.st_size}".encode()
+    ).hexdigest()
+
+
+def program(name: str) -> str:
+    ## The as or ld gcc itself would run
+    result = subprocess.run(
+        ["gcc", f"-print-prog-name={name}"], capture_output=True, text=True, check=False
+    )
+    path = result.stdout.strip()
+    return (shutil.which(path) or path) if result.returncode == 0 and path else name
+
+
+def discover() -> dict[str, list[str]]:
+    """The as and ld commands of `gcc x.s -o x`, with OBJECT and OUTPUT in them
+
+    Raises:
+        NotImplementedError: gcc runs anything but one as and one collect2
+    """
+    result = subprocess.run(
+        ["gcc", "-###", "-x", "assembler", PROBE_INPUT, "-o", PROBE_OUTPUT],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    ## Commands are the lines indented by a space
+    commands = [shlex.split(line) for line in result.stderr.splitlines() if line.startswith(" ")]
+    if result.returncode != 0 or len(commands) != 2 or "-o" not in commands[0]:
+        raise NotImplementedError(f"Can't tell how gcc assembles and links:\n{result.stderr}")
+    assemble, link = commands
+    object_file = assemble[assemble.index("-o") + 1]
+
+    ## No input file, as reads the assembly from stdin
+    assemble = [program("as")] + [
+        OBJECT if arg == object_file else arg for arg in assemble[1:] if arg != PROBE_INPUT
+    ]
+    link_args = []
+    args = iter(link[1:])
+    for arg in args:
+        if arg == "-plugin":
+            next(args, None)
+        elif not arg.startswith("-plugin-opt="):
+            link_args.append({object_file: OBJECT, PROBE_OUTPUT: OUTPUT}.get(arg, arg))
+    if OBJECT not in link_args or OUTPUT not in link_args:
+        raise NotImplementedError(f"Can't tell how gcc links:\n{result.stderr}")
+    return {"as": assemble, "ld": [program("ld")] + link_args}
+
+
+def load_commands() -> dict[str, list[str]]:
+    ## From disk when this gcc was asked before, else from gcc, then saved
+    path = os.path.join(cache_directory(), f"toolchain-{gcc_identity()}.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+    commands = discover()
+    ## Only a cache, the commands work without it
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp")
+    except OSError:
+        return commands
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as out:
+            json.dump(commands, out)
+        os.replace(temporary, path)
+    except OSError:
+        os.remove(temporary)
+    return commands
+
+
+def link_commands(object_file: str, output: str) -> tuple[list[str], list[str]]:
+    """The as command (reading stdin) and ld command from assembly to `output`
+
+    Args:
+        object_file (str): Where as puts the object ld links
+        output (str): The binary
+
+    Raises:
+        NotImplementedError: gcc doesn't assemble and link the usual way
+    """
+    global _commands
+    if _commands is None:
+        _commands = load_commands()
+    paths = {OBJECT: object_file, OUTPUT: output}
+    return (
+        [paths.get(arg, arg) for arg in _commands["as"]],
+        [paths.get(arg, arg) for arg in _commands["ld"]],
+    )
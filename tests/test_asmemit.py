@@ -0,0 +1,100 @@
+import io
+import os
+import tempfile
+import unittest
+
+from pyCC.pyCmp.ASMNode import (
+    FunctionASM,
+    IntASM,
+    LabelASM,
+    MoveASM,
+    ProgramASM,
+    PsuedoRegASM,
+    RegisterASM,
+    RegisterEnum,
+    SetCCASM,
+    CondFlags,
+)
+import pyCC.pyCmp.asmemit as asmemit
+import pyCC.pyCmp.asmgen as asmgen
+import pyCC.pyCmp.tackygen as tackygen
+import pyCC.pyCmp.parser as parser
+import pyCC.pyCmp.lexer as lexer
+from pyCC.pyCmp.pyCmp import py_compile
+
+
+def program_asm(expression):
+    test_prog = f"int main(void) {{ return {expression}; }}"
+    return asmgen.asmFromTacky(tackygen.tackify(parser.parse(lexer.lex(test_prog))))
+
+
+class CountingSink:
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, text):
+        self.chunks.append(text)
+
+
+class TestAsmEmit(unittest.TestCase):
+    def test_same_as_codegen(self):
+        for expression in (
+            "1",
+            "-(~(!3))",
+            "1 + 2 * 3 - 4 / 5 % 6 << 1 >> 2 & 3 | 4 ^ 5",
+            "(1 + 2) * (3 << (1 + 1)) / (7 % (2 + 1))",
+            "1 < 2 == 3 >= 4 != 5 <= 6 > 7",
+            "(0 || 1) && (2 && (0 || 3)) || !(4 && 5)",
+        ):
+            with self.subTest(expression=expression):
+                asm = program_asm(expression)
+                sink = io.StringIO()
+                asmemit.emitProgram(asm, sink)
+                self.assertEqual(sink.getvalue(), asm.codegen())
+
+    def test_chunks(self):
+        asm = program_asm(" + ".join(str(i) for i in range(300)))
+        sink = CountingSink()
+        old_chunk_lines = asmemit.CHUNK_LINES
+        asmemit.CHUNK_LINES = 100
+        try:
+            asmemit.emitProgram(asm, sink)
+        finally:
+            asmemit.CHUNK_LINES = old_chunk_lines
+        ## header, the instructions 100 lines at a time, footer
+        num_instructions = len(asm.function.instructions)
+        self.assertEqual(len(sink.chunks), 2 + -(-num_instructions // 100))
+        self.assertEqual("".join(sink.chunks), asm.codegen())
+
+    def test_fallbacks(self):
+        ## Register SetCC isn't templated, it's emitted as codegen() has it
+        asm = ProgramASM(FunctionASM("main", [
+            SetCCASM(CondFlags.E, RegisterASM(RegisterEnum.EAX)),
+            MoveASM(IntASM(1), RegisterASM(RegisterEnum.EAX)),
+            LabelASM(".Lobama"),
+        ]))
+        sink = io.StringIO()
+        asmemit.emitProgram(asm, sink)
+        self.assertEqual(sink.getvalue(), asm.codegen())
+
+        with self.assertRaises(Exception):
+            asmemit.emitProgram(
+                ProgramASM(FunctionASM("main", [MoveASM(PsuedoRegASM(0), IntASM(1))])),
+                io.StringIO(),
+            )
+        with self.assertRaises(ValueError):
+            asmemit.emitProgram(ProgramASM(FunctionASM("main", [IntASM(1)])), io.StringIO())
+
+    def test_py_compile_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            file_in = os.path.join(tmp, "prog.i")
+            file_out = os.path.join(tmp, "prog.s")
+            with open(file_in, "w") as f:
+                f.write("int main(void) { return (1 || 0) * 3 + ~2; }")
+            py_compile(file_in, file_out, 4)
+            with open(file_out) as f:
+                self.assertEqual(f.read(), program_asm("(1 || 0) * 3 + ~2").codegen())
+
+
+if __name__ == "__main__":
+    unittest.main()
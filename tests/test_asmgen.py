@@ -1,3 +1,4 @@
+import pickle
 import unittest
 
 from pyCC.pyCmp.ASMNode import (
@@ -7,7 +8,9 @@ from pyCC.pyCmp.ASMNode import (
     CmpASM,
     CondFlags,
     FunctionASM,
+    IDivASM,
     JumpCCASM,
+    LabelASM,
     PsuedoRegASM,
     IntASM,
     RegisterASM,
@@ -23,12 +26,14 @@ from pyCC.pyCmp.tackyNode import (
     BinaryTacky,
     FuncTacky,
     JumpIfZero,
+    JumpTacky,
     LabelTacky,
     ReturnTacky,
     UnaryOpTacky,
     UnaryTacky,
     VarTacky,
     ConstIntTacky,
+    SymbolTable,
 )
 import pyCC.pyCmp.asmgen as asmgen
 import pyCC.pyCmp.tackygen as tackygen
@@ -122,5 +127,120 @@ class AsmgenTest(unittest.TestCase):
         ]
         self.assertEqual(str(output), str(expected_output))
 
+    def test_temporary_slots(self):
+        ## Integer temporaries get slots in order of first appearance,
+        ## and every use of a slot shares one operand
+        test_input = FuncTacky("main", [
+            UnaryTacky(UnaryOpTacky.NEG, ConstIntTacky(1), VarTacky(3)),
+            UnaryTacky(UnaryOpTacky.NEG, VarTacky(3), VarTacky(0)),
+            ReturnTacky(VarTacky(0)),
+        ])
+        output = asmgen.asmFromTacky(test_input)
+        expected_output = FunctionASM("main", [
+            AllocateStack(8),
+            MoveASM(IntASM(1), StackASM(-4)),
+            UnaryASM(UnaryOpASM.NEG, StackASM(-4)),
+            MoveASM(StackASM(-4), RegisterASM(RegisterEnum.R10D)),
+            MoveASM(RegisterASM(RegisterEnum.R10D), StackASM(-8)),
+            UnaryASM(UnaryOpASM.NEG, StackASM(-8)),
+            MoveASM(StackASM(-8), RegisterASM(RegisterEnum.EAX)),
+            ReturnASM(),
+        ])
+        self.assertEqual(str(output), str(expected_output))
+        self.assertIs(output.instructions[1].dst, output.instructions[2].dst)
+
+    def test_label_ids(self):
+        ## Label ids are only spelled out when the assembly is emitted
+        output = asmgen.asmFromTacky(JumpTacky(LabelTacky(1)))
+        self.assertEqual(output[0].dest, 1)
+        self.assertEqual(output[0].codegen(), "jmp .Lor_end0")
+        label = asmgen.asmFromTacky(LabelTacky(6))[0]
+        self.assertEqual(label.codegen(), ".Land_false1:")
+        self.assertEqual(LabelASM(".Lobama").codegen(), ".Lobama:")
+
+    def test_slot_assignment(self):
+        instructions = [
+            MoveASM(IntASM(1), PsuedoRegASM(2)),
+            BinaryASM(BinaryOpASM.ADD, PsuedoRegASM("obama"), PsuedoRegASM(2)),
+            CmpASM(PsuedoRegASM(0), PsuedoRegASM("obama")),
+        ]
+        stack_bytes = asmgen.assignStackSlots(instructions, SymbolTable())
+        self.assertEqual(stack_bytes, 12)
+        self.assertEqual(
+            str(instructions),
+            str([
+                MoveASM(IntASM(1), StackASM(-4)),
+                BinaryASM(BinaryOpASM.ADD, StackASM(-8), StackASM(-4)),
+                CmpASM(StackASM(-12), StackASM(-8)),
+            ]),
+        )
+
+    def test_legalize(self):
+        r10 = RegisterASM(RegisterEnum.R10D)
+        r11 = RegisterASM(RegisterEnum.R11D)
+        cases = [
+            (MoveASM(IntASM(1), StackASM(-4)), [MoveASM(IntASM(1), StackASM(-4))]),
+            (
+                MoveASM(StackASM(-4), StackASM(-8)),
+                [MoveASM(StackASM(-4), r10), MoveASM(r10, StackASM(-8))],
+            ),
+            (
+                CmpASM(StackASM(-4), IntASM(3)),
+                [MoveASM(IntASM(3), r11), CmpASM(StackASM(-4), r11)],
+            ),
+            (IDivASM(IntASM(3)), [MoveASM(IntASM(3), r10), IDivASM(r10)]),
+            (
+                BinaryASM(BinaryOpASM.MUL, StackASM(-4), StackASM(-8)),
+                [
+                    MoveASM(StackASM(-8), r11),
+                    BinaryASM(BinaryOpASM.MUL, StackASM(-4), r11),
+                    MoveASM(r11, StackASM(-8)),
+                ],
+            ),
+            (
+                BinaryASM(BinaryOpASM.LSHIFT, IntASM(2), StackASM(-4)),
+                [
+                    MoveASM(IntASM(2), RegisterASM(RegisterEnum.ECX)),
+                    BinaryASM(BinaryOpASM.LSHIFT, RegisterASM(RegisterEnum.CL), StackASM(-4)),
+                ],
+            ),
+            (
+                BinaryASM(BinaryOpASM.ADD, IntASM(2), StackASM(-4)),
+                [BinaryASM(BinaryOpASM.ADD, IntASM(2), StackASM(-4))],
+            ),
+        ]
+        for instruction, expected in cases:
+            with self.subTest(instruction=repr(instruction)):
+                output = asmgen.legalizeOperands([instruction], [])
+                self.assertEqual(str(output), str(expected))
+
+    def test_canonical_operands(self):
+        self.assertIs(RegisterASM(RegisterEnum.R10D), RegisterASM(RegisterEnum.R10D))
+        self.assertIs(StackASM(-8), StackASM(-8))
+        self.assertIs(IntASM(1), IntASM(1))
+        self.assertIsNot(IntASM(100000), IntASM(100000))
+        self.assertIs(pickle.loads(pickle.dumps(StackASM(-4))), StackASM(-4))
+        with self.assertRaises(AttributeError):
+            StackASM(-4).index = -8
+        with self.assertRaises(TypeError):
+            RegisterASM("eax")
+
+    def test_shared_operands(self):
+        ## Every use of a register, slot or small constant is the same object
+        test_prog = "int main(void) { return 1 + 2 * (3 || 4) - ~5; }"
+        output = asmgen.asmFromTacky(
+            tackygen.tackify(parser.parse(lexer.lex(test_prog)))
+        ).function
+        operands = {}
+        for instruction in output.instructions:
+            for name in type(instruction).__match_args__:
+                operand = getattr(instruction, name)
+                if isinstance(operand, (RegisterASM, StackASM, IntASM)):
+                    operands.setdefault(repr(operand), set()).add(id(operand))
+        self.assertIn(repr(RegisterASM(RegisterEnum.R10D)), operands)
+        for name, ids in operands.items():
+            with self.subTest(operand=name):
+                self.assertEqual(len(ids), 1)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,247 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+
+from pyCC.pyCmp import cache
+from pyCC.pyCmp.cache import SHARES, CompileCache
+from pyCC.pyCmp.driver import LINK_MODE, compile_file
+from pyCC.pyCmp.pyCmp import FAST_MODE
+from tests.test_driver import PROGRAMS
+
+SOURCE = b"int main(void) { return 4; }\n"
+
+
+class TestCompileCache(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.cache = CompileCache(os.path.join(self.tmp, "cache"))
+
+    def artifact(self, name, data, executable=False):
+        path = os.path.join(self.tmp, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        if executable:
+            os.chmod(path, 0o755)
+        return path
+
+    def test_key(self):
+        key = self.cache.key(SOURCE, LINK_MODE)
+        self.assertEqual(key, self.cache.key(SOURCE, LINK_MODE))
+        self.assertNotEqual(key, self.cache.key(SOURCE, FAST_MODE))
+        self.assertNotEqual(key, self.cache.key(SOURCE, LINK_MODE, native=True))
+        self.assertNotEqual(key, self.cache.key(SOURCE + b" ", LINK_MODE))
+        ## Another directory, same compiler, same key
+        other = CompileCache(os.path.join(self.tmp, "other"))
+        self.assertEqual(key, other.key(SOURCE, LINK_MODE))
+
+    def test_store_fetch(self):
+        key = self.cache.key(SOURCE, LINK_MODE)
+        destination = os.path.join(self.tmp, "out")
+        self.assertFalse(self.cache.fetch(key, destination))
+        self.cache.store(key, self.artifact("binary", b"\x7fELF...", executable=True))
+        self.assertTrue(self.cache.fetch(key, destination))
+        with open(destination, "rb") as f:
+            self.assertEqual(f.read(), b"\x7fELF...")
+        self.assertTrue(os.access(destination, os.X_OK))
+        stats = self.cache.stats()
+        self.assertEqual(
+            {name: stats[name] for name in ("hits", "misses", "stores", "entries", "bytes")},
+            {"hits": 1, "misses": 1, "stores": 1, "entries": 1, "bytes": 7},
+        )
+
+    def test_lru_eviction(self):
+        ## Room for two 100 byte entries per bucket
+        cache = CompileCache(os.path.join(self.tmp, "small"), max_bytes=200 * SHARES)
+        artifact = self.artifact("data", b"x" * 100)
+        keys = [f"0{index:063x}" for index in range(3)]
+        for index, key in enumerate(keys[:2]):
+            cache.store(key, artifact)
+            os.utime(cache.entry(key), (index, index))
+        ## Using the oldest entry makes the other one the least recently used
+        self.assertTrue(cache.fetch(keys[0], os.path.join(self.tmp, "out")))
+        cache.store(keys[2], artifact)
+        self.assertTrue(os.path.exists(cache.entry(keys[0])))
+        self.assertFalse(os.path.exists(cache.entry(keys[1])))
+        self.assertTrue(os.path.exists(cache.entry(keys[2])))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_concurrent_stores(self):
+        ## Racing writers of one key always leave one whole entry behind
+        key = self.cache.key(SOURCE, 3)
+        artifacts = [self.artifact(f"a{index}", bytes([index]) * 4096) for index in range(8)]
+        threads = [
+            threading.Thread(target=self.cache.store, args=(key, path)) for path in artifacts
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with open(self.cache.entry(key), "rb") as f:
+            data = f.read()
+        self.assertEqual(len(data), 4096)
+        self.assertEqual(len(set(data)), 1)
+        self.assertEqual(os.listdir(os.path.dirname(self.cache.entry(key))), [key])
+        self.assertEqual(self.cache.stats()["stores"], 8)
+
+    def test_clear(self):
+        self.cache.store(self.cache.key(SOURCE, 3), self.artifact("a", b"asm"))
+        self.cache.clear()
+        self.assertEqual(self.cache.stats()["entries"], 0)
+        self.assertEqual(self.cache.stats()["stores"], 0)
+
+    @unittest.skipIf(shutil.which("gcc") is None, "needs gcc")
+    def test_keep_temps(self):
+        ## A warm cache still writes every temporary
+        file_name = os.path.join(self.tmp, "arith.c")
+        with open(file_name, "w") as f:
+            f.write(PROGRAMS["arith.c"][0])
+        for options, temps in (
+            ({}, (".i", ".s")),
+            ({"direct_link": True}, (".i", ".s", ".o")),
+            ({"native": True}, (".i", ".o")),
+        ):
+            with self.subTest(options=options):
+                self.assertTrue(compile_file(file_name, LINK_MODE, self.cache, **options).ok)
+                result = compile_file(file_name, LINK_MODE, self.cache, keep_temps=True, **options)
+                self.assertTrue(result.ok, result.error)
+                for suffix in temps:
+                    self.assertTrue(os.path.exists(file_name[:-2] + suffix), suffix)
+                    os.remove(file_name[:-2] + suffix)
+                self.assertEqual(subprocess.run([file_name[:-2]]).returncode, 9)
+
+    @unittest.skipIf(shutil.which("gcc") is None, "needs gcc")
+    def test_compile_file(self):
+        for name, (source, code) in PROGRAMS.items():
+            file_name = os.path.join(self.tmp, name)
+            with open(file_name, "w") as f:
+                f.write(source)
+            for mode in (LINK_MODE, FAST_MODE, 3):
+                with self.subTest(name=name, mode=mode):
+                    output = file_name[:-2] if mode >= LINK_MODE else file_name[:-2] + ".s"
+                    self.assertTrue(compile_file(file_name, mode, self.cache).ok)
+                    with open(output, "rb") as f:
+                        compiled = f.read()
+                    os.remove(output)
+                    self.assertTrue(compile_file(file_name, mode, self.cache).ok)
+                    with open(output, "rb") as f:
+                        self.assertEqual(f.read(), compiled)
+                    if mode >= LINK_MODE:
+                        self.assertEqual(subprocess.run([output]).returncode, code)
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (9, 9))
+
+        ## A change that disappears in preprocessing still hits
+        file_name = os.path.join(self.tmp, "zero.c")
+        with open(file_name, "w") as f:
+            f.write("/* comment */\n" + PROGRAMS["zero.c"][0])
+        self.assertTrue(compile_file(file_name, LINK_MODE, self.cache).ok)
+        self.assertEqual(self.cache.stats()["hits"], 10)
+
+
+class TestPreprocessCache(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.cache = CompileCache(os.path.join(self.tmp, "cache"))
+        self.write("value.h", "#define VALUE 3\n")
+        self.write("other dir.h", "#define OTHER 4\n")
+        self.write("prog.c", '#include "value.h"\n#include "other dir.h"\n')
+        self.source = self.path("prog.c")
+
+    def path(self, name):
+        return os.path.join(self.tmp, name)
+
+    def write(self, name, text):
+        with open(self.path(name), "a") as f:
+            f.write(text)
+
+    def test_parse_depfile(self):
+        text = "out: a.c /usr/include/x.h \\\n  dir/b\\ c.h d$$.h\nx.h:\n"
+        self.assertEqual(
+            cache.parse_depfile(text), ["a.c", "/usr/include/x.h", "dir/b c.h", "d$.h"]
+        )
+        self.assertEqual(cache.parse_depfile(""), [])
+
+    @unittest.skipIf(shutil.which("gcc") is None, "needs gcc")
+    def test_compile_file(self):
+        self.write("prog.c", "int main(void) { return VALUE + OTHER; }\n")
+        binary = self.path("prog")
+
+        def build(expected_code, preprocess_hits):
+            self.assertTrue(compile_file(self.source, LINK_MODE, self.cache).ok)
+            self.assertEqual(subprocess.run([binary]).returncode, expected_code)
+            self.assertEqual(self.cache.stats()["preprocess_hits"], preprocess_hits)
+            with open(self.path("prog.d")) as f:
+                ## gcc -E also lists the system header it always includes
+                dependencies = [
+                    path
+                    for path in cache.parse_depfile(f.read())
+                    if not path.startswith("/usr/include/")
+                ]
+            self.assertEqual(
+                dependencies, [self.source, self.path("value.h"), self.path("other dir.h")]
+            )
+
+        build(7, 0)
+        build(7, 1)
+        ## Same content, new mtime: the hash still matches
+        os.utime(self.path("value.h"), (0, 0))
+        build(7, 2)
+        self.write("value.h", "#undef VALUE\n#define VALUE 10\n")
+        build(14, 2)
+        build(14, 3)
+        self.assertEqual(self.cache.stats()["preprocess_misses"], 2)
+
+        os.remove(self.path("other dir.h"))
+        self.assertFalse(compile_file(self.source, LINK_MODE, self.cache).ok)
+        self.assertEqual(self.cache.stats()["preprocess_misses"], 3)
+
+    @unittest.skipIf(shutil.which("gcc") is None, "needs gcc")
+    def test_changed_while_preprocessing(self):
+        ## A dependency newer than the start of gcc -E isn't trusted
+        self.write("prog.c", "int main(void) { return VALUE; }\n")
+        depfile = self.path("prog.d")
+        source = subprocess.run(
+            ["gcc", "-E", "-P", self.source, "-MD", "-MF", depfile],
+            capture_output=True,
+            check=True,
+        ).stdout
+        self.cache.store_preprocessed(self.source, "prog", source, depfile, 0)
+        self.assertIsNone(self.cache.fetch_preprocessed(self.source, "prog", depfile))
+        self.cache.store_preprocessed(self.source, "prog", source, depfile, time.time_ns() + 1)
+        self.assertEqual(self.cache.fetch_preprocessed(self.source, "prog", depfile), source)
+        ## The make rule is per target
+        self.assertIsNone(self.cache.fetch_preprocessed(self.source, "prog.s", depfile))
+
+    def test_eviction(self):
+        ## Preprocessed sources are kept under their share of the limit too,
+        ## and counted in the cache's size
+        depfile = self.path("prog.d")
+        with open(depfile, "w") as f:
+            f.write(f"prog: {self.source}\n")
+        started_ns = time.time_ns() + 1
+        self.cache.store_preprocessed(self.source, "prog", b"x" * 300, depfile, started_ns)
+        size = os.path.getsize(self.cache.preprocessed_entry(self.source, "prog"))
+        ## Room for three entries
+        small = CompileCache(self.path("small"), max_bytes=3 * size * SHARES)
+        targets = [f"prog{index}" for index in range(5)]
+        for index, target in enumerate(targets[:3]):
+            small.store_preprocessed(self.source, target, b"x" * 300, depfile, started_ns)
+            os.utime(small.preprocessed_entry(self.source, target), (index, index))
+        ## Using the oldest one makes the next two the first to go
+        self.assertIsNotNone(small.fetch_preprocessed(self.source, targets[0], depfile))
+        for target in targets[3:]:
+            small.store_preprocessed(self.source, target, b"x" * 300, depfile, started_ns)
+
+        kept = [os.path.exists(small.preprocessed_entry(self.source, t)) for t in targets]
+        self.assertEqual(kept, [True, False, False, True, True])
+        stats = small.stats()
+        self.assertEqual((stats["entries"], stats["bytes"]), (3, 3 * size))
+        self.assertGreater(stats["evictions"], 0)
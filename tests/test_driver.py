@@ -0,0 +1,108 @@
+import itertools
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from pyCC.pyCmp.driver import LINK_MODE, compile_batch, compile_file, read_manifest
+from pyCC.pyCmp.pyCmp import FAST_MODE
+
+PROGRAMS = {
+    "zero.c": ("int main(void) { return 0; }", 0),
+    "arith.c": ("int main(void) { return (6 + 1) * 3 % 5 - -8; }", 9),
+    "logic.c": ("int main(void) { return (1 && 2) + (0 || 3 > 2) + !5; }", 2),
+}
+BAD_PROGRAMS = {
+    "parse.c": "int main(void) { return 1 +; }",
+    "lex.c": "int main(void) { return $; }",
+    ## Fails once plenty of assembly has been piped into gcc
+    "late.c": "int main(void) { return " + "1 + " * 5000 + "; }",
+}
+
+
+@unittest.skipIf(shutil.which("gcc") is None, "needs gcc")
+class TestDriver(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        for name, source in list(BAD_PROGRAMS.items()) + [
+            (name, source) for name, (source, _) in PROGRAMS.items()
+        ]:
+            with open(self.path(name), "w") as f:
+                f.write(source)
+
+    def path(self, name):
+        return os.path.join(self.tmp, name)
+
+    def test_compile_file(self):
+        for mode in (LINK_MODE, FAST_MODE):
+            for name, (_, code) in PROGRAMS.items():
+                with self.subTest(mode=mode, name=name):
+                    result = compile_file(self.path(name), mode)
+                    self.assertTrue(result.ok, result.error)
+                    binary = self.path(name[:-2])
+                    self.assertEqual(subprocess.run([binary]).returncode, code)
+                    ## Only the binary is left behind
+                    self.assertFalse(os.path.exists(binary + ".i"))
+                    self.assertFalse(os.path.exists(binary + ".s"))
+
+    def test_codegen_keeps_assembly(self):
+        result = compile_file(self.path("zero.c"), 3)
+        self.assertTrue(result.ok, result.error)
+        self.assertTrue(os.path.exists(self.path("zero.s")))
+        self.assertFalse(os.path.exists(self.path("zero.i")))
+        self.assertFalse(os.path.exists(self.path("zero")))
+
+    def test_keep_temps(self):
+        for mode in (LINK_MODE, FAST_MODE):
+            with self.subTest(mode=mode):
+                result = compile_file(self.path("arith.c"), mode, keep_temps=True)
+                self.assertTrue(result.ok, result.error)
+                self.assertEqual(subprocess.run([self.path("arith")]).returncode, 9)
+                with open(self.path("arith.i")) as f:
+                    self.assertEqual(f.read().strip(), PROGRAMS["arith.c"][0])
+                with open(self.path("arith.s")) as f:
+                    self.assertIn("main:", f.read())
+
+    def test_failures(self):
+        for name, mode in itertools.product(BAD_PROGRAMS, (LINK_MODE, FAST_MODE)):
+            with self.subTest(name=name, mode=mode):
+                result = compile_file(self.path(name), mode)
+                self.assertFalse(result.ok)
+                self.assertTrue(result.error)
+                self.assertEqual(
+                    sorted(os.listdir(self.tmp)), sorted(list(PROGRAMS) + list(BAD_PROGRAMS))
+                )
+
+        self.assertIn("Invalid File Type", compile_file(self.path("zero.s")).error)
+        self.assertIn("Unable to PreProcess", compile_file(self.path("missing.c")).error)
+
+    def test_batch(self):
+        names = [self.path(name) for name in list(PROGRAMS) + list(BAD_PROGRAMS)]
+        seen = []
+        results = compile_batch(names, workers=2, on_result=seen.append)
+        self.assertEqual([result.file_name for result in results], names)
+        self.assertEqual([result.file_name for result in seen], names)
+        self.assertEqual(
+            [result.ok for result in results],
+            [True] * len(PROGRAMS) + [False] * len(BAD_PROGRAMS),
+        )
+        for name, (_, code) in PROGRAMS.items():
+            self.assertEqual(subprocess.run([self.path(name[:-2])]).returncode, code)
+
+    def test_stage_bug(self):
+        ## An exception no stage should raise is still just that file's failure
+        names = [self.path(name) for name in PROGRAMS]
+        with mock.patch("pyCC.pyCmp.driver.compile_to", side_effect=KeyError("ghost")):
+            self.assertEqual(compile_file(names[0]).error, "KeyError: 'ghost'")
+            results = compile_batch(names, workers=2)
+        self.assertEqual([result.error for result in results], ["KeyError: 'ghost'"] * len(names))
+
+    def test_manifest(self):
+        manifest = self.path("files.txt")
+        with open(manifest, "w") as f:
+            f.write("# programs\n\n  a.c \nb/c.c\n")
+        self.assertEqual(read_manifest(manifest), ["a.c", "b/c.c"])
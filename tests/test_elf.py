@@ -0,0 +1,110 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from pyCC.pyCmp import elf
+from pyCC.pyCmp.driver import compile_file
+from pyCC.pyCmp.pyCmp import FAST_MODE
+from tests.test_driver import BAD_PROGRAMS, PROGRAMS
+
+CODE = b"\x55\x48\x89\xe5\xb8\x02\x00\x00\x00\x48\x89\xec\x5d\xc3"
+
+
+class TestElf(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def path(self, name):
+        return os.path.join(self.tmp, name)
+
+    def sections(self, data):
+        ## name -> (type, offset, size, link, info) of every section
+        header = elf.ELF_HEADER.unpack_from(data)
+        section_offset, count, names_index = header[6], header[12], header[13]
+        headers = [
+            elf.SECTION_HEADER.unpack_from(data, section_offset + index * elf.SECTION_HEADER.size)
+            for index in range(count)
+        ]
+        names = headers[names_index]
+        sections = {}
+        for name, kind, _, _, offset, size, link, info, _, _ in headers[1:]:
+            start = names[4] + name
+            text = data[start : data.index(b"\0", start)].decode()
+            sections[text] = (kind, offset, size, link, info)
+        return sections
+
+    def test_layout(self):
+        data = elf.objectBytes(CODE, [("main", 0, len(CODE))])
+        self.assertEqual(data[:4], b"\x7fELF")
+        sections = self.sections(data)
+        self.assertEqual(list(sections), list(elf.SECTION_NAMES))
+        _, offset, size, _, _ = sections[".text"]
+        self.assertEqual(data[offset : offset + size], CODE)
+        self.assertEqual(sections[".note.GNU-stack"][2], 0)
+
+        ## main is the only global, after the null and section symbols
+        _, offset, size, link, info = sections[".symtab"]
+        self.assertEqual((size // elf.SYMBOL.size, link, info), (3, elf.STRTAB, 2))
+        name, symbol_info, _, section, value, symbol_size = elf.SYMBOL.unpack_from(
+            data, offset + 2 * elf.SYMBOL.size
+        )
+        strtab_offset = sections[".strtab"][1]
+        self.assertEqual(data[strtab_offset + name : strtab_offset + name + 5], b"main\0")
+        self.assertEqual(symbol_info, elf.STB_GLOBAL << 4 | elf.STT_FUNC)
+        self.assertEqual((section, value, symbol_size), (elf.TEXT, 0, len(CODE)))
+
+    @unittest.skipIf(shutil.which("gcc") is None, "needs gcc")
+    def test_links(self):
+        object_file = self.path("two.o")
+        with open(object_file, "wb") as f:
+            f.write(elf.objectBytes(CODE, [("main", 0, len(CODE))]))
+        subprocess.run(["gcc", object_file, "-o", self.path("two")], check=True)
+        self.assertEqual(subprocess.run([self.path("two")]).returncode, 2)
+
+    @unittest.skipIf(shutil.which("gcc") is None, "needs gcc")
+    def test_native_compile_file(self):
+        for name, (source, code) in PROGRAMS.items():
+            with self.subTest(name=name):
+                with open(self.path(name), "w") as f:
+                    f.write(source)
+                result = compile_file(self.path(name), native=True)
+                self.assertTrue(result.ok, result.error)
+                self.assertEqual(subprocess.run([self.path(name[:-2])]).returncode, code)
+                self.assertFalse(os.path.exists(self.path(name[:-2] + ".o")))
+
+        result = compile_file(self.path("zero.c"), keep_temps=True, native=True)
+        self.assertTrue(result.ok, result.error)
+        self.assertTrue(os.path.exists(self.path("zero.o")))
+        self.assertFalse(os.path.exists(self.path("zero.s")))
+
+        for name, source in BAD_PROGRAMS.items():
+            with self.subTest(name=name):
+                with open(self.path(name), "w") as f:
+                    f.write(source)
+                self.assertFalse(compile_file(self.path(name), native=True).ok)
+                self.assertFalse(os.path.exists(self.path(name[:-2] + ".o")))
+
+        result = compile_file(self.path("zero.c"), FAST_MODE, native=True)
+        self.assertIn("link mode", result.error)
+
+    @unittest.skipIf(shutil.which("gcc") is None, "needs gcc")
+    def test_existing_object(self):
+        ## An object of the user's next to the source isn't overwritten, and
+        ## the temporary one isn't left behind
+        with open(self.path("zero.c"), "w") as f:
+            f.write(PROGRAMS["zero.c"][0])
+        with open(self.path("zero.o"), "wb") as f:
+            f.write(b"mine")
+        temporary = self.path("tmp")
+        os.mkdir(temporary)
+        with mock.patch("tempfile.tempdir", temporary):
+            result = compile_file(self.path("zero.c"), native=True)
+        self.assertTrue(result.ok, result.error)
+        with open(self.path("zero.o"), "rb") as f:
+            self.assertEqual(f.read(), b"mine")
+        self.assertEqual(os.listdir(temporary), [])
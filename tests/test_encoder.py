@@ -0,0 +1,200 @@
+import io
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from benchmarks.bench_batch import program
+from pyCC.pyCmp import elf, encoder
+from pyCC.pyCmp.ASMNode import (
+    AllocateStack,
+    BinaryASM,
+    BinaryOpASM,
+    CdqASM,
+    CmpASM,
+    CondFlags,
+    FunctionASM,
+    IDivASM,
+    IntASM,
+    JumpASM,
+    JumpCCASM,
+    LabelASM,
+    MoveASM,
+    ProgramASM,
+    RegisterASM,
+    RegisterEnum,
+    ReturnASM,
+    SetCCASM,
+    StackASM,
+    UnaryASM,
+    UnaryOpASM,
+)
+from pyCC.pyCmp.asmemit import emitProgram
+from pyCC.pyCmp.pyCmp import Stage, compile_source
+from tests.test_driver import PROGRAMS
+
+REGISTERS = [
+    RegisterASM(reg)
+    for reg in (
+        RegisterEnum.EAX,
+        RegisterEnum.ECX,
+        RegisterEnum.EDX,
+        RegisterEnum.R10D,
+        RegisterEnum.R11D,
+    )
+]
+CL = RegisterASM(RegisterEnum.CL)
+## disp8 and disp32 slots, either side of the boundary
+STACK = [StackASM(index) for index in (-4, -128, -132, -4000)]
+## imm8 and imm32, either side of each boundary, and what as truncates
+IMMEDIATES = [
+    IntASM(value) for value in (0, 1, 2, 127, 128, -128, -129, 2**31 - 1, -(2**31), 2**32 - 1)
+]
+ALU = (BinaryOpASM.ADD, BinaryOpASM.SUB, BinaryOpASM.BAND, BinaryOpASM.BOR, BinaryOpASM.BXOR)
+SHIFTS = (BinaryOpASM.LSHIFT, BinaryOpASM.RSHIFT)
+
+
+def every_form():
+    ## Every instruction with every operand kind asmgen can leave it
+    instructions = []
+    for src in IMMEDIATES + REGISTERS + STACK:
+        for dst in REGISTERS + STACK:
+            if type(src) is StackASM and type(dst) is StackASM:
+                continue
+            instructions.append(MoveASM(src, dst))
+            instructions.append(CmpASM(src, dst))
+            instructions.extend(BinaryASM(op, src, dst) for op in ALU)
+        for dst in REGISTERS:
+            instructions.append(BinaryASM(BinaryOpASM.MUL, src, dst))
+    for dst in REGISTERS + STACK:
+        for count in (CL, IntASM(1), IntASM(2), IntASM(31)):
+            instructions.extend(BinaryASM(op, count, dst) for op in SHIFTS)
+        instructions.extend(UnaryASM(op, dst) for op in UnaryOpASM)
+        instructions.append(IDivASM(dst))
+    for slot in STACK:
+        instructions.extend(SetCCASM(cond, slot) for cond in CondFlags)
+    instructions.extend(AllocateStack(size) for size in (0, 4, 124, 128, 4096))
+    instructions.append(CdqASM())
+    instructions.append(ReturnASM())
+    return instructions
+
+
+def jump(cond, label):
+    return JumpASM(label) if cond is None else JumpCCASM(cond, label)
+
+
+def boundary_jumps():
+    ## Forward and backward jumps of every kind, with cdq (1 byte) filler
+    ## around the distances where short stops reaching
+    instructions = []
+    label = 0
+    for cond in [None] + list(CondFlags):
+        for filler in (0, 125, 126, 127, 128, 129, 300):
+            label += 1
+            instructions.append(jump(cond, label))
+            instructions.extend(CdqASM() for _ in range(filler))
+            instructions.append(LabelASM(label))
+            label += 1
+            instructions.append(LabelASM(label))
+            instructions.extend(CdqASM() for _ in range(filler))
+            instructions.append(jump(cond, label))
+    return instructions
+
+
+def random_jumps(rng):
+    ## Jumps crossing each other, so one growing can push others out of reach
+    labels = list(range(rng.randrange(2, 12)))
+    instructions = [LabelASM(label) for label in labels]
+    for _ in range(rng.randrange(5, 40)):
+        cond = rng.choice([None] + list(CondFlags))
+        instructions.append(jump(cond, rng.choice(labels)))
+        instructions.extend(CdqASM() for _ in range(rng.choice((0, 1, 20, 60, 120))))
+    rng.shuffle(instructions)
+    return instructions
+
+
+class TestEncoder(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def disassemble(self, object_file):
+        result = subprocess.run(
+            ["objdump", "-d", object_file], capture_output=True, text=True, check=True
+        )
+        ## From the section heading on, the file name comes before it
+        lines = result.stdout.splitlines()
+        return lines[lines.index("Disassembly of section .text:") :]
+
+    def assert_same_as_as(self, function, text=None):
+        ## objdump of what `as` makes of the assembly text against objdump of
+        ## the encoder's object
+        if text is None:
+            sink = io.StringIO()
+            emitProgram(ProgramASM(function), sink)
+            text = sink.getvalue()
+        source, reference = os.path.join(self.tmp, "ref.s"), os.path.join(self.tmp, "ref.o")
+        with open(source, "w") as f:
+            f.write(text)
+        subprocess.run(["as", "-o", reference, source], capture_output=True, check=True)
+        native = os.path.join(self.tmp, "native.o")
+        with open(native, "wb") as f:
+            f.write(elf.objectBytes(*encoder.encodeProgram(ProgramASM(function))))
+        self.assertEqual(self.disassemble(native), self.disassemble(reference))
+
+    @unittest.skipIf(shutil.which("objdump") is None, "needs binutils")
+    def test_every_form(self):
+        self.assert_same_as_as(FunctionASM("main", every_form()))
+
+    @unittest.skipIf(shutil.which("objdump") is None, "needs binutils")
+    def test_setcc_registers(self):
+        ## The text backend never sets a register, so its text isn't used
+        names = {
+            RegisterEnum.EAX: "%al",
+            RegisterEnum.ECX: "%cl",
+            RegisterEnum.EDX: "%dl",
+            RegisterEnum.R10D: "%r10b",
+            RegisterEnum.R11D: "%r11b",
+        }
+        instructions = []
+        lines = ["\t.globl main\nmain:\npushq %rbp\nmovq %rsp, %rbp\n"]
+        for cond in CondFlags:
+            for register in REGISTERS:
+                instructions.append(SetCCASM(cond, register))
+                lines.append(f"\tset{cond.codegen()} {names[register.val]}\n")
+        self.assert_same_as_as(FunctionASM("main", instructions), "".join(lines))
+
+    @unittest.skipIf(shutil.which("objdump") is None, "needs binutils")
+    def test_jumps(self):
+        self.assert_same_as_as(FunctionASM("main", boundary_jumps()))
+        rng = random.Random(25)
+        for _ in range(20):
+            instructions = random_jumps(rng)
+            with self.subTest(instructions=instructions):
+                self.assert_same_as_as(FunctionASM("main", instructions))
+
+    @unittest.skipIf(shutil.which("objdump") is None, "needs binutils")
+    def test_programs(self):
+        sources = [source for source, _ in PROGRAMS.values()] + [program(i) for i in range(20)]
+        sources.append("int main(void) { return 1 && 0 || 4 << 2 >> 1 != 8 / -3 % 2; }")
+        for source in sources:
+            with self.subTest(source=source):
+                self.assert_same_as_as(compile_source(source, Stage.ASM).asm.function)
+
+    def test_unencodable(self):
+        for instructions in (
+            [MoveASM(STACK[0], STACK[1])],
+            [BinaryASM(BinaryOpASM.ADD, STACK[0], STACK[1])],
+            [BinaryASM(BinaryOpASM.MUL, REGISTERS[0], STACK[0])],
+            [BinaryASM(BinaryOpASM.LSHIFT, REGISTERS[0], STACK[0])],
+            [CmpASM(REGISTERS[0], IMMEDIATES[0])],
+            [IDivASM(IMMEDIATES[0])],
+            [JumpASM("missing")],
+            [LabelASM(1), LabelASM(1)],
+        ):
+            with self.subTest(instructions=instructions):
+                with self.assertRaises(ValueError):
+                    encoder.encodeFunction(FunctionASM("main", instructions))
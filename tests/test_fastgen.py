@@ -0,0 +1,130 @@
+import io
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+import pyCC.pyCmp.asmgen as asmgen
+import pyCC.pyCmp.fastgen as fastgen
+import pyCC.pyCmp.tackygen as tackygen
+import pyCC.pyCmp.parser as parser
+import pyCC.pyCmp.lexer as lexer
+from pyCC.pyCmp.pyCmp import FAST_MODE, py_compile
+
+EXPRESSIONS = [
+    "0",
+    "42",
+    "-(~(!3))",
+    "!0 + !7",
+    "1 + 2 * 3 - 4 / 5 % 6 << 1 >> 2 & 3 | 4 ^ 5",
+    "(1 + 2) * (3 << (1 + 1)) / (7 % (2 + 1))",
+    "-17 / 5 + -17 % 5 * 10",
+    "1 < 2 == 3 >= 4 != 5 <= 6 > 7",
+    "(0 || 1) && (2 && (0 || 3)) || !(4 && 5)",
+    "(1 - 1 && 1 / 0) + (1 || 1 / 0)",
+    "((((((((((7))))))))))",
+    "- - -1 + ~~~~2 - -(-3)",
+]
+
+
+def random_expression(rng, depth=0):
+    if depth > 4 or rng.random() < 0.3:
+        return str(rng.randrange(0, 20))
+    if rng.random() < 0.2:
+        return rng.choice("-~!") + random_expression(rng, depth + 1)
+    op = rng.choice(["+", "-", "*", "<<", ">>", "&", "|", "^", "<", "<=", ">", ">=", "==", "!=", "&&", "||"])
+    left = random_expression(rng, depth + 1)
+    right = random_expression(rng, depth + 1)
+    if op in ("<<", ">>"):
+        right = str(rng.randrange(0, 8))
+    return f"({left} {op} {right})"
+
+
+def fast_asm(source):
+    sink = io.StringIO()
+    fastgen.fastcompile(lexer.lex_stream(source), sink)
+    return sink.getvalue()
+
+
+def full_asm(source):
+    return asmgen.asmgenerate(tackygen.tackify(parser.parse(lexer.lex_stream(source))))
+
+
+class TestFastgen(unittest.TestCase):
+    @unittest.skipIf(shutil.which("gcc") is None, "needs gcc")
+    def test_same_exit_codes(self):
+        rng = random.Random(14)
+        expressions = EXPRESSIONS + [random_expression(rng) for _ in range(8)]
+        with tempfile.TemporaryDirectory() as tmp:
+            for index, expression in enumerate(expressions):
+                source = f"int main(void) {{ return {expression}; }}"
+                with self.subTest(expression=expression):
+                    codes = []
+                    for name, asm in (("fast", fast_asm(source)), ("full", full_asm(source))):
+                        path = os.path.join(tmp, f"{name}{index}")
+                        with open(path + ".s", "w") as f:
+                            f.write(asm)
+                        subprocess.run(["gcc", path + ".s", "-o", path], check=True)
+                        codes.append(subprocess.run([path]).returncode)
+                    self.assertEqual(codes[0], codes[1])
+
+    def test_same_errors(self):
+        for source in (
+            "",
+            "void main(void) { return 1; }",
+            "int 1(void) { return 1; }",
+            "int main() { return 1; }",
+            "int main(void) { return 1 }",
+            "int main(void) { return 1; ",
+            "int main(void) { return 1; } 2",
+            "int main(void) { return (1 + 2; }",
+            "int main(void) { return 1 + ; }",
+            "int main(void) { return 1); }",
+        ):
+            with self.subTest(source=source):
+                with self.assertRaises(ValueError) as expected:
+                    parser.parse(lexer.lex_stream(source))
+                with self.assertRaises(ValueError) as fast:
+                    fast_asm(source)
+                self.assertEqual(str(fast.exception), str(expected.exception))
+
+    def test_no_return(self):
+        ## Parser gives up quietly, the full pipeline then fails in tackygen
+        source = "int main(void) { 1; }"
+        self.assertIsNone(parser.parse(lexer.lex_stream(source)))
+        with self.assertRaises(ValueError):
+            fast_asm(source)
+
+    def test_token_iterator(self):
+        source = "int main(void) { return (1 || 0) * 3 + ~2; }"
+        sink = io.StringIO()
+        fastgen.fastcompile(lexer.lex_iter(source), sink)
+        self.assertEqual(sink.getvalue(), fast_asm(source))
+
+    def test_deep_nesting(self):
+        depth = 10_000
+        asm = fast_asm("int main(void) { return " + "(" * depth + "1" + ")" * depth + "; }")
+        self.assertIn("movl $1, %eax", asm)
+
+    def test_py_compile(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            file_in = os.path.join(tmp, "prog.i")
+            file_out = os.path.join(tmp, "prog.s")
+            with open(file_in, "w") as f:
+                f.write("int main(void) { return 1 + 2; }")
+            py_compile(file_in, file_out, FAST_MODE)
+            with open(file_out) as f:
+                self.assertEqual(f.read(), fast_asm("int main(void) { return 1 + 2; }"))
+
+            ## No half written assembly is left behind on an error
+            with open(file_in, "w") as f:
+                f.write("int main(void) { return 1 + ; }")
+            with self.assertRaises(ValueError):
+                py_compile(file_in, file_out, FAST_MODE)
+            self.assertFalse(os.path.exists(file_out))
+
+
+if __name__ == "__main__":
+    unittest.main()
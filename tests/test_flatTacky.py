@@ -0,0 +1,75 @@
+import unittest
+
+from pyCC.pyCmp.tackyNode import (
+    BinaryOpTacky,
+    BinaryTacky,
+    ConstIntTacky,
+    FuncTacky,
+    ReturnTacky,
+    UnaryOpTacky,
+    UnaryTacky,
+    VarTacky,
+    label_text,
+)
+import pyCC.pyCmp.flatTacky as flatTacky
+import pyCC.pyCmp.tackygen as tackygen
+import pyCC.pyCmp.parser as parser
+import pyCC.pyCmp.lexer as lexer
+
+
+def tacky_func(expression):
+    test_prog = f"int main(void) {{ return {expression}; }}"
+    return tackygen.tackify(parser.parse(lexer.lex(test_prog))).func
+
+
+class TestFlatTacky(unittest.TestCase):
+    def test_encoding(self):
+        func = FuncTacky(
+            "main",
+            [
+                UnaryTacky(UnaryOpTacky.NEG, ConstIntTacky(7), VarTacky("a")),
+                BinaryTacky(BinaryOpTacky.ADD, VarTacky("a"), ConstIntTacky(7), VarTacky("b")),
+                ReturnTacky(VarTacky("b")),
+            ],
+        )
+        flat = flatTacky.flatten(func)
+        self.assertEqual(len(flat), 3)
+        self.assertEqual(flat.names, ["a", "b"])
+        self.assertEqual(flat.consts, [7])
+        self.assertEqual(flat.opcodes[0], flatTacky.UNARY_OPCODE[UnaryOpTacky.NEG])
+        self.assertEqual(flat.opcodes[1], flatTacky.BINARY_OPCODE[BinaryOpTacky.ADD])
+        self.assertEqual(flat.opcodes[2], flatTacky.OP_RETURN)
+        ## Constant 0 and variable 0 only differ in the tag bit
+        self.assertTrue(flatTacky.is_const(flat.src1[0]))
+        self.assertFalse(flatTacky.is_const(flat.dst[0]))
+        self.assertEqual(flat.src1[0] >> 1, flat.dst[0] >> 1)
+        self.assertEqual(list(flat.src1), [flat.const(7), flat.var("a"), flat.var("b")])
+        self.assertEqual(flat.src2[0], flatTacky.NO_OPERAND)
+
+    def test_round_trip(self):
+        for expression in (
+            "1",
+            "-(~(!3))",
+            "1 + 2 * 3 - 4 / 5 % 6 << 1 >> 2 & 3 | 4 ^ 5",
+            "1 < 2 == 3 >= 4 != 5 <= 6 > 7",
+            "(0 || 1) && (2 && (0 || 3))",
+        ):
+            with self.subTest(expression=expression):
+                func = tacky_func(expression)
+                flat = flatTacky.flatten(func)
+                self.assertEqual(len(flat), len(func.instructions))
+                self.assertEqual(str(flat.to_func()), str(func))
+
+    def test_labels(self):
+        flat = flatTacky.flatten(tacky_func("1 && 2"))
+        self.assertEqual([label_text(label) for label in flat.labels], ["and_false0", "and_end0"])
+        label_at = list(flat.opcodes).index(flatTacky.OP_LABEL)
+        self.assertEqual(label_text(flat.labels[flat.dst[label_at]]), "and_false0")
+
+    def test_invalid_instruction(self):
+        with self.assertRaises(TypeError):
+            flatTacky.flatten(FuncTacky("main", [ConstIntTacky(1)]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,7 @@
+import io
+import mmap
+import random
+import tempfile
 import unittest
 import pyCC.pyCmp.lexer as lexer
 
@@ -7,6 +11,16 @@ class TestLexer(unittest.TestCase):
         ## Make sure that I didn't forget anything
         self.assertEqual(len(set(lexer.TokenType)), len(set(lexer.TokenToRegex)))
 
+    def test_group_table(self):
+        ## GROUP_TO_TOKEN is worked out without compiling MASTER_REGEX,
+        ## it has to agree with the groups the compiled pattern has
+        groups = lexer.MASTER_REGEX.groupindex
+        self.assertEqual(
+            lexer.GROUP_TO_TOKEN,
+            {index: lexer.TokenType[name] for name, index in groups.items()},
+        )
+        self.assertEqual(lexer.BYTES_MASTER_REGEX.groups, len(groups))
+
     def test_int_lexing(self):
         result = lexer.lex("int")
         self.assertEqual(result, [(lexer.TokenType.INT, "int")])
@@ -83,6 +97,194 @@ class TestLexer(unittest.TestCase):
 
         self.assertEqual(result, expected)
 
+    def test_keyword_prefixed_identifiers(self):
+        result = lexer.lex("integer voidp return_ int")
+        expected = [
+            (lexer.TokenType.IDENTIFIER, "integer"),
+            (lexer.TokenType.IDENTIFIER, "voidp"),
+            (lexer.TokenType.IDENTIFIER, "return_"),
+            (lexer.TokenType.INT, "int"),
+        ]
+        self.assertEqual(result, expected)
+
+    def test_no_whitespace(self):
+        result = lexer.lex("int main(void){return(1+~2);}")
+        expected = [
+            (lexer.TokenType.INT, "int"),
+            (lexer.TokenType.IDENTIFIER, "main"),
+            (lexer.TokenType.POPEN, "("),
+            (lexer.TokenType.VOID, "void"),
+            (lexer.TokenType.PCLOSE, ")"),
+            (lexer.TokenType.BOPEN, "{"),
+            (lexer.TokenType.RETURN, "return"),
+            (lexer.TokenType.POPEN, "("),
+            (lexer.TokenType.CONSTINT, "1"),
+            (lexer.TokenType.PLUS, "+"),
+            (lexer.TokenType.BITFLIP, "~"),
+            (lexer.TokenType.CONSTINT, "2"),
+            (lexer.TokenType.PCLOSE, ")"),
+            (lexer.TokenType.SEMICOLON, ";"),
+            (lexer.TokenType.BCLOSE, "}"),
+        ]
+        self.assertEqual(result, expected)
+
+    def test_invalid_lex(self):
+        with self.assertRaises(ValueError):
+            lexer.lex("int 1abc")
+        with self.assertRaises(ValueError):
+            lexer.lex("return @")
+
+    def test_empty_lex(self):
+        self.assertEqual(lexer.lex(""), [])
+        self.assertEqual(lexer.lex(" \n\t "), [])
+
+    def test_matches_per_type_scan(self):
+        ## The old lexer, tries every regex at every position
+        def reference_lex(input_str):
+            res = []
+            input_str = input_str.strip()
+            while input_str != "":
+                for token_type in lexer.TokenType:
+                    match = lexer.TokenToRegex[token_type].match(input_str)
+                    if match:
+                        res.append((token_type, match[0]))
+                        input_str = input_str[len(match[0]) :]
+                        break
+                input_str = input_str.strip()
+            return res
+
+        test_input = """
+            int main(void) {
+                return !(1 + 2) * 3 / 4 % 5 << 6 >> 7 & 8 | 9 ^ ~10
+                    >= 1 > 2 <= 3 < 4 == 5 != 6 && 7 || - 8;
+                integer voidy _return returned x1 __y
+            }
+            """
+        self.assertEqual(lexer.lex(test_input), reference_lex(test_input))
+
+    def test_stream_matches_lex(self):
+        test_input = """
+            int main(void) {
+                return !(1 + 2) * 3 << 6 >= 1 && 7 || - 8 ^ ~10;
+            }
+            """
+        stream = lexer.lex_stream(test_input)
+        self.assertEqual(list(stream), lexer.lex(test_input))
+        self.assertEqual(len(stream), len(lexer.lex(test_input)))
+
+    def test_stream_offsets(self):
+        stream = lexer.lex_stream(b"int main(void) {\n  return 12;\n}\n")
+        self.assertEqual(stream.kinds[7], lexer.TokenType.CONSTINT.value)
+        self.assertEqual(stream.token_type(7), lexer.TokenType.CONSTINT)
+        self.assertEqual((stream.starts[7], stream.ends[7]), (26, 28))
+        self.assertEqual(bytes(stream.slice(7)), b"12")
+        self.assertEqual(stream.text(1), "main")
+        self.assertEqual(stream.position(0), (1, 1))
+        self.assertEqual(stream.position(6), (2, 3))
+        self.assertEqual(stream.position(len(stream) - 1), (3, 1))
+
+    def test_stream_from_pairs(self):
+        pairs = lexer.lex("int main ( void )")
+        stream = lexer.TokenStream.from_pairs(pairs)
+        self.assertEqual(list(stream), pairs)
+
+    def test_stream_mmap(self):
+        with tempfile.TemporaryFile() as file:
+            file.write(b"return 1;")
+            file.flush()
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as source:
+                stream = lexer.lex_stream(source)
+                self.assertEqual(stream.text(1), "1")
+                stream.release()
+
+    def test_stream_invalid(self):
+        with self.assertRaises(ValueError):
+            lexer.lex_stream("return @")
+        with self.assertRaises(NotImplementedError):
+            lexer.lex_stream("--")
+
+    def test_iter_matches_lex(self):
+        test_input = """
+            int main(void) {
+                return !(12 + 345) * 3 << 6 >= 1 && 7 || - 8 ^ ~10 != 0;
+            }  integer voidy _return
+            """
+        expected = lexer.lex(test_input)
+        for chunk_size in (1, 2, 3, 7, 64, lexer.CHUNK_SIZE):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(list(lexer.lex_iter(test_input, chunk_size)), expected)
+                stream = io.BytesIO(test_input.encode("utf-8"))
+                self.assertEqual(list(lexer.lex_iter(stream, chunk_size)), expected)
+
+    def test_iter_is_lazy(self):
+        chunks_read = []
+
+        class Source(io.BytesIO):
+            def read(self, size=-1):
+                chunks_read.append(size)
+                return super().read(size)
+
+        tokens = lexer.lex_iter(Source(b"return 1;" * 100), chunk_size=4)
+        self.assertEqual(next(tokens), (lexer.TokenType.RETURN, "return"))
+        self.assertLess(len(chunks_read), 5)
+
+    def test_iter_invalid(self):
+        with self.assertRaises(ValueError):
+            list(lexer.lex_iter("return @", chunk_size=2))
+        with self.assertRaises(NotImplementedError):
+            list(lexer.lex_iter("- -- -", chunk_size=1))
+
+    def assert_relex_matches(self, source, offset, deleted, inserted):
+        old = lexer.lex_stream(source)
+        edited = source[:offset] + inserted + source[offset + deleted :]
+        try:
+            full = lexer.lex_stream(edited)
+        except (ValueError, NotImplementedError) as error:
+            ## The edit broke the source, relex has to notice it too
+            with self.assertRaises(type(error)):
+                lexer.relex(old, offset, deleted, inserted)
+            return
+        new, start, old_end, new_end = lexer.relex(old, offset, deleted, inserted)
+        self.assertEqual(bytes(new.source), edited)
+        self.assertEqual(list(new.kinds), list(full.kinds))
+        self.assertEqual(list(new.starts), list(full.starts))
+        self.assertEqual(list(new.ends), list(full.ends))
+        ## Outside of the reported range nothing changed
+        self.assertEqual(list(new.kinds[:start]), list(old.kinds[:start]))
+        self.assertEqual(list(new.kinds[new_end:]), list(old.kinds[old_end:]))
+        self.assertEqual(len(new) - new_end, len(old) - old_end)
+
+    def test_relex_edits(self):
+        source = b"int main(void) {\n    return (1 + 22) << 3 && ~x || y;\n}\n"
+        ## Change a number, merge two tokens, split one, grow an operator
+        self.assertEqual(lexer.relex(lexer.lex_stream(source), 29, 1, b"3")[1:], (7, 9, 9))
+        self.assert_relex_matches(source, 29, 1, b"3")
+        self.assert_relex_matches(source, 28, 1, b"")
+        self.assert_relex_matches(source, 22, 2, b"ret urn")
+        self.assert_relex_matches(source, 33, 0, b"<")
+        self.assert_relex_matches(source, 0, 0, b"  ")
+        self.assert_relex_matches(source, len(source), 0, b" 1")
+        self.assert_relex_matches(source, 0, len(source), b"")
+
+    def test_relex_random_edits(self):
+        rand = random.Random(1234)
+        pieces = [b" ", b"\n", b"1", b"23", b"x", b"int", b"in", b"t", b"<", b">", b"=",
+                  b"&", b"|", b"!", b"(", b")", b"+", b"*", b"return", b"_"]
+        source = b"int main(void) { return !(12 + 345) * 3 << 6 >= 1 && 7 || x ^ ~10; }"
+        for _ in range(500):
+            offset = rand.randrange(len(source) + 1)
+            deleted = rand.randrange(min(4, len(source) - offset) + 1)
+            inserted = b"".join(rand.choice(pieces) for _ in range(rand.randrange(3)))
+            with self.subTest(offset=offset, deleted=deleted, inserted=inserted):
+                self.assert_relex_matches(source, offset, deleted, inserted)
+
+    def test_relex_invalid(self):
+        old = lexer.lex_stream(b"return 1;")
+        with self.assertRaises(ValueError):
+            lexer.relex(old, 7, 1, b"@")
+        with self.assertRaises(ValueError):
+            lexer.relex(old, 8, 5, b"")
+
 
 if __name__ == "__main__":
     unittest.main()
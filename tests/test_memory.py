@@ -0,0 +1,103 @@
+import inspect
+import sys
+import tracemalloc
+import unittest
+
+import pyCC.pyCmp.ASMNode as ASMNode
+import pyCC.pyCmp.ASTNode as ASTNode
+import pyCC.pyCmp.tackyNode as tackyNode
+import pyCC.pyCmp.asmgen as asmgen
+import pyCC.pyCmp.tackygen as tackygen
+import pyCC.pyCmp.parser as parser
+import pyCC.pyCmp.lexer as lexer
+
+## Reference program, 500 terms of unary/binary/logical operators
+REFERENCE_TERMS = 500
+
+## Upper bounds, in bytes
+MAX_BYTES_PER_NODE = 120
+MAX_PEAK = 4 * 2**20
+
+
+def node_classes():
+    for module, base in (
+        (ASTNode, ASTNode.ASTNode),
+        (tackyNode, tackyNode.TackyNode),
+        (ASMNode, ASMNode.ASM),
+    ):
+        for _, cls in inspect.getmembers(module, inspect.isclass):
+            if issubclass(cls, base):
+                yield cls
+
+
+def count_objects(root, node_type):
+    ## Distinct node objects reachable from root
+    seen = set()
+    stack = [root]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            stack.extend(item)
+        elif isinstance(item, node_type) and id(item) not in seen:
+            seen.add(id(item))
+            stack.extend(getattr(item, name) for name in type(item).__match_args__)
+    return len(seen)
+
+
+class TestMemory(unittest.TestCase):
+    def test_no_instance_dict(self):
+        for cls in node_classes():
+            with self.subTest(cls=cls.__name__):
+                self.assertEqual(cls.__dictoffset__, 0)
+
+    def test_positional_match(self):
+        match ASTNode.BinaryExpressionNode(
+            ASTNode.BinaryOperatorNode.ADD, ASTNode.ConstIntNode(1), ASTNode.ConstIntNode(2)
+        ):
+            case ASTNode.BinaryExpressionNode(_, ASTNode.ConstIntNode(left), right):
+                self.assertEqual(left, 1)
+                self.assertEqual(right.value, 2)
+            case _:
+                self.fail("positional pattern didn't match")
+        match ASMNode.MoveASM(ASMNode.IntASM(3), ASMNode.StackASM(-4)):
+            case ASMNode.MoveASM(ASMNode.IntASM(val), ASMNode.StackASM(index)):
+                self.assertEqual((val, index), (3, -4))
+            case _:
+                self.fail("positional pattern didn't match")
+
+    def test_reference_program_memory(self):
+        body = " + ".join(
+            f"-{i % 100} * (~{i % 7} || {i % 3})" for i in range(REFERENCE_TERMS)
+        )
+        tokens = lexer.lex_stream(f"int main(void) {{ return {body}; }}")
+
+        tracemalloc.start()
+        try:
+            ast = parser.parse(tokens)
+            ast_bytes = tracemalloc.get_traced_memory()[0]
+            tacky = tackygen.tackify(ast)
+            tacky_bytes = tracemalloc.get_traced_memory()[0] - ast_bytes
+            asm = asmgen.asmFromTacky(tacky)
+            current, peak = tracemalloc.get_traced_memory()
+            asm_bytes = current - ast_bytes - tacky_bytes
+        finally:
+            tracemalloc.stop()
+
+        report = {
+            "AST": ast_bytes / count_objects(ast, ASTNode.ASTNode),
+            "TACKY": tacky_bytes / count_objects(tacky, tackyNode.TackyNode),
+            "ASM": asm_bytes / count_objects(asm, ASMNode.ASM),
+        }
+        print(file=sys.stderr)
+        for stage, per_node in report.items():
+            print(f"{stage:>6}: {per_node:6.1f} bytes/node", file=sys.stderr)
+        print(f"  peak: {peak / 2**20:6.1f} MiB", file=sys.stderr)
+
+        for stage, per_node in report.items():
+            with self.subTest(stage=stage):
+                self.assertLess(per_node, MAX_BYTES_PER_NODE)
+        self.assertLess(peak, MAX_PEAK)
+
+
+if __name__ == "__main__":
+    unittest.main()
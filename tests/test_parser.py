@@ -288,8 +288,42 @@ class TestParser(unittest.TestCase):
 
         self.assertEqual(str(output), str(expected))
 
+    def test_token_stream(self):
+        test_prog = """
+                    int main(void){
+                        return 1;
+                    }
+                    """
+        output = parser.parse(lexer.lex_stream(test_prog))
+        expected = ProgramNode(
+            FunctionNode(IdentifierNode("main"), ReturnNode(ConstIntNode(1)))
+        )
+        self.assertEqual(str(output), str(expected))
 
+    def test_error_location(self):
+        test_prog = "int main(void){\n    return 1 2;\n}"
+        with self.assertRaisesRegex(ValueError, "line 2, column 14"):
+            parser.parse(lexer.lex_stream(test_prog))
 
+    def test_token_iterator(self):
+        test_prog = """
+                    int main(void){
+                        return (1 + 2) * 3;
+                    }
+                    """
+        output = parser.parse(lexer.lex_iter(test_prog, chunk_size=5))
+        expected = parser.parse(lexer.lex(test_prog))
+        self.assertEqual(str(output), str(expected))
 
+    def test_tokens_pulled_on_demand(self):
+        pulled = []
 
+        def tokens():
+            for token in lexer.lex("int main(void){ return 1 2; }" + " 3" * 1000):
+                pulled.append(token)
+                yield token
 
+        with self.assertRaises(ValueError):
+            parser.parse(tokens())
+        ## The error is found without reading past the bounded lookahead
+        self.assertLess(len(pulled), 10 + parser.LOOKAHEAD)
@@ -0,0 +1,70 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from pyCC.pyCmp.driver import LINK_MODE
+from pyCC.pyCmp.pipeline import compile_pipelined
+from pyCC.pyCmp.pyCmp import FAST_MODE, compile_source
+from tests.test_driver import BAD_PROGRAMS, PROGRAMS
+
+
+@unittest.skipIf(shutil.which("gcc") is None, "needs gcc")
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.sources = dict(BAD_PROGRAMS)
+        self.sources.update((name, source) for name, (source, _) in PROGRAMS.items())
+        for name, source in self.sources.items():
+            with open(self.path(name), "w") as f:
+                f.write(source)
+
+    def path(self, name):
+        return os.path.join(self.tmp, name)
+
+    def test_link(self):
+        names = [self.path(name) for name in list(BAD_PROGRAMS) + list(PROGRAMS)] * 3
+        for mode in (LINK_MODE, FAST_MODE):
+            with self.subTest(mode=mode):
+                seen = []
+                results, stats = compile_pipelined(names, mode, gcc_jobs=2, on_result=seen.append)
+                self.assertEqual([result.file_name for result in results], names)
+                self.assertEqual(sorted(map(id, seen)), sorted(map(id, results)))
+                for result in results:
+                    good = os.path.basename(result.file_name) in PROGRAMS
+                    self.assertEqual(result.ok, good, result.error)
+                for name, (_, code) in PROGRAMS.items():
+                    self.assertEqual(subprocess.run([self.path(name[:-2])]).returncode, code)
+
+                ## Every file is preprocessed, only the good ones get further
+                self.assertEqual(
+                    [stage.items for stage in stats.stages], [len(names), len(names), 9]
+                )
+                for stage in stats.stages:
+                    self.assertLessEqual(stage.utilization(stats.wall), 1.0)
+                self.assertIn("preprocess", str(stats))
+
+    def test_codegen(self):
+        names = [self.path(name) for name in PROGRAMS]
+        results, _ = compile_pipelined(names, 3)
+        self.assertTrue(all(result.ok for result in results))
+        for name in PROGRAMS:
+            with open(self.path(name[:-2] + ".s")) as f:
+                self.assertEqual(f.read(), compile_source(self.sources[name]).assembly)
+            self.assertFalse(os.path.exists(self.path(name[:-2])))
+
+    def test_errors(self):
+        results, _ = compile_pipelined([self.path("missing.c"), self.path("zero.s")])
+        self.assertIn("Unable to PreProcess", results[0].error)
+        self.assertIn("Invalid File Type", results[1].error)
+        with self.assertRaises(ValueError):
+            compile_pipelined([self.path("zero.c")], 2)
+        ## A bug in a stage fails the file, not the run
+        names = [self.path(name) for name in PROGRAMS]
+        with mock.patch("pyCC.pyCmp.pipeline.compile_source", side_effect=KeyError("ghost")):
+            results, _ = compile_pipelined(names)
+        self.assertEqual([result.error for result in results], ["KeyError: 'ghost'"] * len(names))
@@ -0,0 +1,177 @@
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+import pyCC.pyCmp.lexer as lexer
+from pyCC.pyCmp import preprocessor
+from pyCC.pyCmp.driver import make_rule, preprocess_source
+
+## (main file, {header name: text}), all within the supported subset
+SUPPORTED = [
+    ("int main(void) { return 2; }\n", {}),
+    ("// line comment\nint /* inline */ main(void) {\n  return 1 /* multi\n line */ + 2;\n}\n", {}),
+    ("#define A 1 + 2\n#define B A * A\nint main(void) { return B; }\n", {}),
+    ("#define SELF SELF + 1\n#define X Y\n#define Y X\nint main(void) { return SELF + X; }\n", {}),
+    ("#define A 1\n#undef A\n#define A 7\nint main(void) { return A + linux + unix; }\n", {}),
+    ("#define EMPTY\nint main(void) { return EMPTY 3 EMPTY; }\n", {}),
+    ("#define LONG 1 + \\\n  2\nint main(void) { return LONG; }\n", {}),
+    ("  #  define   SPACED   4\n#\nint main(void) { return SPACED; }\n", {}),
+    (
+        '#include "a.h"\n#include "a.h"\nint main(void) { return A_VALUE + B_VALUE; }\n',
+        {
+            "a.h": '#ifndef A_H\n#define A_H\n#include "sub/b.h"\n#define A_VALUE 5\n#endif\n',
+            "sub/b.h": '#include "c.h"\n#define B_VALUE (C_VALUE << 1)\n',
+            "sub/c.h": "#define C_VALUE 3\n",
+        },
+    ),
+    (
+        "#define V 3\n"
+        "#if V > 2 && defined V && !defined(W)\nint main(void) { return 1; }\n"
+        "#elif 1\nint main(void) { return 2; }\n#else\nint main(void) { return 3; }\n#endif\n",
+        {},
+    ),
+    (
+        "#if 0\n#pragma anything\n#error not reached\n#include <missing.h>\n"
+        "#if 1\n#else\n#endif\n#elif -7 / 2 == -3 && -7 % 2 == -1 && (1 << 62) > 0\n"
+        "int main(void) { return 4; }\n#endif\n",
+        {},
+    ),
+    (
+        "#ifdef UNDEFINED\nx\n#elif UNDEFINED_TOO || (0 && 1 / 0)\ny\n#else\n"
+        "#ifndef UNDEFINED\nint main(void) { return 5; }\n#endif\n#endif\n",
+        {},
+    ),
+    ## Expansions that would paste onto their neighbours without a space
+    ("#define LT <\nint main(void) { return 1 LT<2; }\n", {}),
+    ("#define M -\nint main(void) { return M-1; }\n", {}),
+    ("#define P +\n#define Q P+\n#define E\nint main(void) { return 1 Q+E+2; }\n", {}),
+    ## #if constants with a leading 0 are octal
+    (
+        "#define EIGHT 010\n#if 010 == 8 && EIGHT + 00 == 8 && 0777 == 511\n"
+        "int main(void) { return 1; }\n#else\nint main(void) { return 2; }\n#endif\n",
+        {},
+    ),
+]
+
+## Each of these needs gcc
+UNSUPPORTED = [
+    "#define F(x) x\nint main(void) { return F(1); }\n",
+    "#include <stdio.h>\nint main(void) { return 0; }\n",
+    '#include "missing.h"\nint main(void) { return 0; }\n',
+    "#pragma once\nint main(void) { return 0; }\n",
+    "#error stop\n",
+    "int main(void) { return __LINE__; }\n",
+    "#define _Reserved 1\n",
+    'int main(void) { return "s"[0]; }\n',
+    "#if 1 / 0\n#endif\n",
+    "#if 1 ? 2 : 3\n#endif\n",
+    "#if 09\n#endif\n",
+    "#if 1\n",
+    "#endif\n",
+    "#if 1\n#else\n#else\n#endif\n",
+    "int main(void) { return 0x10; }\n",
+    "/* unterminated\n",
+    "#define STR #x\n",
+]
+
+
+def random_condition(rng, depth=0):
+    if depth > 3 or rng.random() < 0.3:
+        return rng.choice(["0", "1", "7", "A", "B", "UNDEF", "defined A", "defined(UNDEF)"])
+    if rng.random() < 0.2:
+        return rng.choice(["!", "-", "~"]) + "(" + random_condition(rng, depth + 1) + ")"
+    op = rng.choice(["+", "-", "*", "<", "<=", "==", "!=", "&&", "||", "&", "|", "^", ">>"])
+    if op == ">>":
+        ## Negative or oversized counts are undefined, and left to gcc
+        return f"({random_condition(rng, depth + 1)}) >> {rng.randrange(4)}"
+    return f"({random_condition(rng, depth + 1)}) {op} ({random_condition(rng, depth + 1)})"
+
+
+def random_program(rng):
+    lines = ["#define A 3", "#define B A - 1"]
+    for index in range(rng.randrange(1, 6)):
+        lines.append(f"#if {random_condition(rng)}")
+        lines.append(f"#define R{index} {index + 1}")
+        lines.append(f"#elif {random_condition(rng)}")
+        lines.append(f"#define R{index} -{index + 1}")
+        lines.append("#else")
+        lines.append(f"#define R{index} 0")
+        lines.append("#endif")
+    total = " + ".join(f"R{index}" for index in range(index + 1))
+    lines.append(f"int main(void) {{ return {total} + B; }}")
+    return "\n".join(lines) + "\n"
+
+
+class TestPreprocessor(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def write(self, source, headers=None):
+        for name, text in (headers or {}).items():
+            path = os.path.join(self.tmp, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(text)
+        file_name = os.path.join(self.tmp, "prog.c")
+        with open(file_name, "w") as f:
+            f.write(source)
+        return file_name
+
+    def gcc_tokens(self, file_name):
+        result = subprocess.run(
+            ["gcc", "-E", "-P", file_name], capture_output=True, text=True, check=True
+        )
+        return lexer.lex(result.stdout)
+
+    @unittest.skipIf(shutil.which("gcc") is None, "needs gcc")
+    def test_matches_gcc(self):
+        for source, headers in SUPPORTED:
+            with self.subTest(source=source):
+                file_name = self.write(source, headers)
+                text, _ = preprocessor.preprocess(file_name)
+                self.assertEqual(lexer.lex(text), self.gcc_tokens(file_name))
+
+    @unittest.skipIf(shutil.which("gcc") is None, "needs gcc")
+    def test_random_conditions(self):
+        rng = random.Random(22)
+        for _ in range(40):
+            source = random_program(rng)
+            with self.subTest(source=source):
+                file_name = self.write(source)
+                text, _ = preprocessor.preprocess(file_name)
+                self.assertEqual(lexer.lex(text), self.gcc_tokens(file_name))
+
+    def test_unsupported(self):
+        for source in UNSUPPORTED:
+            with self.subTest(source=source):
+                with self.assertRaises(NotImplementedError):
+                    preprocessor.preprocess(self.write(source))
+
+    def test_dependencies(self):
+        source, headers = SUPPORTED[8]
+        _, dependencies = preprocessor.preprocess(self.write(source, headers))
+        self.assertEqual(
+            [os.path.relpath(path, self.tmp) for path in dependencies],
+            ["prog.c", "a.h", "sub/b.h", "sub/c.h"],
+        )
+
+    def test_make_rule(self):
+        self.assertEqual(
+            make_rule("out", ["a.c", "my dir/b.h", "c$.h"]),
+            "out: a.c my\\ dir/b.h c$$.h\nmy\\ dir/b.h:\nc$$.h:\n",
+        )
+
+    @unittest.skipIf(shutil.which("gcc") is None, "needs gcc")
+    def test_fallback(self):
+        ## Outside the subset, preprocess_source still works through gcc
+        file_name = self.write("#define F(x) (x * 2)\nint main(void) { return F(3) + __LINE__; }\n")
+        depfile = os.path.join(self.tmp, "prog.d")
+        source = preprocess_source(file_name, depfile, "prog")
+        self.assertEqual(lexer.lex(source.decode()), self.gcc_tokens(file_name))
+        with open(depfile) as f:
+            self.assertTrue(f.read().startswith(f"prog: {file_name}"))
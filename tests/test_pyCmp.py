@@ -0,0 +1,80 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pyCC.pyCmp.asmgen as asmgen
+import pyCC.pyCmp.fastgen as fastgen
+import pyCC.pyCmp.lexer as lexer
+import pyCC.pyCmp.parser as parser
+import pyCC.pyCmp.tackygen as tackygen
+from pyCC.pyCmp.pyCmp import FAST_MODE, CompileResult, Stage, compile_source, py_compile
+
+SOURCE = "int main(void) {\n    return (1 + 2) * -3 || !4 && 5 % 2;\n}\n"
+
+
+class TestCompileSource(unittest.TestCase):
+    def test_stages(self):
+        fields = ("tokens", "ast", "tacky", "asm", "assembly")
+        for stage in Stage:
+            result = compile_source(SOURCE, stage)
+            for index, field in enumerate(fields):
+                with self.subTest(stage=stage, field=field):
+                    if index <= stage:
+                        self.assertIsNotNone(getattr(result, field))
+                    else:
+                        self.assertIsNone(getattr(result, field))
+
+    def test_matches_pipeline(self):
+        result = compile_source(SOURCE)
+        self.assertEqual(list(result.tokens), lexer.lex(SOURCE))
+        self.assertEqual(repr(result.ast), repr(parser.parse(lexer.lex(SOURCE))))
+        tacky = tackygen.tackify(parser.parse(lexer.lex(SOURCE)))
+        self.assertEqual(repr(result.tacky), repr(tacky))
+        self.assertEqual(repr(result.asm), repr(asmgen.asmFromTacky(tacky)))
+        self.assertEqual(result.assembly, asmgen.asmgenerate(tacky))
+
+    def test_matches_py_compile(self):
+        ## Same assembly as the file based entry point, in both modes
+        with tempfile.TemporaryDirectory() as tmp:
+            file_in = os.path.join(tmp, "prog.i")
+            file_out = os.path.join(tmp, "prog.s")
+            with open(file_in, "w") as f:
+                f.write(SOURCE)
+            for mode, fast in ((4, False), (FAST_MODE, True)):
+                with self.subTest(fast=fast):
+                    py_compile(file_in, file_out, mode)
+                    with open(file_out) as f:
+                        self.assertEqual(compile_source(SOURCE, fast=fast).assembly, f.read())
+
+    def test_fast(self):
+        result = compile_source(SOURCE.encode(), fast=True)
+        out = io.StringIO()
+        fastgen.fastcompile(lexer.lex(SOURCE), out)
+        self.assertEqual(result.assembly, out.getvalue())
+        self.assertIsNone(result.ast)
+        with self.assertRaises(ValueError):
+            compile_source(SOURCE, Stage.PARSE, fast=True)
+
+    def test_no_io(self):
+        stdout = io.StringIO()
+        with mock.patch("builtins.open", side_effect=AssertionError("opened a file")):
+            with contextlib.redirect_stdout(stdout):
+                compile_source(SOURCE)
+                compile_source(SOURCE, fast=True)
+        self.assertEqual(stdout.getvalue(), "")
+
+    def test_errors(self):
+        for source in ("int main(void) { return 1 +; }", "int main(void) { return $; }", ""):
+            with self.subTest(source=source):
+                with self.assertRaises(ValueError):
+                    compile_source(source)
+
+    def test_stage_values(self):
+        ## Plain py_compile modes work as stop_after too
+        result = compile_source(SOURCE, 2)
+        self.assertIsInstance(result, CompileResult)
+        self.assertIsNotNone(result.tacky)
+        self.assertIsNone(result.asm)
@@ -0,0 +1,154 @@
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from pyCC.pyCmp import protocol
+from pyCC.pyCmp.pyCmp import FAST_MODE, compile_source
+from pyCC.pyCmp.server import CompileServer, LatencyStats
+from tests.test_driver import PROGRAMS
+
+CLIENT = os.path.join(os.path.dirname(__file__), "..", "pyCC", "client.py")
+
+
+class TestLatencyStats(unittest.TestCase):
+    def test_percentiles(self):
+        stats = LatencyStats()
+        self.assertEqual(stats.percentiles(), {50: 0.0, 90: 0.0, 99: 0.0, 100: 0.0})
+        for millis in range(1, 101):
+            stats.record(millis / 1000, millis % 10 != 0)
+        self.assertEqual(stats.percentiles(), {50: 0.05, 90: 0.09, 99: 0.099, 100: 0.1})
+        self.assertEqual(stats.errors, 10)
+        self.assertIn("p99 99.00 ms", stats.summary())
+
+    def test_window(self):
+        stats = LatencyStats(window=10)
+        for millis in range(100):
+            stats.record(millis / 1000, True)
+        self.assertEqual(stats.requests, 100)
+        self.assertEqual(stats.percentiles((0,))[0], 0.09)
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.socket_path = os.path.join(self.tmp, "pycc.sock")
+        self.server = CompileServer(self.socket_path)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.socket_path)
+        self.addCleanup(sock.close)
+        return sock
+
+    def request(self, sock, kind, body=b"", mode=3):
+        protocol.send_request(sock, kind, mode, body)
+        status, body = protocol.read_response(sock)
+        return status, body.decode()
+
+    def test_source(self):
+        sock = self.connect()
+        for source, _ in PROGRAMS.values():
+            for mode, fast in ((3, False), (FAST_MODE, True)):
+                with self.subTest(source=source, fast=fast):
+                    status, body = self.request(sock, protocol.SOURCE, source.encode(), mode)
+                    self.assertEqual(status, protocol.OK)
+                    self.assertEqual(body, compile_source(source, fast=fast).assembly)
+
+    def test_errors(self):
+        sock = self.connect()
+        status, body = self.request(sock, protocol.SOURCE, b"int main(void) { return 1 +; }")
+        self.assertEqual(status, protocol.ERROR)
+        self.assertIn("Can't parse Expression", body)
+        status, body = self.request(sock, 99)
+        self.assertEqual(status, protocol.ERROR)
+        ## The connection is still good after an error
+        status, _ = self.request(sock, protocol.SOURCE, b"int main(void) { return 0; }")
+        self.assertEqual(status, protocol.OK)
+        with mock.patch("pyCC.pyCmp.server.compile_source", side_effect=KeyError("ghost")):
+            status, body = self.request(sock, protocol.SOURCE, b"int main(void) { return 0; }")
+        self.assertEqual((status, body), (protocol.ERROR, "KeyError: 'ghost'"))
+        status, body = self.request(sock, protocol.STATS)
+        self.assertIn("requests 4, errors 3", body)
+
+    @unittest.skipIf(shutil.which("gcc") is None, "needs gcc")
+    def test_path(self):
+        file_name = os.path.join(self.tmp, "prog.c")
+        with open(file_name, "w") as f:
+            f.write("#define VALUE 3\nint main(void) { return VALUE * 2; }\n")
+        sock = self.connect()
+        status, body = self.request(sock, protocol.PATH, file_name.encode())
+        self.assertEqual(status, protocol.OK)
+        self.assertEqual(body, compile_source("int main(void) { return 3 * 2; }").assembly)
+        status, body = self.request(sock, protocol.PATH, b"/no/such/file.c")
+        self.assertEqual(status, protocol.ERROR)
+        self.assertIn("Unable to PreProcess", body)
+
+    def test_concurrent(self):
+        failures = []
+
+        def client(value):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(self.socket_path)
+                for offset in range(10):
+                    source = f"int main(void) {{ return {value} + {offset}; }}"
+                    status, body = self.request(sock, protocol.SOURCE, source.encode())
+                    if status != protocol.OK or body != compile_source(source).assembly:
+                        failures.append(source)
+
+        threads = [threading.Thread(target=client, args=(value,)) for value in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(failures, [])
+        self.assertEqual(self.server.stats.requests, 80)
+
+    def test_socket_in_use(self):
+        with self.assertRaises(OSError):
+            CompileServer(self.socket_path)
+        ## A stale socket is replaced
+        stale = os.path.join(self.tmp, "stale.sock")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(stale)
+        CompileServer(stale).server_close()
+        self.assertFalse(os.path.exists(stale))
+        ## Anything else is left alone
+        source = os.path.join(self.tmp, "main.c")
+        with open(source, "w") as f:
+            f.write("int main(void) { return 0; }\n")
+        with self.assertRaisesRegex(OSError, "not a socket"):
+            CompileServer(source)
+        self.assertTrue(os.path.isfile(source))
+
+    @unittest.skipIf(shutil.which("gcc") is None, "needs gcc")
+    def test_client(self):
+        env = dict(os.environ, PYCC_SOCKET=self.socket_path)
+        for name, (source, code) in PROGRAMS.items():
+            file_name = os.path.join(self.tmp, name)
+            with open(file_name, "w") as f:
+                f.write(source)
+            subprocess.run([sys.executable, CLIENT, file_name], env=env, check=True)
+            self.assertEqual(subprocess.run([file_name[:-2]]).returncode, code)
+        self.assertEqual(self.server.stats.requests, len(PROGRAMS))
+
+        bad = os.path.join(self.tmp, "bad.c")
+        with open(bad, "w") as f:
+            f.write("int main(void) { return; }")
+        result = subprocess.run(
+            [sys.executable, CLIENT, bad], env=env, capture_output=True, text=True
+        )
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("Err: Can't parse Expression", result.stderr)
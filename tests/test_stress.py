@@ -0,0 +1,69 @@
+import os
+import time
+import unittest
+
+import pyCC.pyCmp.asmgen as asmgen
+import pyCC.pyCmp.lexer as lexer
+import pyCC.pyCmp.parser as parser
+import pyCC.pyCmp.tackygen as tackygen
+
+## The full size runs take a while, they only run with PYCC_STRESS=1
+RUN_STRESS = os.environ.get("PYCC_STRESS") == "1"
+
+## Seconds allowed for lex + parse + repr + TACKY + assembly text
+NEG_DEPTH = 1_000_000
+NEG_BUDGET = 120
+SUM_DEPTH = 100_000
+SUM_BUDGET = 20
+
+
+def nested_neg(depth):
+    return "int main(void){ return " + "-(" * depth + "1" + ")" * depth + "; }"
+
+
+def nested_sum(depth):
+    return "int main(void){ return " + "(1 + " * depth + "1" + ")" * depth + "; }"
+
+
+class TestDeepNesting(unittest.TestCase):
+    def compile(self, source):
+        ast = parser.parse(lexer.lex_stream(source))
+        text = repr(ast)
+        tacky = tackygen.tackify(ast)
+        return text, tacky, asmgen.asmgenerate(tacky)
+
+    def test_deep_unary(self):
+        ## Far past the default recursion limit
+        depth = 20_000
+        text, tacky, _ = self.compile(nested_neg(depth))
+        self.assertTrue(text.startswith("ProgramNode(FunctionNode(main, ReturnNode(Unary("))
+        self.assertEqual(text.count("UnaryOperatorNode.NEG"), depth)
+        self.assertEqual(len(tacky.func.instructions), depth + 1)
+
+    def test_deep_sum(self):
+        depth = 10_000
+        text, tacky, _ = self.compile(nested_sum(depth))
+        self.assertEqual(text.count("BinaryOperatorNode.ADD"), depth)
+        self.assertEqual(len(tacky.func.instructions), depth + 1)
+
+    def test_deep_logic(self):
+        depth = 5_000
+        source = "int main(void){ return " + "(0 || " * depth + "1" + ")" * depth + "; }"
+        _, tacky, _ = self.compile(source)
+        self.assertEqual(len(tacky.func.instructions), 7 * depth + 1)
+
+    @unittest.skipUnless(RUN_STRESS, "set PYCC_STRESS=1 to run")
+    def test_million_deep_unary(self):
+        start = time.perf_counter()
+        self.compile(nested_neg(NEG_DEPTH))
+        self.assertLess(time.perf_counter() - start, NEG_BUDGET)
+
+    @unittest.skipUnless(RUN_STRESS, "set PYCC_STRESS=1 to run")
+    def test_100k_deep_sum(self):
+        start = time.perf_counter()
+        self.compile(nested_sum(SUM_DEPTH))
+        self.assertLess(time.perf_counter() - start, SUM_BUDGET)
+
+
+if __name__ == "__main__":
+    unittest.main()
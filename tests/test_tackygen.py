@@ -22,6 +22,7 @@ from pyCC.pyCmp.tackyNode import (
     UnaryTacky,
     VarTacky,
     UnaryOpTacky,
+    label_text,
 )
 import pyCC.pyCmp.tackygen as tackygen
 import pyCC.pyCmp.parser as parser
@@ -274,4 +275,25 @@ class TestTackygen(unittest.TestCase):
 
         self.assertEqual(str(res), str(expected))
 
+    def test_integer_ids(self):
+        test_prog = "int main(void) { return -(1 && 2) || 3; }"
+        func = tackygen.tackify(parser.parse(lexer.lex(test_prog))).func
+        ## Temporaries and labels are ids from the function's symbol table
+        self.assertEqual(func.symbols.num_temps, 3)
+        self.assertEqual(func.symbols.num_label_pairs, 2)
+        temps = {ins.dst.name for ins in func.instructions if hasattr(ins, "dst")}
+        self.assertEqual(temps, {0, 1, 2})
+        labels = [ins.name for ins in func.instructions if isinstance(ins, LabelTacky)]
+        self.assertTrue(all(type(label) is int for label in labels))
+        self.assertEqual(
+            [label_text(label) for label in labels],
+            ["and_false1", "and_end1", "or_true0", "or_end0"],
+        )
 
+    def test_symbols_per_function(self):
+        gen = tackygen.TackyGen()
+        test_prog = "int main(void) { return 1 || 2; }"
+        first = gen.create(parser.parse(lexer.lex(test_prog))).func
+        second = gen.create(parser.parse(lexer.lex(test_prog))).func
+        self.assertEqual(str(first), str(second))
+        self.assertIsNot(first.symbols, second.symbols)
@@ -0,0 +1,109 @@
+import itertools
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from pyCC.pyCmp import toolchain
+from pyCC.pyCmp.driver import LINK_MODE, compile_file
+from pyCC.pyCmp.pyCmp import FAST_MODE
+from tests.test_driver import BAD_PROGRAMS, PROGRAMS
+
+
+@unittest.skipIf(shutil.which("gcc") is None, "needs gcc")
+class TestToolchain(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        ## Every test discovers into its own cache
+        environ = mock.patch.dict(os.environ, XDG_CACHE_HOME=self.path("cache"))
+        environ.start()
+        self.addCleanup(environ.stop)
+        toolchain._commands = None
+        self.addCleanup(setattr, toolchain, "_commands", None)
+
+    def path(self, name):
+        return os.path.join(self.tmp, name)
+
+    def write(self, name, source):
+        with open(self.path(name), "w") as f:
+            f.write(source)
+        return self.path(name)
+
+    def test_discover(self):
+        commands = toolchain.discover()
+        self.assertEqual(commands["as"].count(toolchain.OBJECT), 1)
+        self.assertNotIn(toolchain.PROBE_INPUT, commands["as"])
+        self.assertEqual(commands["ld"].count(toolchain.OBJECT), 1)
+        self.assertEqual(commands["ld"].count(toolchain.OUTPUT), 1)
+        self.assertFalse(any(arg.startswith("-plugin") for arg in commands["ld"]))
+        for command in commands.values():
+            self.assertTrue(os.path.isabs(command[0]), command[0])
+
+    def test_cached_on_disk(self):
+        first = toolchain.link_commands("a.o", "a")
+        self.assertEqual(len(os.listdir(os.path.join(self.path("cache"), "pycc"))), 1)
+        toolchain._commands = None
+        ## Once on disk, gcc isn't asked again
+        with mock.patch.object(toolchain, "discover", side_effect=AssertionError("asked gcc")):
+            self.assertEqual(toolchain.link_commands("a.o", "a"), first)
+            self.assertEqual(toolchain.link_commands("b.o", "b")[1].count("b.o"), 1)
+
+    def test_identical_binaries(self):
+        for (name, (source, code)), mode in itertools.product(
+            PROGRAMS.items(), (LINK_MODE, FAST_MODE)
+        ):
+            with self.subTest(name=name, mode=mode):
+                file_name = self.write(name, source)
+                binaries = []
+                for direct_link in (False, True):
+                    result = compile_file(file_name, mode, direct_link=direct_link)
+                    self.assertTrue(result.ok, result.error)
+                    self.assertEqual(subprocess.run([file_name[:-2]]).returncode, code)
+                    with open(file_name[:-2], "rb") as f:
+                        binaries.append(f.read())
+                self.assertEqual(binaries[0], binaries[1])
+                self.assertFalse(os.path.exists(file_name[:-2] + ".o"))
+
+    def test_keep_temps(self):
+        file_name = self.write("zero.c", PROGRAMS["zero.c"][0])
+        result = compile_file(file_name, keep_temps=True, direct_link=True)
+        self.assertTrue(result.ok, result.error)
+        for suffix in (".i", ".s", ".o"):
+            self.assertTrue(os.path.exists(self.path("zero" + suffix)))
+
+    def test_failures(self):
+        for name, source in BAD_PROGRAMS.items():
+            with self.subTest(name=name):
+                file_name = self.write(name, source)
+                result = compile_file(file_name, FAST_MODE, direct_link=True)
+                self.assertFalse(result.ok)
+                ## Not even the object is left behind
+                self.assertEqual(sorted(os.listdir(self.tmp)), sorted(["cache", name]))
+                os.remove(file_name)
+
+    def test_existing_object(self):
+        ## An object of the user's next to the source isn't overwritten, and
+        ## the temporary one isn't left behind
+        file_name = self.write("zero.c", PROGRAMS["zero.c"][0])
+        with open(self.path("zero.o"), "wb") as f:
+            f.write(b"mine")
+        temporary = self.path("tmp")
+        os.mkdir(temporary)
+        with mock.patch("tempfile.tempdir", temporary):
+            result = compile_file(file_name, direct_link=True)
+        self.assertTrue(result.ok, result.error)
+        with open(self.path("zero.o"), "rb") as f:
+            self.assertEqual(f.read(), b"mine")
+        self.assertEqual(os.listdir(temporary), [])
+
+    def test_fallback(self):
+        ## A gcc that can't be taken apart still links
+        file_name = self.write("arith.c", PROGRAMS["arith.c"][0])
+        with mock.patch.object(toolchain, "discover", side_effect=NotImplementedError):
+            result = compile_file(file_name, direct_link=True)
+        self.assertTrue(result.ok, result.error)
+        self.assertEqual(subprocess.run([self.path("arith")]).returncode, 9)